@@ -0,0 +1,124 @@
+from django.db import transaction
+from .models import User, Company, ReportingLine
+
+# ==========================================
+# REPORTING HIERARCHY (closure table)
+# ==========================================
+# ReportingLine holds every (manager, person below them, depth) pair, so
+# "everyone under X" and "is A above B" are single indexed lookups instead
+# of walks up and down reports_to. All reports_to changes go through
+# set_manager, which rewrites the moved person's subtree in a fixed number
+# of statements and refuses changes that would create a cycle; User.save()
+# raises if reports_to was changed any other way.
+
+
+class HierarchyError(Exception):
+    """ Raised for a reporting change that isn't allowed; the message is shown to the user """
+
+
+def subordinates(user):
+    """ Everyone who reports to `user`, directly or through others """
+    return User.objects.filter(ancestor_lines__ancestor=user)
+
+
+def is_above(manager, user):
+    """ True if `user` reports to `manager` at any distance """
+    if manager.id is None or user.id is None or manager.id == user.id:
+        return False
+    if user.reports_to_id == manager.id:
+        return True
+    return ReportingLine.objects.filter(ancestor=manager, descendant=user).exists()
+
+
+def _ancestors(user_id):
+    """ [(ancestor_id, depth)] from the closure, nearest first """
+    return list(
+        ReportingLine.objects.filter(descendant_id=user_id).order_by('depth').values_list('ancestor_id', 'depth')
+    )
+
+
+def _descendants(user_id):
+    return list(ReportingLine.objects.filter(ancestor_id=user_id).values_list('descendant_id', 'depth'))
+
+
+@transaction.atomic
+def set_manager(user, manager):
+    """
+    Makes `user` (with everyone under them) report to `manager` (or to nobody).
+    Hierarchy changes are serialized per company, so two concurrent moves
+    can't build a cycle between them.
+    """
+    if (manager.id if manager else None) == user.reports_to_id:
+        return
+    if user.company_id:
+        Company.objects.select_for_update().filter(id=user.company_id).first()
+    if manager is not None:
+        if manager.company_id != user.company_id:
+            raise HierarchyError(f"{manager.username} works for another company.")
+        if manager.id == user.id:
+            raise HierarchyError(f"{user.username} cannot report to themselves.")
+        if ReportingLine.objects.filter(ancestor=user, descendant=manager).exists():
+            raise HierarchyError(f"{manager.username} reports to {user.username}, so they can't be their manager.")
+
+    subtree = [(user.id, 0)] + _descendants(user.id)
+    above = [anc_id for anc_id, _ in _ancestors(user.id)]
+    if above:
+        # Cut the subtree loose from its old chain of managers
+        ReportingLine.objects.filter(
+            ancestor_id__in=above, descendant_id__in=[node_id for node_id, _ in subtree]
+        ).delete()
+    if manager is not None:
+        chain = [(manager.id, 0)] + _ancestors(manager.id)
+        ReportingLine.objects.bulk_create([
+            ReportingLine(ancestor_id=anc_id, descendant_id=node_id, depth=anc_depth + 1 + node_depth)
+            for anc_id, anc_depth in chain for node_id, node_depth in subtree
+        ], batch_size=1000)
+
+    User.objects.filter(id=user.id).update(reports_to=manager)
+    user.reports_to = manager
+    user._saved_reports_to_id = user.reports_to_id
+
+
+def detach(user):
+    """ Before `user` is deleted: the people under them lose every manager from `user` up (reports_to is SET_NULL) """
+    below = [node_id for node_id, _ in _descendants(user.id)]
+    if below:
+        ReportingLine.objects.filter(
+            ancestor_id__in=[user.id] + [anc_id for anc_id, _ in _ancestors(user.id)], descendant_id__in=below
+        ).delete()
+
+
+# ==========================================
+# REBUILD (rebuild_reporting_lines; migration 0008 has its own copy of the walk)
+# ==========================================
+
+def closure_rows(parents):
+    """
+    (ancestor_id, descendant_id, depth) for every pair implied by `parents`
+    ({user_id: reports_to_id}). A chain that loops back on itself stops at
+    the repeat, so bad existing data can't hang the walk.
+    """
+    for user_id in parents:
+        seen = {user_id}
+        depth, node = 1, parents[user_id]
+        while node is not None and node not in seen:
+            yield node, user_id, depth
+            seen.add(node)
+            depth, node = depth + 1, parents.get(node)
+
+
+def rebuild_reporting_lines(company=None):
+    """ Recomputes the closure from reports_to (for all companies, or one). Returns the row count. """
+    users = User.objects.all()
+    lines = ReportingLine.objects.all()
+    if company is not None:
+        users = users.filter(company=company)
+        lines = lines.filter(descendant__company=company)
+    parents = dict(users.values_list('id', 'reports_to_id'))
+    with transaction.atomic():
+        lines.delete()
+        rows = ReportingLine.objects.bulk_create([
+            ReportingLine(ancestor_id=anc_id, descendant_id=user_id, depth=depth)
+            for anc_id, user_id, depth in closure_rows(parents)
+        ], batch_size=1000)
+    return len(rows)
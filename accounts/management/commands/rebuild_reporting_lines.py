@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Company
+from accounts.hierarchy import rebuild_reporting_lines
+
+class Command(BaseCommand):
+    help = 'Recomputes the reporting hierarchy closure (ReportingLine) from User.reports_to, e.g. after a data import or a direct database edit of reports_to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Company ID (default: all companies)')
+
+    def handle(self, *args, **options):
+        company = None
+        if options['company']:
+            company = Company.objects.filter(id=options['company']).first()
+            if company is None:
+                raise CommandError(f"Company {options['company']} does not exist.")
+
+        count = rebuild_reporting_lines(company)
+        scope = company.name if company else 'All companies'
+        self.stdout.write(self.style.SUCCESS(f"✔ {scope}: {count} reporting line(s) rebuilt"))
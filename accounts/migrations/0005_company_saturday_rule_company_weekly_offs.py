@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_otp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='saturday_rule',
+            field=models.CharField(choices=[('none', 'No extra Saturdays off'), ('2_4', '2nd & 4th Saturday off'), ('1_3', '1st & 3rd Saturday off'), ('1_3_5', '1st, 3rd & 5th Saturday off')], default='none', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='weekly_offs',
+            field=models.CharField(default='6', help_text='Comma separated weekdays off, Monday=0 ... Sunday=6', max_length=20),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_lines(apps, schema_editor):
+    # Same walk as accounts.hierarchy.closure_rows, kept here so the migration
+    # doesn't depend on live app code
+    User = apps.get_model('accounts', 'User')
+    ReportingLine = apps.get_model('accounts', 'ReportingLine')
+    parents = dict(User.objects.values_list('id', 'reports_to_id'))
+    lines = []
+    for user_id in parents:
+        seen = {user_id}
+        depth, node = 1, parents[user_id]
+        while node is not None and node not in seen:
+            lines.append(ReportingLine(ancestor_id=node, descendant_id=user_id, depth=depth))
+            seen.add(node)
+            depth, node = depth + 1, parents.get(node)
+    ReportingLine.objects.bulk_create(lines, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_email_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportingLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_lines', to=settings.AUTH_USER_MODEL)),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_lines', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='reporting_line_up_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(backfill_lines, migrations.RunPython.noop),
+    ]
@@ -10,6 +10,23 @@ class Company(models.Model):
     smtp_server = models.CharField(max_length=100, default="smtp.gmail.com")
     smtp_port = models.IntegerField(default=587)
 
+    # Work calendar (see dashboard/workdays.py)
+    WEEKDAY_CHOICES = (
+        ('0', 'Monday'), ('1', 'Tuesday'), ('2', 'Wednesday'), ('3', 'Thursday'),
+        ('4', 'Friday'), ('5', 'Saturday'), ('6', 'Sunday'),
+    )
+    SATURDAY_RULES = (
+        ('none', 'No extra Saturdays off'),
+        ('2_4', '2nd & 4th Saturday off'),
+        ('1_3', '1st & 3rd Saturday off'),
+        ('1_3_5', '1st, 3rd & 5th Saturday off'),
+    )
+    weekly_offs = models.CharField(max_length=20, default='6', help_text="Comma separated weekdays off, Monday=0 ... Sunday=6")
+    saturday_rule = models.CharField(max_length=10, choices=SATURDAY_RULES, default='none')
+
+    def weekly_off_days(self):
+        return {int(d) for d in self.weekly_offs.split(',') if d.strip().isdigit()}
+
     def __str__(self):
         return self.name
 
@@ -54,9 +71,70 @@ class User(AbstractUser):
     professional_tax = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, help_text="Fixed Amount (e.g., 120)")
     otp = models.CharField(max_length=6, null=True, blank=True)
     is_approved = models.BooleanField(default=False)
+
+    # Denormalized count of unread Notifications (maintained by dashboard.notifications
+    # with F() updates; profile edits save with update_fields so they never write it back)
+    unread_notifications = models.PositiveIntegerField(default=0)
+
+    # Notification emails: one per event, or collapsed into a digest
+    DIGEST_CHOICES = (
+        ('instant', 'Email me every notification'),
+        ('hourly', 'Hourly digest'),
+        ('daily', 'Daily digest'),
+    )
+    email_digest = models.CharField(max_length=10, choices=DIGEST_CHOICES, default='instant')
+    digest_sent_at = models.DateTimeField(null=True, blank=True)
     
     # Reporting Manager
     reports_to = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='subordinates')
 
+    # reports_to is only moved by accounts.hierarchy.set_manager, which keeps
+    # ReportingLine in step; save() refuses a reports_to changed any other way
+    # instead of writing a value the closure doesn't know about
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        if 'reports_to_id' in user.__dict__:
+            user._saved_reports_to_id = user.reports_to_id
+        return user
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'reports_to' in fields or 'reports_to_id' in fields:
+            self._saved_reports_to_id = self.reports_to_id
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        writes_manager = 'reports_to_id' in self.__dict__ and (update_fields is None or 'reports_to' in update_fields)
+        if writes_manager:
+            if self._state.adding:
+                saved = None
+            else:
+                saved = getattr(self, '_saved_reports_to_id', self.reports_to_id)
+            if self.reports_to_id != saved:
+                raise ValueError("Change reports_to with accounts.hierarchy.set_manager(), which also updates ReportingLine.")
+        super().save(*args, **kwargs)
+        if writes_manager:
+            self._saved_reports_to_id = self.reports_to_id
+
+    def __str__(self):
+        return f"{self.username} ({self.role})"
+
+class ReportingLine(models.Model):
+    """
+    Closure of User.reports_to: one row per (manager, anyone below them), at
+    any distance. Maintained by accounts.hierarchy; never edit it directly.
+    """
+    ancestor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='descendant_lines')
+    descendant = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ancestor_lines')
+    depth = models.PositiveSmallIntegerField()  # 1 = direct report
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='reporting_line_up_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.username} ({self.role})"
\ No newline at end of file
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
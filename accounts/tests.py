@@ -1,3 +1,86 @@
 from django.test import TestCase
+from .hierarchy import HierarchyError, rebuild_reporting_lines, set_manager, subordinates, is_above
+from .models import Company, ReportingLine, User
 
-# Create your tests here.
+
+class ReportingLineTests(TestCase):
+    """ The closure table must always equal what a full rebuild from reports_to would produce """
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Acme', hr_email='hr@acme.test')
+        # a > b > c > d, and e on its own
+        self.a, self.b, self.c, self.d, self.e = [
+            User.objects.create_user(username=name, company=self.company) for name in 'abcde'
+        ]
+        set_manager(self.b, self.a)
+        set_manager(self.c, self.b)
+        set_manager(self.d, self.c)
+
+    def lines(self):
+        return set(ReportingLine.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def assertClosureConsistent(self):
+        stored = self.lines()
+        rebuild_reporting_lines()
+        self.assertEqual(stored, self.lines())
+
+    def test_chain(self):
+        self.assertEqual(set(subordinates(self.a)), {self.b, self.c, self.d})
+        self.assertTrue(is_above(self.a, self.d))
+        self.assertFalse(is_above(self.d, self.a))
+        self.assertIn((self.a.id, self.d.id, 3), self.lines())
+        self.assertClosureConsistent()
+
+    def test_subtree_move(self):
+        set_manager(self.b, self.e)
+
+        self.assertEqual(set(subordinates(self.e)), {self.b, self.c, self.d})
+        self.assertEqual(set(subordinates(self.a)), set())
+        self.assertIn((self.e.id, self.d.id, 3), self.lines())
+        self.assertEqual(User.objects.get(id=self.b.id).reports_to_id, self.e.id)
+        self.assertClosureConsistent()
+
+    def test_move_to_nobody(self):
+        set_manager(self.c, None)
+
+        self.assertEqual(set(subordinates(self.a)), {self.b})
+        self.assertEqual(set(subordinates(self.c)), {self.d})
+        self.assertClosureConsistent()
+
+    def test_cycle_rejected(self):
+        before = self.lines()
+        with self.assertRaises(HierarchyError):
+            set_manager(self.a, self.d)
+        with self.assertRaises(HierarchyError):
+            set_manager(self.b, self.b)
+
+        self.assertEqual(self.lines(), before)
+        self.assertIsNone(User.objects.get(id=self.a.id).reports_to_id)
+
+    def test_other_company_rejected(self):
+        other = Company.objects.create(name='Other', hr_email='hr@other.test')
+        outsider = User.objects.create_user(username='outsider', company=other)
+        with self.assertRaises(HierarchyError):
+            set_manager(self.e, outsider)
+
+    def test_deleting_a_manager(self):
+        self.b.delete()
+
+        self.assertIsNone(User.objects.get(id=self.c.id).reports_to_id)
+        self.assertEqual(set(subordinates(self.a)), set())
+        self.assertEqual(set(subordinates(self.c)), {self.d})
+        self.assertClosureConsistent()
+
+    def test_plain_save_cannot_move_reports_to(self):
+        self.e.reports_to = self.a
+        with self.assertRaises(ValueError):
+            self.e.save()
+
+        # Saving other fields (including after set_manager) is fine
+        self.e.reports_to = None
+        self.e.first_name = 'Eve'
+        self.e.save()
+        set_manager(self.e, self.a)
+        self.e.save()
+        self.assertEqual(User.objects.get(id=self.e.id).reports_to_id, self.a.id)
+        self.assertClosureConsistent()
@@ -2,7 +2,7 @@ import random
 from django.shortcuts import render, redirect
 from django.contrib.auth import login
 from django.contrib import messages
-from django.core.mail import send_mail, get_connection
+from dashboard.mailer import queue_mail
 from .forms import EmployeeSignupForm 
 from .models import User, Company  # <--- THIS IMPORT WAS MISSING
 
@@ -30,7 +30,7 @@ def signup(request):
                     existing_user.username = form.cleaned_data['username']
                     # We don't change password here to keep it simple
                 
-                existing_user.save()
+                existing_user.save(update_fields=['otp', 'username'])
                 
                 send_otp_email(existing_user, otp)
                 request.session['verify_email'] = email
@@ -74,7 +74,7 @@ def verify_otp(request):
                 # SUCCESS
                 user.is_active = True
                 user.otp = None # Clear OTP
-                user.save()
+                user.save(update_fields=['is_active', 'otp'])
                 
                 del request.session['verify_email']
                 messages.success(request, "Email verified! Please wait for HR approval to login.")
@@ -89,29 +89,7 @@ def verify_otp(request):
 
 # --- HELPER: Send Email via Company SMTP ---
 def send_otp_email(user, otp):
-    # Use the user's selected company SMTP
-    company = user.company
-    
-    connection = None
-    from_email = 'noreply@hrms.com'
-    
-    if company and company.smtp_email:
-        try:
-            connection = get_connection(
-                host=company.smtp_server,
-                port=company.smtp_port,
-                username=company.smtp_email,
-                password=company.smtp_password,
-                use_tls=True
-            )
-            from_email = company.smtp_email
-        except Exception as e:
-            print(f"SMTP Error: {e}")
-
+    # Queued for the send_queued_mail worker, which uses the user's company SMTP
     subject = "Verify Your Employee Account"
     message = f"Hello {user.username},\n\nYour OTP is: {otp}\n\nEnter this code to verify your email address."
-    
-    try:
-        send_mail(subject, message, from_email, [user.email], connection=connection, fail_silently=False)
-    except Exception as e:
-        print(f"Mail Send Error: {e}")
\ No newline at end of file
+    queue_mail(subject, message, [user.email], company=user.company, from_email='noreply@hrms.com')
\ No newline at end of file
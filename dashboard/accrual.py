@@ -0,0 +1,136 @@
+import calendar
+from datetime import date
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Least
+from accounts.models import User
+from .models import LeaveBalance, LeaveAccrualRun, LeaveLedgerEntry
+from .ledger import LEAVE_TYPE
+
+# Rows per UPDATE statement; keeps each statement's lock footprint small
+CHUNK_SIZE = 5000
+
+
+# Each rule is (SQL expression for the UPDATE, the same rule in Python for the ledger delta)
+
+def _credit(field, amount, cap):
+    if cap is None:
+        return F(field) + amount, lambda v: v + amount
+    # Stop at the cap, but never claw back a balance HR deliberately set above it
+    return (
+        Least(F(field) + amount, Greatest(F(field), Value(cap))),
+        lambda v: min(v + amount, max(v, cap)),
+    )
+
+
+def _limit(field, cap):
+    return Least(F(field), Value(cap)), lambda v: min(v, cap)
+
+
+def _apply_in_chunks(queryset, run, source, rules, chunk_size=CHUNK_SIZE):
+    """
+    Set-based UPDATE over consecutive id ranges of `queryset`. Each chunk is
+    locked and read first, so the per-user deltas written to the ledger are
+    exactly what the UPDATE applies. Returns rows updated.
+    """
+    ids = list(queryset.order_by('id').values_list('id', flat=True))
+    fields = list(rules)
+    total = 0
+    for i in range(0, len(ids), chunk_size):
+        chunk_ids = ids[i:i + chunk_size]
+        chunk = queryset.filter(id__gte=chunk_ids[0], id__lte=chunk_ids[-1])
+        current = list(chunk.select_for_update(of=('self',)).values_list('user_id', *fields))
+
+        total += chunk.update(**{field: expr for field, (expr, _) in rules.items()})
+
+        entries = []
+        for user_id, *values in current:
+            for field, value in zip(fields, values):
+                delta = rules[field][1](value) - value
+                if delta:
+                    entries.append(LeaveLedgerEntry(
+                        user_id=user_id, leave_type=LEAVE_TYPE[field], delta=delta,
+                        source=source, accrual_run=run,
+                    ))
+        LeaveLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+    return total
+
+
+def _claim_period(company, year, month, kind):
+    """ Records the period as applied; None if an earlier run already did """
+    try:
+        with transaction.atomic():
+            return LeaveAccrualRun.objects.create(company=company, year=year, month=month, kind=kind)
+    except IntegrityError:
+        return None
+
+
+def ensure_balances(company):
+    """ Users created before LeaveBalance rows were automatic get one now """
+    missing = User.objects.filter(company=company, leave_balance__isnull=True).values_list('id', flat=True)
+    LeaveBalance.objects.bulk_create(
+        [LeaveBalance(user_id=user_id) for user_id in missing], batch_size=1000, ignore_conflicts=True
+    )
+
+
+@transaction.atomic
+def apply_carry_forward(company, policy, year, chunk_size=CHUNK_SIZE):
+    """ Start of `year`: trims balances to the carry-forward limits. None if already applied. """
+    run = _claim_period(company, year, 1, 'carry_forward')
+    if run is None:
+        return None
+
+    rules = {}
+    if policy.casual_carry_forward is not None:
+        rules['casual_leave'] = _limit('casual_leave', policy.casual_carry_forward)
+    if policy.sick_carry_forward is not None:
+        rules['sick_leave'] = _limit('sick_leave', policy.sick_carry_forward)
+
+    if rules:
+        run.employee_count = _apply_in_chunks(
+            LeaveBalance.objects.filter(user__company=company), run, 'carry_forward', rules, chunk_size
+        )
+        run.save(update_fields=['employee_count'])
+    return run
+
+
+@transaction.atomic
+def apply_monthly_credit(company, policy, year, month, chunk_size=CHUNK_SIZE):
+    """ Credits the month's leave to every eligible employee. None if already applied. """
+    run = _claim_period(company, year, month, 'monthly')
+    if run is None:
+        return None
+
+    rules = {}
+    if policy.casual_per_month:
+        rules['casual_leave'] = _credit('casual_leave', policy.casual_per_month, policy.casual_max_balance)
+    if policy.sick_per_month:
+        rules['sick_leave'] = _credit('sick_leave', policy.sick_per_month, policy.sick_max_balance)
+
+    if rules:
+        # Pro-rating: someone who joined after the cutoff day starts accruing next month
+        cutoff = date(year, month, min(policy.joiner_cutoff_day or 1, calendar.monthrange(year, month)[1]))
+        eligible = LeaveBalance.objects.filter(
+            user__company=company,
+            user__is_approved=True,
+            user__date_joined__date__lte=cutoff,
+        )
+        run.employee_count = _apply_in_chunks(eligible, run, 'accrual', rules, chunk_size)
+        run.save(update_fields=['employee_count'])
+    return run
+
+
+def run_accrual(company, year, month, chunk_size=CHUNK_SIZE):
+    """
+    Applies the company's policy for one month (January also closes the
+    previous year with the carry-forward limits first).
+    Returns (carry_forward_run, monthly_run); either is None when it was already applied.
+    """
+    policy = getattr(company, 'accrual_policy', None)
+    if policy is None or not policy.is_active:
+        return None, None
+
+    ensure_balances(company)
+    carry = apply_carry_forward(company, policy, year, chunk_size) if month == 1 else None
+    credit = apply_monthly_credit(company, policy, year, month, chunk_size)
+    return carry, credit
@@ -0,0 +1,205 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from accounts.models import User
+from .attendance import month_bounds
+from .models import TrackSheet, TaskItem, ProductivityMonth, TeamProductivityMonth, ProductivityRun
+
+# ==========================================
+# PRODUCTIVITY ANALYTICS
+# ==========================================
+# The HR analytics page only reads ProductivityMonth / TeamProductivityMonth.
+# They are rebuilt from the TrackSheet counters (plus one grouped TaskItem
+# query for late completions) by `manage.py refresh_productivity`, which only
+# recounts the (user, month) pairs whose sheets changed since its last run or
+# that were marked dirty (team/company change), then re-sums just the team
+# months those users were counted in before and after, plus the ones marked
+# dirty when a member was deleted.
+
+SHEET_FIELDS = [
+    'work_total', 'work_in_progress', 'work_completed',
+    'task_total', 'task_in_progress', 'task_completed',
+]
+COUNTER_FIELDS = ['days_logged'] + SHEET_FIELDS + ['task_late']
+
+# Sheets written by a transaction that was still open when the previous run
+# started carry an earlier updated_at; re-reading this much covers them
+RUN_OVERLAP = timedelta(minutes=5)
+
+
+# ==========================================
+# 1. PER-USER MONTHS
+# ==========================================
+
+def compute_user_months(user_ids, year, month):
+    """
+    Unsaved ProductivityMonth rows for the users that had any work log or
+    task in the month: one grouped query over TrackSheet, one over TaskItem.
+    """
+    first, last = month_bounds(year, month)
+    sums = TrackSheet.objects.filter(user_id__in=user_ids, date__range=(first, last)).values('user_id').annotate(
+        days_logged=Count('id', filter=Q(work_total__gt=0)),
+        **{f'sum_{name}': Sum(name) for name in SHEET_FIELDS},
+    )
+    late = dict(
+        TaskItem.objects.filter(
+            track_sheet__user_id__in=user_ids, date__range=(first, last), completed_on__gt=F('date')
+        ).values('track_sheet__user_id').annotate(n=Count('id')).values_list('track_sheet__user_id', 'n')
+    )
+    people = {
+        user_id: (company_id, team_id)
+        for user_id, company_id, team_id in User.objects.filter(id__in=user_ids).values_list('id', 'company_id', 'team_id')
+    }
+
+    rows = []
+    for row in sums:
+        company_id, team_id = people.get(row['user_id'], (None, None))
+        if company_id is None or not (row['sum_work_total'] or row['sum_task_total']):
+            continue
+        rows.append(ProductivityMonth(
+            user_id=row['user_id'], company_id=company_id, team_id=team_id, year=year, month=month,
+            days_logged=row['days_logged'], task_late=late.get(row['user_id'], 0),
+            **{name: row[f'sum_{name}'] for name in SHEET_FIELDS},
+        ))
+    return rows
+
+
+@transaction.atomic
+def refresh_user_months(user_ids, year, month):
+    """
+    Recounts one month for the given users; users with nothing left lose their
+    row. Returns (rows, team ids the users were counted in before or after).
+    """
+    user_ids = list(user_ids)
+    teams = set(ProductivityMonth.objects.filter(
+        user_id__in=user_ids, year=year, month=month, team__isnull=False
+    ).values_list('team_id', flat=True).distinct())
+    rows = compute_user_months(user_ids, year, month)
+    ProductivityMonth.objects.bulk_create(
+        rows,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user', 'year', 'month'],
+        update_fields=['company', 'team'] + COUNTER_FIELDS + ['dirty', 'updated_at'],
+    )
+    active = {row.user_id for row in rows}
+    ProductivityMonth.objects.filter(
+        user_id__in=[user_id for user_id in user_ids if user_id not in active], year=year, month=month
+    ).delete()
+    return rows, teams | {row.team_id for row in rows if row.team_id}
+
+
+# ==========================================
+# 2. TEAM ROLLUP
+# ==========================================
+
+@transaction.atomic
+def refresh_team_months(year, month, team_ids=None):
+    """ Re-sums the month's rollups for `team_ids` (every team if None) from ProductivityMonth (one grouped query) """
+    members = ProductivityMonth.objects.filter(year=year, month=month, team__isnull=False)
+    rollups = TeamProductivityMonth.objects.filter(year=year, month=month)
+    if team_ids is not None:
+        members = members.filter(team_id__in=team_ids)
+        rollups = rollups.filter(team_id__in=team_ids)
+    sums = members.values('team_id', 'team__company_id').annotate(
+        members=Count('id'), **{f'sum_{name}': Sum(name) for name in COUNTER_FIELDS},
+    )
+    rows = [
+        TeamProductivityMonth(
+            team_id=row['team_id'], company_id=row['team__company_id'], year=year, month=month,
+            members=row['members'], **{name: row[f'sum_{name}'] for name in COUNTER_FIELDS},
+        )
+        for row in sums
+    ]
+    TeamProductivityMonth.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['team', 'year', 'month'],
+        update_fields=['company', 'members'] + COUNTER_FIELDS + ['dirty', 'updated_at'],
+    )
+    rollups.exclude(team_id__in=[row.team_id for row in rows]).delete()
+    return rows
+
+
+# ==========================================
+# 3. INCREMENTAL REFRESH (refresh_productivity command)
+# ==========================================
+
+def changed_months(since=None):
+    """ {(year, month): {user_id, ...}} for sheets updated at or after `since` (every sheet if None) """
+    sheets = TrackSheet.objects.all()
+    if since is not None:
+        sheets = sheets.filter(updated_at__gte=since)
+    months = defaultdict(set)
+    for user_id, day in sheets.annotate(m=TruncMonth('date')).values_list('user_id', 'm').distinct():
+        months[day.year, day.month].add(user_id)
+    return months
+
+
+def dirty_months():
+    """ {(year, month): {user_id, ...}} for rows marked by mark_moved """
+    months = defaultdict(set)
+    for user_id, year, month in ProductivityMonth.objects.filter(dirty=True).values_list('user_id', 'year', 'month'):
+        months[year, month].add(user_id)
+    return months
+
+
+def mark_moved(user):
+    """ After `user` changed team or company: the next run recounts their months and re-sums the old and new teams """
+    ProductivityMonth.objects.filter(user=user).update(dirty=True)
+
+
+def forget_user(user):
+    """ Before `user` is deleted: their rows cascade away, so the team months they were counted in get re-summed """
+    match = Q()
+    for team_id, year, month in ProductivityMonth.objects.filter(user=user, team__isnull=False).values_list(
+        'team_id', 'year', 'month'
+    ):
+        match |= Q(team_id=team_id, year=year, month=month)
+    if match:
+        TeamProductivityMonth.objects.filter(match).update(dirty=True)
+
+
+def refresh_productivity(full=False, chunk_size=2000, log=None):
+    """
+    Recounts every (user, month) touched since the last finished run or
+    marked dirty (or everything with `full`, or when there was no run yet),
+    one short transaction per chunk of users, then re-sums the team months
+    those users affect plus the ones marked dirty. Returns the ProductivityRun.
+    """
+    last = ProductivityRun.objects.filter(finished_at__isnull=False).order_by('-started_at').first()
+    full = full or last is None
+    run = ProductivityRun.objects.create(started_at=timezone.now(), full=full)
+
+    months = changed_months(None if full else last.started_at - RUN_OVERLAP)
+    for key, user_ids in dirty_months().items():
+        months[key] |= user_ids
+    teams = defaultdict(set)
+    for year, month, team_id in TeamProductivityMonth.objects.filter(dirty=True).values_list('year', 'month', 'team_id'):
+        teams[year, month].add(team_id)
+
+    for (year, month), user_ids in sorted(months.items()):
+        user_ids = sorted(user_ids)
+        written = 0
+        for i in range(0, len(user_ids), chunk_size):
+            rows, team_ids = refresh_user_months(user_ids[i:i + chunk_size], year, month)
+            written += len(rows)
+            teams[year, month] |= team_ids
+        run.rows_written += written
+        if log:
+            log(year, month, len(user_ids), written)
+
+    if full:
+        for year, month in set(months) | set(TeamProductivityMonth.objects.values_list('year', 'month').distinct()):
+            refresh_team_months(year, month)
+    else:
+        for (year, month), team_ids in teams.items():
+            refresh_team_months(year, month, team_ids)
+
+    run.months_refreshed = len(months)
+    run.finished_at = timezone.now()
+    run.save(update_fields=['months_refreshed', 'rows_written', 'finished_at'])
+    return run
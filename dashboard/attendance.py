@@ -0,0 +1,294 @@
+import calendar
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+from django.db import transaction
+from django.db.models import Count
+from accounts.models import User, Company
+from .models import AttendanceRecord, AttendanceMonthSummary
+from .workdays import month_off_days
+
+SUMMARY_FIELDS = ['total_days', 'present', 'absent', 'wfh', 'leave', 'holiday', 'late_2nd', 'late_3rd']
+
+# AttendanceRecord.status -> summary counter
+STATUS_FIELD = {
+    'Present': 'present',
+    'Absent': 'absent',
+    'WFH': 'wfh',
+    'Leave': 'leave',
+    'Holiday': 'holiday',
+    '2nd Late': 'late_2nd',
+    '3rd Late': 'late_3rd',
+}
+
+
+def month_bounds(year, month):
+    num_days = calendar.monthrange(year, month)[1]
+    return date(year, month, 1), date(year, month, num_days)
+
+
+# ==========================================
+# 1. BUILDING SUMMARIES (grouped queries)
+# ==========================================
+
+def compute_month_summaries(user_ids, year, month):
+    """
+    Returns unsaved AttendanceMonthSummary objects for the given users.
+    Two grouped queries (status counts, records on off days) plus the cached
+    work calendar, however many users are passed in. Unmarked weekly offs and
+    holidays count as Holiday, other unmarked days as Present.
+    """
+    user_ids = list(user_ids)
+    first, last = month_bounds(year, month)
+    num_days = last.day
+
+    company_of = dict(User.objects.filter(id__in=user_ids).values_list('id', 'company_id'))
+    companies = Company.objects.in_bulk(set(company_of.values()) - {None})
+
+    # 1. Status counts per user
+    counts = defaultdict(dict)
+    rows = AttendanceRecord.objects.filter(
+        user_id__in=user_ids, date__gte=first, date__lte=last
+    ).values('user_id', 'status').annotate(n=Count('id'))
+    for row in rows:
+        counts[row['user_id']][row['status']] = row['n']
+
+    # 2. Non-working dates (weekly offs + holidays) per company, from the cached work calendar
+    holidays = defaultdict(set)
+    for company_id, company in companies.items():
+        holidays[company_id] = month_off_days(company, year, month)
+
+    # 3. Off days that already have an explicit record (those follow the record, not the calendar)
+    marked_holidays = defaultdict(int)
+    all_holidays = set().union(*holidays.values()) if holidays else set()
+    if all_holidays:
+        for user_id, day in AttendanceRecord.objects.filter(
+            user_id__in=user_ids, date__in=all_holidays
+        ).values_list('user_id', 'date'):
+            if day in holidays[company_of.get(user_id)]:
+                marked_holidays[user_id] += 1
+
+    summaries = []
+    for user_id in user_ids:
+        c = counts.get(user_id, {})
+        marked = sum(c.values())
+        unmarked_holiday = len(holidays[company_of.get(user_id)]) - marked_holidays[user_id]
+        unmarked_present = num_days - marked - unmarked_holiday
+
+        summary = AttendanceMonthSummary(user_id=user_id, year=year, month=month, total_days=num_days)
+        for status, field in STATUS_FIELD.items():
+            setattr(summary, field, c.get(status, 0))
+        summary.present += summary.wfh + unmarked_present
+        summary.holiday += unmarked_holiday
+        summaries.append(summary)
+    return summaries
+
+
+def refresh_month_summaries(user_ids, year, month):
+    """ Recomputes and upserts the summary rows of the given users for one month """
+    summaries = compute_month_summaries(user_ids, year, month)
+    AttendanceMonthSummary.objects.bulk_create(
+        summaries,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user', 'year', 'month'],
+        update_fields=SUMMARY_FIELDS + ['updated_at'],
+    )
+    return summaries
+
+
+def refresh_company_month(company_id, year, month):
+    user_ids = User.objects.filter(company_id=company_id).values_list('id', flat=True)
+    refresh_month_summaries(user_ids, year, month)
+
+
+def refresh_company_summaries(company_id):
+    """
+    After a weekly-off / Saturday rule change: recounts every month that has
+    summaries for the company, whatever the year (missing months are built on
+    first read anyway). Returns the number of months recounted.
+    """
+    months = sorted(AttendanceMonthSummary.objects.filter(user__company_id=company_id).values_list(
+        'year', 'month'
+    ).distinct())
+    for year, month in months:
+        refresh_company_month(company_id, year, month)
+    return len(months)
+
+
+def ensure_month_summaries(user_ids, year, month):
+    """ Builds rows only for users that don't have one yet (e.g. before the backfill ran) """
+    user_ids = set(user_ids)
+    existing = set(AttendanceMonthSummary.objects.filter(
+        user_id__in=user_ids, year=year, month=month
+    ).values_list('user_id', flat=True))
+    missing = user_ids - existing
+    if missing:
+        refresh_month_summaries(missing, year, month)
+
+
+def get_month_summary(user, year, month):
+    summary = AttendanceMonthSummary.objects.filter(user=user, year=year, month=month).first()
+    if summary is None:
+        summary = refresh_month_summaries([user.id], year, month)[0]
+    return summary
+
+
+# ==========================================
+# 2. INCREMENTAL MAINTENANCE
+# ==========================================
+# Writes only mark (user, month) as dirty; the recount runs once when the
+# surrounding transaction commits, so a 30-day leave approval costs one refresh.
+
+_dirty = threading.local()
+
+
+def mark_month_dirty(user_id, day):
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    mark_months_dirty([(user_id, day.year, day.month)])
+
+
+def mark_months_dirty(keys):
+    """ keys: iterable of (user_id, year, month) """
+    pending = getattr(_dirty, 'keys', None)
+    if pending is None:
+        pending = _dirty.keys = set()
+    pending.update(keys)
+    transaction.on_commit(flush_dirty_months)
+
+
+def flush_dirty_months():
+    keys = getattr(_dirty, 'keys', None)
+    if not keys:
+        return
+    _dirty.keys = set()
+
+    by_month = defaultdict(set)
+    for user_id, year, month in keys:
+        by_month[(year, month)].add(user_id)
+    for (year, month), user_ids in by_month.items():
+        refresh_month_summaries(user_ids, year, month)
+
+
+# ==========================================
+# 3. BATCHED WRITES
+# ==========================================
+
+def upsert_attendance(records, update_fields=('status', 'login_time', 'marked_by')):
+    """
+    Inserts or overwrites (user, date) rows in batches; an existing row only
+    gets `update_fields` overwritten. bulk_create skips signals so summaries are marked here.
+    """
+    AttendanceRecord.objects.bulk_create(
+        records,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=list(update_fields),
+    )
+    mark_months_dirty({(r.user_id, r.date.year, r.date.month) for r in records})
+
+
+def cancel_second_lates(user_ids, days):
+    """
+    Applies the '3rd Late cancels the previous 2nd Late of the month' rule for
+    every (user, day) about to be marked 3rd Late. Days inside the marked range
+    are overwritten anyway, so only earlier 2nd Lates outside it are reset.
+    Returns the reset records as (user_id, date) pairs.
+    """
+    days = sorted(days)
+    marked = set(days)
+    candidates = defaultdict(list)
+    for record_id, user_id, day in AttendanceRecord.objects.filter(
+        user_id__in=user_ids,
+        status='2nd Late',
+        date__gte=days[0].replace(day=1),
+        date__lt=days[-1],
+    ).exclude(date__in=marked).order_by('date').values_list('id', 'user_id', 'date'):
+        candidates[user_id].append((day, record_id))
+
+    reset_ids, reset = [], []
+    for user_id, lates in candidates.items():
+        for day in days:
+            # Latest remaining 2nd Late of the same month before this day
+            for i in range(len(lates) - 1, -1, -1):
+                late_day, record_id = lates[i]
+                if late_day < day and (late_day.year, late_day.month) == (day.year, day.month):
+                    reset_ids.append(record_id)
+                    reset.append((user_id, late_day))
+                    del lates[i]
+                    break
+
+    if reset_ids:
+        AttendanceRecord.objects.filter(id__in=reset_ids).update(status='Present')
+        mark_months_dirty({(user_id, d.year, d.month) for user_id, d in reset})
+    return reset
+
+
+@transaction.atomic
+def bulk_mark_attendance(user_ids, start, end, status, login_time=None, marked_by=None):
+    """ Sets one status for every user on every day of [start, end] in a single transaction """
+    user_ids = list(user_ids)
+    days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+    if not user_ids or not days:
+        return 0, []
+
+    reset = []
+    if status == '3rd Late':
+        reset = cancel_second_lates(user_ids, days)
+
+    records = [
+        AttendanceRecord(user_id=user_id, date=day, status=status, login_time=login_time, marked_by=marked_by)
+        for user_id in user_ids
+        for day in days
+    ]
+    upsert_attendance(records)
+    return len(records), reset
+
+
+# ==========================================
+# 4. TEAM CALENDAR MATRIX
+# ==========================================
+# Each employee's month is a bytearray with one ASCII code per day, so a
+# 300 x 31 grid is 300 small buffers instead of ~9,000 dicts.
+
+CELL_CODES = {
+    'Present': ord('P'),
+    'Absent': ord('A'),
+    'WFH': ord('W'),
+    'Leave': ord('L'),
+    '2nd Late': ord('2'),
+    '3rd Late': ord('3'),
+    'Holiday': ord('H'),
+}
+UPCOMING = ord('.')
+UNKNOWN = ord('?')  # a status outside STATUS_CHOICES (written before it was validated)
+
+
+def team_month_matrix(company, user_ids, year, month, today=None):
+    """
+    {user_id: bytearray(num_days)} for `user_ids` in one AttendanceRecord query.
+    Unmarked days follow the rest of the app: off days are Holiday, past
+    working days Present, and days after `today` are left blank ('.').
+    """
+    today = today or date.today()
+    first, last = month_bounds(year, month)
+    off_days = month_off_days(company, year, month)
+
+    base = bytearray(last.day)
+    for n in range(last.day):
+        day = first + timedelta(days=n)
+        if day in off_days:
+            base[n] = CELL_CODES['Holiday']
+        elif day > today:
+            base[n] = UPCOMING
+        else:
+            base[n] = CELL_CODES['Present']
+
+    matrix = {user_id: bytearray(base) for user_id in user_ids}
+    for user_id, day, status in AttendanceRecord.objects.filter(
+        user_id__in=matrix, date__gte=first, date__lte=last
+    ).values_list('user_id', 'date', 'status'):
+        matrix[user_id][day.day - 1] = CELL_CODES.get(status, UNKNOWN)
+    return matrix
@@ -0,0 +1,12 @@
+from django.conf import settings
+
+
+def unread_notifications(request):
+    """ Navbar badge; read from the already-loaded request.user, so no query """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {
+        'unread_notifications': user.unread_notifications,
+        'realtime_push': getattr(settings, 'REALTIME_PUSH', False),
+    }
@@ -0,0 +1,191 @@
+import calendar
+import csv
+import zipfile
+from datetime import date
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from accounts.models import User
+from .models import AttendanceRecord
+from .workdays import month_off_days, working_days_in_month
+from .payroll import calculate_salary
+
+CHUNK_SIZE = 2000
+
+# Short codes keep the day columns narrow in the sheet
+STATUS_CODES = {
+    'Present': 'P',
+    'Absent': 'A',
+    'WFH': 'WFH',
+    'Leave': 'L',
+    '2nd Late': 'L2',
+    '3rd Late': 'L3',
+    'Holiday': 'H',
+}
+
+
+# ==========================================
+# 1. ROW GENERATOR
+# ==========================================
+
+def attendance_sheet_rows(company, year, month):
+    """
+    Yields the month's attendance + salary sheet one employee at a time.
+    Users and records are both streamed in id order with .iterator() and merged,
+    so memory stays flat whatever the company size.
+    """
+    num_days = calendar.monthrange(year, month)[1]
+    first, last = date(year, month, 1), date(year, month, num_days)
+    off_days = month_off_days(company, year, month)
+    working_days = working_days_in_month(company, year, month)
+
+    yield (
+        ['Employee', 'Email', 'Team', 'Role']
+        + [str(d) for d in range(1, num_days + 1)]
+        + ['Present', 'Absent', 'Leave', 'WFH', 'Holiday', '2nd Late', '3rd Late',
+           'Base Salary', 'Deductions', 'Gross Salary', 'ESI', 'Professional Tax', 'Net Salary']
+    )
+
+    users = User.objects.filter(company=company, is_approved=True).select_related('team').only(
+        'id', 'username', 'email', 'role', 'team__name', 'monthly_salary', 'esi_percentage', 'professional_tax'
+    ).order_by('id').iterator(chunk_size=CHUNK_SIZE)
+
+    records = AttendanceRecord.objects.filter(
+        user__company=company, user__is_approved=True, date__gte=first, date__lte=last
+    ).order_by('user_id', 'date').values_list('user_id', 'date', 'status').iterator(chunk_size=CHUNK_SIZE)
+
+    pending = next(records, None)
+    for user in users:
+        # Records of users we have already passed (shouldn't happen, but never stall)
+        while pending and pending[0] < user.id:
+            pending = next(records, None)
+
+        statuses = {}
+        while pending and pending[0] == user.id:
+            statuses[pending[1]] = pending[2]
+            pending = next(records, None)
+
+        days, counts = [], dict.fromkeys(STATUS_CODES, 0)
+        for day in range(1, num_days + 1):
+            current_date = date(year, month, day)
+            status = statuses.get(current_date) or ('Holiday' if current_date in off_days else 'Present')
+            # A status outside STATUS_CODES is written as-is and left out of the totals
+            if status in counts:
+                counts[status] += 1
+            days.append(STATUS_CODES.get(status, status))
+
+        slip = calculate_salary(
+            user.monthly_salary, user.esi_percentage, user.professional_tax,
+            working_days, counts['Absent'], counts['2nd Late'], counts['3rd Late']
+        )
+
+        yield (
+            [user.username, user.email, user.team.name if user.team else '', user.role]
+            + days
+            + [counts['Present'] + counts['WFH'], counts['Absent'], counts['Leave'], counts['WFH'],
+               counts['Holiday'], counts['2nd Late'], counts['3rd Late'],
+               slip['base_salary'], slip['full_day_deduction'] + slip['half_day_deduction'], slip['gross_salary'],
+               slip['esi_amount'], slip['p_tax'], slip['net_salary']]
+        )
+
+
+# ==========================================
+# 2. WRITERS
+# ==========================================
+
+class Echo:
+    """ File-like object whose write() just hands the value back (Django's streaming CSV recipe) """
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class _ChunkBuffer:
+    """ Unseekable sink for zipfile; the XLSX generator drains it after each batch of rows """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Attendance" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f'<c t="n"><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def iter_xlsx(rows, flush_every=500):
+    """
+    Minimal streamed XLSX (inline strings, no styles) written through zipfile
+    into an unseekable buffer, so finished bytes can be sent while rows are
+    still being produced.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as book:
+        for name, xml in XLSX_PARTS.items():
+            book.writestr(name, xml)
+        yield buffer.drain()
+
+        with book.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for n, row in enumerate(rows, start=1):
+                sheet.write(('<row>' + ''.join(_xlsx_cell(v) for v in row) + '</row>').encode('utf-8'))
+                if n % flush_every == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'xlsx': (iter_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
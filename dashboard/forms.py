@@ -1,7 +1,8 @@
 from django import forms
 from django.db.models import Q
-from .models import LeaveRequest, LeaveBalance
-from accounts.models import User, Company # Import Company
+from .models import LeaveRequest, LeaveBalance, AttendanceRecord, PublicHoliday, LeaveAccrualPolicy, Broadcast
+from accounts.models import User, Company, Team # Import Company
+from accounts.hierarchy import subordinates
 
 class SMTPSettingsForm(forms.ModelForm):
     class Meta:
@@ -73,6 +74,143 @@ class LeaveApplicationForm(forms.ModelForm):
         return cleaned_data
 
 class LeaveAllocationForm(forms.ModelForm):
+    note = forms.CharField(max_length=200, required=False, help_text="Reason for the change (kept in the leave history)")
+
     class Meta:
         model = LeaveBalance
-        fields = ['casual_leave', 'sick_leave']
\ No newline at end of file
+        fields = ['casual_leave', 'sick_leave']
+
+class NotificationPreferenceForm(forms.ModelForm):
+    class Meta:
+        model = User
+        fields = ['email_digest']
+        labels = {'email_digest': 'Email'}
+
+class BroadcastForm(forms.ModelForm):
+    class Meta:
+        model = Broadcast
+        fields = ['team', 'title', 'message']
+        widgets = {
+            'message': forms.Textarea(attrs={'rows': 5}),
+        }
+
+    def __init__(self, company, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['team'].queryset = Team.objects.filter(company=company)
+        self.fields['team'].empty_label = "Everyone in the company"
+        self.fields['team'].required = False
+
+class LeaveAccrualPolicyForm(forms.ModelForm):
+    class Meta:
+        model = LeaveAccrualPolicy
+        fields = [
+            'is_active', 'casual_per_month', 'sick_per_month',
+            'casual_max_balance', 'sick_max_balance',
+            'casual_carry_forward', 'sick_carry_forward', 'joiner_cutoff_day',
+        ]
+
+    def clean_joiner_cutoff_day(self):
+        day = self.cleaned_data['joiner_cutoff_day']
+        if not 1 <= day <= 31:
+            raise forms.ValidationError("Enter a day between 1 and 31.")
+        return day
+
+class BulkAttendanceForm(forms.Form):
+    team = forms.ModelChoiceField(queryset=Team.objects.none(), required=False, empty_label="-- No Team --")
+    users = forms.ModelMultipleChoiceField(
+        queryset=User.objects.none(),
+        widget=forms.CheckboxSelectMultiple,
+        required=False,
+        label="Employees"
+    )
+    start_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    status = forms.ChoiceField(choices=AttendanceRecord.STATUS_CHOICES)
+    login_time = forms.TimeField(required=False, widget=forms.TimeInput(attrs={'type': 'time'}))
+
+    MAX_DAYS = 62
+
+    def __init__(self, user, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.marker = user
+
+        # HR marks anyone in the company; Manager/TL only people under them + employees of their team
+        if user.role == 'HR':
+            people = User.objects.filter(company=user.company, is_approved=True)
+            teams = Team.objects.filter(company=user.company)
+        else:
+            criteria = Q(pk__in=subordinates(user).values('pk'))
+            if user.team:
+                criteria |= Q(team=user.team, role='Employee')
+            people = User.objects.filter(criteria, company=user.company, is_approved=True).exclude(id=user.id)
+            teams = Team.objects.filter(id=user.team_id)
+
+        self.fields['users'].queryset = people.order_by('username')
+        self.fields['team'].queryset = teams
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get("start_date")
+        end = cleaned_data.get("end_date")
+
+        if start and end:
+            if end < start:
+                raise forms.ValidationError("End date cannot be before start date.")
+            if (end - start).days + 1 > self.MAX_DAYS:
+                raise forms.ValidationError(f"A single bulk update can cover at most {self.MAX_DAYS} days.")
+
+        if not cleaned_data.get('team') and not cleaned_data.get('users'):
+            raise forms.ValidationError("Select a team or at least one employee.")
+        return cleaned_data
+
+    def target_user_ids(self):
+        """ Selected users + members of the selected team, limited to people this marker may edit """
+        allowed = self.fields['users'].queryset
+        ids = {u.id for u in self.cleaned_data.get('users') or []}
+        team = self.cleaned_data.get('team')
+        if team:
+            ids |= set(allowed.filter(team=team).values_list('id', flat=True))
+        return sorted(ids)
+
+
+class BulkTaskForm(BulkAttendanceForm):
+    """ Same people and date pickers as bulk attendance, assigning a task instead of a status """
+    status = None
+    login_time = None
+    task = forms.CharField(max_length=255, widget=forms.TextInput(attrs={'placeholder': 'What needs doing?'}))
+    working_days_only = forms.BooleanField(required=False, initial=True, label="Skip week offs and holidays")
+
+    MAX_DAYS = 31
+
+
+class PublicHolidayForm(forms.ModelForm):
+    class Meta:
+        model = PublicHoliday
+        fields = ['date', 'name']
+        widgets = {
+            'date': forms.DateInput(attrs={'type': 'date'}),
+        }
+
+
+class HolidayImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV with date,name rows (YYYY-MM-DD) or an .ics calendar")
+
+
+class WorkCalendarForm(forms.ModelForm):
+    weekly_offs = forms.MultipleChoiceField(
+        choices=Company.WEEKDAY_CHOICES,
+        widget=forms.CheckboxSelectMultiple,
+        required=False,
+        label="Weekly Offs"
+    )
+
+    class Meta:
+        model = Company
+        fields = ['weekly_offs', 'saturday_rule']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.initial['weekly_offs'] = [str(d) for d in sorted(self.instance.weekly_off_days())]
+
+    def clean_weekly_offs(self):
+        return ','.join(sorted(self.cleaned_data['weekly_offs']))
@@ -0,0 +1,146 @@
+import bisect
+import csv
+import io
+import time
+from datetime import date, datetime
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from .models import PublicHoliday
+
+# ==========================================
+# 1. CALENDAR CACHE
+# ==========================================
+# Holidays change a few times a year, so each (company, year) is loaded once
+# as a sorted tuple of dates into the Django cache named by
+# settings.HOLIDAY_CACHE ('default' if unset). Entries are keyed by a
+# per-(company, year) version (a timestamp, so an evicted version never
+# comes back) that invalidate() replaces; a reader that loaded before the
+# change can only write to a key nobody reads any more.
+# With a per-process cache (LocMemCache) the other workers catch up within
+# HOLIDAY_CACHE_TIMEOUT; point HOLIDAY_CACHE at a shared cache to make it immediate.
+# PublicHoliday post_save/post_delete (see signals.py) call invalidate().
+
+HOLIDAY_CACHE_TIMEOUT = 300
+
+
+def _cache():
+    return caches[getattr(settings, 'HOLIDAY_CACHE', 'default')]
+
+
+def _version_key(company_id, year):
+    return f'holidays:version:{company_id}:{year}'
+
+
+def _load(company_id, year):
+    return tuple(sorted(set(PublicHoliday.objects.filter(
+        company_id=company_id, date__year=year
+    ).values_list('date', flat=True))))
+
+
+def year_holidays(company_id, year):
+    """ Sorted tuple of the company's holiday dates in `year` """
+    cache = _cache()
+    version = cache.get_or_set(_version_key(company_id, year), time.time_ns, None)
+    key = f'holidays:{company_id}:{year}:{version}'
+    dates = cache.get(key)
+    if dates is None:
+        dates = _load(company_id, year)
+        cache.set(key, dates, HOLIDAY_CACHE_TIMEOUT)
+    return dates
+
+
+def holidays_between(company_id, start, end):
+    """ Holiday dates in [start, end] (inclusive), using the cached year calendars """
+    result = []
+    for year in range(start.year, end.year + 1):
+        dates = year_holidays(company_id, year)
+        result.extend(dates[bisect.bisect_left(dates, start):bisect.bisect_right(dates, end)])
+    return result
+
+
+def month_holidays(company_id, year, month):
+    dates = year_holidays(company_id, year)
+    first = date(year, month, 1)
+    last = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return set(dates[bisect.bisect_left(dates, first):bisect.bisect_left(dates, last)])
+
+
+def is_holiday(company_id, day):
+    dates = year_holidays(company_id, day.year)
+    i = bisect.bisect_left(dates, day)
+    return i < len(dates) and dates[i] == day
+
+
+def invalidate(company_id, year):
+    _cache().set(_version_key(company_id, year), time.time_ns(), None)
+
+
+# ==========================================
+# 2. BULK IMPORT (CSV / ICS)
+# ==========================================
+
+def parse_holiday_csv(text):
+    """ Rows of `date,name` (YYYY-MM-DD); a header row is skipped """
+    holidays = []
+    for line_no, row in enumerate(csv.reader(io.StringIO(text)), start=1):
+        if not row or not row[0].strip():
+            continue
+        try:
+            day = date.fromisoformat(row[0].strip())
+        except ValueError:
+            if line_no == 1 and not any(ch.isdigit() for ch in row[0]):
+                continue  # header
+            raise ValueError(f"Line {line_no}: '{row[0]}' is not a YYYY-MM-DD date.")
+        name = row[1].strip() if len(row) > 1 and row[1].strip() else 'Holiday'
+        holidays.append((day, name[:100]))
+    return holidays
+
+
+def parse_holiday_ics(text):
+    """ All-day VEVENTs from an iCalendar file (DTSTART + SUMMARY) """
+    # Unfold continuation lines (RFC 5545: a line starting with a space continues the previous one)
+    text = text.replace('\r\n', '\n').replace('\n ', '').replace('\n\t', '')
+
+    holidays = []
+    day, name = None, None
+    for line in text.split('\n'):
+        key, _, value = line.partition(':')
+        key = key.split(';')[0].upper()
+        if key == 'BEGIN' and value.strip().upper() == 'VEVENT':
+            day, name = None, None
+        elif key == 'DTSTART':
+            try:
+                day = datetime.strptime(value.strip()[:8], '%Y%m%d').date()
+            except ValueError:
+                raise ValueError(f"Invalid DTSTART '{value.strip()}'.")
+        elif key == 'SUMMARY':
+            name = value.strip().replace('\\,', ',').replace('\\;', ';')
+        elif key == 'END' and value.strip().upper() == 'VEVENT' and day:
+            holidays.append((day, (name or 'Holiday')[:100]))
+    return holidays
+
+
+@transaction.atomic
+def import_holidays(company, holidays):
+    """ Adds the dates the company doesn't have yet. Returns the number created. """
+    from .attendance import refresh_company_month
+
+    wanted = {}
+    for day, name in holidays:
+        wanted.setdefault(day, name)
+    if not wanted:
+        return 0
+
+    existing = set(PublicHoliday.objects.filter(
+        company=company, date__in=list(wanted)
+    ).values_list('date', flat=True))
+    new = [PublicHoliday(company=company, date=d, name=n) for d, n in wanted.items() if d not in existing]
+    PublicHoliday.objects.bulk_create(new, batch_size=500)
+
+    # bulk_create skips signals: invalidate + refresh summaries here
+    for year in {h.date.year for h in new}:
+        transaction.on_commit(lambda y=year: invalidate(company.id, y))
+    for year, month in {(h.date.year, h.date.month) for h in new}:
+        transaction.on_commit(lambda y=year, m=month: refresh_company_month(company.id, y, m))
+    return len(new)
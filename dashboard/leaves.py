@@ -0,0 +1,261 @@
+from django.db import transaction
+from datetime import timedelta
+from django.db.models import Q
+from .models import LeaveRequest, LeaveBalance, LeaveLedgerEntry, AttendanceRecord
+from .attendance import upsert_attendance
+from .ledger import BALANCE_FIELD, debit_leave
+from .realtime import publish
+from .workdays import working_dates
+
+
+class LeaveActionError(Exception):
+    """ Raised when a leave can't be approved/rejected; the message is shown to the approver """
+
+
+def publish_status(leaves, status):
+    """ Pushes the status change to the applicants' open pages after commit """
+    for leave_id, user_id in leaves:
+        publish([user_id], {'type': 'leave', 'id': leave_id, 'status': status})
+
+
+# An approved leave overwrites the day's status only; a login time already recorded stays
+LEAVE_UPDATE_FIELDS = ('status', 'marked_by')
+
+
+def leave_attendance_rows(leave, marked_by):
+    """ Only working days are marked; week offs/holidays inside the leave stay as they are """
+    return [
+        AttendanceRecord(user_id=leave.user_id, date=day, status='Leave', marked_by=marked_by)
+        for day in working_dates(leave.user.company, leave.start_date, leave.end_date)
+    ]
+
+
+@transaction.atomic
+def approve_leave(leave, actor):
+    """
+    Constant number of queries whatever the leave length:
+    1. claim the request (only a Pending request can be claimed, so two approvers can't both win)
+    2. conditional balance decrement (`balance >= days` checked inside the UPDATE) + its ledger entry
+    3. one batched upsert of the calendar days
+    Any failure raises and rolls the whole approval back.
+    """
+    claimed = LeaveRequest.objects.filter(id=leave.id, status='Pending').update(status='Approved', action_by=actor)
+    if not claimed:
+        raise LeaveActionError("This leave request has already been actioned.")
+
+    if leave.leave_type in BALANCE_FIELD:
+        if not debit_leave(leave, leave.days_requested, actor):
+            raise LeaveActionError("User has insufficient balance.")
+
+    upsert_attendance(leave_attendance_rows(leave, actor), LEAVE_UPDATE_FIELDS)
+    publish_status([(leave.id, leave.user_id)], 'Approved')
+
+    leave.status = 'Approved'
+    leave.action_by = actor
+    return leave
+
+
+def reject_leave(leave, actor):
+    claimed = LeaveRequest.objects.filter(id=leave.id, status='Pending').update(status='Rejected', action_by=actor)
+    if not claimed:
+        raise LeaveActionError("This leave request has already been actioned.")
+    publish_status([(leave.id, leave.user_id)], 'Rejected')
+
+    leave.status = 'Rejected'
+    leave.action_by = actor
+    return leave
+
+
+# ==========================================
+# BATCH ACTIONS (approval queue multi-select)
+# ==========================================
+
+@transaction.atomic
+def approve_leaves(leave_ids, actor):
+    """
+    Approves many requests in one transaction with a fixed number of queries:
+    the pending requests and their balances are loaded (and locked) once,
+    balances are checked in order of application, then one bulk balance
+    update, one ledger insert, one status update and one attendance upsert.
+    Requests without enough balance are skipped and stay Pending.
+    Returns (approved, skipped) lists of LeaveRequest.
+    """
+    leaves = list(
+        LeaveRequest.objects.select_for_update(of=('self',))
+        .filter(id__in=leave_ids, approvers=actor, status='Pending')
+        .select_related('user__company')
+        .order_by('applied_on', 'id')
+    )
+    if not leaves:
+        return [], []
+
+    balances = {
+        b.user_id: b for b in LeaveBalance.objects.select_for_update().filter(
+            user_id__in={leave.user_id for leave in leaves}
+        )
+    }
+
+    approved, skipped, changed, entries = [], [], {}, []
+    for leave in leaves:
+        field = BALANCE_FIELD.get(leave.leave_type)
+        if field:
+            balance = balances.get(leave.user_id)
+            days = leave.days_requested
+            if balance is None or getattr(balance, field) < days:
+                skipped.append(leave)
+                continue
+            setattr(balance, field, getattr(balance, field) - days)
+            changed[balance.user_id] = balance
+            entries.append(LeaveLedgerEntry(
+                user_id=leave.user_id, leave_type=leave.leave_type, delta=-days,
+                source='leave', leave_request=leave, actor=actor,
+            ))
+        approved.append(leave)
+
+    if changed:
+        # Rows are locked above, so writing the computed totals matches the ledger deltas
+        LeaveBalance.objects.bulk_update(changed.values(), ['casual_leave', 'sick_leave'], batch_size=500)
+        LeaveLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+    if approved:
+        ids = [leave.id for leave in approved]
+        claimed = LeaveRequest.objects.filter(id__in=ids, status='Pending').update(status='Approved', action_by=actor)
+        if claimed != len(ids):
+            raise LeaveActionError("Some of these requests were actioned in the meantime. Please try again.")
+
+        rows = []
+        for leave in approved:
+            leave.status = 'Approved'
+            leave.action_by = actor
+            rows.extend(leave_attendance_rows(leave, actor))
+        upsert_attendance(rows, LEAVE_UPDATE_FIELDS)
+        publish_status([(leave.id, leave.user_id) for leave in approved], 'Approved')
+
+    return approved, skipped
+
+
+@transaction.atomic
+def reject_leaves(leave_ids, actor):
+    """ Rejects every pending request in `leave_ids` the actor is an approver of. Returns the count. """
+    leaves = list(
+        LeaveRequest.objects.select_for_update(of=('self',))
+        .filter(id__in=leave_ids, approvers=actor, status='Pending')
+        .values_list('id', 'user_id')
+    )
+    if not leaves:
+        return 0
+    count = LeaveRequest.objects.filter(id__in=[leave_id for leave_id, _ in leaves], status='Pending').update(
+        status='Rejected', action_by=actor
+    )
+    publish_status(leaves, 'Rejected')
+    return count
+
+
+# ==========================================
+# OVERLAPS / WHO'S OUT
+# ==========================================
+# Leaves that still take someone out of the office. The range test
+# (start <= end_of_window AND end >= start_of_window) runs on the
+# (status, end_date, start_date) index of LeaveRequest.
+
+OVERLAP_STATUSES = ('Approved', 'Pending')
+
+
+def overlapping_leaves(company, start, end, team=None, manager=None, company_wide=False, exclude_user=None):
+    """
+    Approved/pending leaves in `company` intersecting [start, end].
+    `team` and `manager` narrow it to that team and/or the manager's direct
+    reports (either one matches). With neither, the whole company if
+    `company_wide`, otherwise nothing.
+    """
+    qs = LeaveRequest.objects.filter(
+        user__company=company,
+        status__in=OVERLAP_STATUSES,
+        end_date__gte=start,
+        start_date__lte=end,
+    )
+    scope = Q()
+    if team is not None:
+        scope |= Q(user__team=team)
+    if manager is not None:
+        scope |= Q(user__reports_to=manager)
+    if scope:
+        qs = qs.filter(scope)
+    elif not company_wide:
+        return LeaveRequest.objects.none()
+    if exclude_user is not None:
+        qs = qs.exclude(user=exclude_user)
+    return qs.select_related('user__company', 'user__team').order_by('start_date', 'user__username')
+
+
+def scope_for(user):
+    """ The colleagues whose absence matters to `user`: same team + same boss (+ own reports for leaders) """
+    if user.role == 'HR':
+        return {'company_wide': True}
+    if user.role in ['Manager', 'TL']:
+        return {'team': user.team, 'manager': user}
+    return {'team': user.team, 'manager': user.reports_to}
+
+
+WHOS_OUT_LIMIT = 50
+
+
+def whos_out(user, today):
+    """
+    {'today': [...], 'week': [...]} for the dashboard widget, at most
+    WHOS_OUT_LIMIT leaves each (HR sees the whole company); 'week_more' is
+    True when the week had more than that.
+    """
+    week_start = today - timedelta(days=today.weekday())
+    week_end = week_start + timedelta(days=6)
+    leaves = overlapping_leaves(user.company, week_start, week_end, **scope_for(user)).filter(status='Approved')
+    week = list(leaves[:WHOS_OUT_LIMIT + 1])
+    if len(week) > WHOS_OUT_LIMIT:
+        out_today = list(leaves.filter(start_date__lte=today, end_date__gte=today)[:WHOS_OUT_LIMIT])
+    else:
+        out_today = [leave for leave in week if leave.start_date <= today <= leave.end_date]
+    return {
+        'today': out_today,
+        'week': week[:WHOS_OUT_LIMIT],
+        'week_more': len(week) > WHOS_OUT_LIMIT,
+        'week_start': week_start,
+        'week_end': week_end,
+    }
+
+
+def overlaps_for_queue(leaves):
+    """
+    For each request on an approval page, the other approved/pending leaves of
+    the same team or the same manager that intersect it. One query covering
+    the whole page, matched up in Python. Returns {leave_id: [LeaveRequest]}.
+    """
+    if not leaves:
+        return {}
+    teams = {leave.user.team_id for leave in leaves if leave.user.team_id}
+    managers = {leave.user.reports_to_id for leave in leaves if leave.user.reports_to_id}
+    if not teams and not managers:
+        return {leave.id: [] for leave in leaves}
+
+    candidates = list(
+        LeaveRequest.objects.filter(
+            user__company_id=leaves[0].user.company_id,
+            status__in=OVERLAP_STATUSES,
+            end_date__gte=min(leave.start_date for leave in leaves),
+            start_date__lte=max(leave.end_date for leave in leaves),
+        ).filter(
+            Q(user__team_id__in=teams) | Q(user__reports_to_id__in=managers)
+        ).select_related('user__company').order_by('start_date')
+    )
+
+    result = {}
+    for leave in leaves:
+        result[leave.id] = [
+            other for other in candidates
+            if other.user_id != leave.user_id
+            and other.start_date <= leave.end_date and other.end_date >= leave.start_date
+            and (
+                (leave.user.team_id and other.user.team_id == leave.user.team_id)
+                or (leave.user.reports_to_id and other.user.reports_to_id == leave.user.reports_to_id)
+            )
+        ]
+    return result
@@ -0,0 +1,88 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F, Sum
+from .models import LeaveBalance, LeaveLedgerEntry
+
+# ==========================================
+# LEAVE LEDGER
+# ==========================================
+# Every balance change is a LeaveLedgerEntry; LeaveBalance is the snapshot
+# (running total) of those rows. Each writer inserts its entries and applies
+# the same deltas to the snapshot inside one transaction, so reads stay a
+# single-row lookup and `rebuild_leave_balances` can replay the history.
+
+# LeaveRequest.leave_type -> LeaveBalance column ('Notify' has no balance)
+BALANCE_FIELD = {
+    'Casual': 'casual_leave',
+    'Sick': 'sick_leave',
+}
+LEAVE_TYPE = {field: leave_type for leave_type, field in BALANCE_FIELD.items()}
+
+
+def post_entries(entries):
+    """
+    Appends `entries` and applies them to the snapshots: one INSERT batch and
+    one UPDATE per distinct (column, delta), which is a single UPDATE for the
+    common case of many users getting the same change.
+    """
+    entries = [e for e in entries if e.delta]
+    if not entries:
+        return []
+    LeaveLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+    totals = defaultdict(int)
+    for e in entries:
+        totals[(e.user_id, BALANCE_FIELD[e.leave_type])] += e.delta
+
+    groups = defaultdict(list)
+    for (user_id, field), delta in totals.items():
+        if delta:
+            groups[(field, delta)].append(user_id)
+    for (field, delta), user_ids in groups.items():
+        LeaveBalance.objects.filter(user_id__in=user_ids).update(**{field: F(field) + delta})
+    return entries
+
+
+def debit_leave(leave, days, actor):
+    """
+    Takes `days` off the balance for an approved leave. The check happens inside
+    the UPDATE (`balance >= days`), so concurrent approvals can't overdraw.
+    Returns False (and writes nothing) when the balance is too low.
+    """
+    field = BALANCE_FIELD[leave.leave_type]
+    updated = LeaveBalance.objects.filter(
+        user_id=leave.user_id, **{f'{field}__gte': days}
+    ).update(**{field: F(field) - days})
+    if not updated:
+        return False
+    LeaveLedgerEntry.objects.create(
+        user_id=leave.user_id, leave_type=leave.leave_type, delta=-days,
+        source='leave', leave_request=leave, actor=actor,
+    )
+    return True
+
+
+@transaction.atomic
+def set_balance(user, actor, note='', **values):
+    """ Manual quota edit: records the difference to the new values as adjustments """
+    balance = LeaveBalance.objects.select_for_update().get(user=user)
+    entries = [
+        LeaveLedgerEntry(
+            user=user, leave_type=LEAVE_TYPE[field], delta=value - getattr(balance, field),
+            source='adjustment', actor=actor, note=note,
+        )
+        for field, value in values.items()
+    ]
+    post_entries(entries)
+    balance.refresh_from_db()
+    return balance
+
+
+def ledger_totals(user_ids):
+    """ {user_id: {column: sum of deltas}} replayed from the ledger """
+    totals = defaultdict(lambda: dict.fromkeys(BALANCE_FIELD.values(), 0))
+    for user_id, leave_type, total in LeaveLedgerEntry.objects.filter(
+        user_id__in=user_ids
+    ).values('user_id', 'leave_type').annotate(total=Sum('delta')).values_list('user_id', 'leave_type', 'total'):
+        totals[user_id][BALANCE_FIELD[leave_type]] = total
+    return totals
@@ -0,0 +1,245 @@
+import random
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db.models import Count, Min
+from django.utils import timezone
+from .models import OutboundEmail
+from .smtp_pool import pool, smtp_settings
+
+# ==========================================
+# 1. QUEUEING (used by views / signals)
+# ==========================================
+# Views only insert an OutboundEmail row; nothing talks to SMTP inside a request.
+
+def queue_mail(subject, message, recipients, company=None, from_email=None):
+    """ Adds one email to the outbox. Returns the row, or None when there is nobody to send to. """
+    recipients = [r.strip() for r in recipients if r and r.strip()]
+    if not recipients:
+        return None
+    return OutboundEmail.objects.create(
+        company=company,
+        from_email=from_email or '',
+        recipients=','.join(recipients),
+        subject=subject[:255],
+        body=message,
+    )
+
+
+def queue_mail_batch(emails):
+    """ Bulk queue_mail: `emails` are (subject, message, recipients, company) tuples. Returns rows created. """
+    rows = []
+    for subject, message, recipients, company in emails:
+        recipients = [r.strip() for r in recipients if r and r.strip()]
+        if recipients:
+            rows.append(OutboundEmail(
+                company=company, from_email='', recipients=','.join(recipients),
+                subject=subject[:255], body=message,
+            ))
+    return len(OutboundEmail.objects.bulk_create(rows, batch_size=500))
+
+
+# ==========================================
+# 2. DELIVERY (send_queued_mail worker)
+# ==========================================
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 30        # seconds; doubles every attempt
+BACKOFF_MAX = 60 * 60    # never wait more than an hour between attempts
+LEASE = timedelta(minutes=10)  # a 'sending' row older than this is assumed orphaned
+# No new send starts later than this after the claim; emails not reached by then
+# go back to the queue. The gap to LEASE covers sends already in flight (each
+# SMTP exchange is bounded by the pool's socket timeout), so a batch is always
+# finished before another worker could take its rows as orphaned.
+SEND_BUDGET = LEASE / 2
+
+
+def backoff_delay(attempts):
+    """ Exponential backoff with +/-20% jitter so retries of a failed burst spread out """
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def sender_for(email):
+    company = email.company
+    if company and company.smtp_email and company.smtp_password:
+        return company.smtp_email
+    return email.from_email or settings.DEFAULT_FROM_EMAIL
+
+
+def claim_batch(limit=100):
+    """
+    Leases up to `limit` due emails to this worker. The conditional UPDATE only
+    takes rows still queued (or with an expired lease), so several workers can
+    poll the same table without sending anything twice.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = OutboundEmail.objects.filter(status='queued', next_attempt_at__lte=now)
+    orphaned = OutboundEmail.objects.filter(status='sending', claimed_at__lt=now - LEASE)
+
+    ids = list(due.order_by('next_attempt_at').values_list('id', flat=True)[:limit])
+    if len(ids) < limit:
+        ids += list(orphaned.values_list('id', flat=True)[:limit - len(ids)])
+    if not ids:
+        return []
+
+    (due | orphaned).filter(id__in=ids).update(status='sending', claimed_by=token, claimed_at=now)
+    return list(OutboundEmail.objects.filter(claimed_by=token, status='sending').select_related('company'))
+
+
+def deliver_group(emails, deadline=None):
+    """
+    Sends emails that share SMTP settings over pooled sessions (runs in a worker
+    thread, so it must not touch the ORM; `company` is already loaded).
+    A send failure discards that session and the rest continue on a fresh one;
+    if no session can be opened, the rest of the group fails at once instead of
+    waiting out the connect timeout for every email. Nothing new is started
+    after `deadline` (a time.monotonic() value).
+    Returns ([(email, None | error text)], [emails not attempted]).
+    """
+    params = smtp_settings(emails[0].company)
+    results = []
+    conn = None
+    for i, email in enumerate(emails):
+        if deadline is not None and time.monotonic() >= deadline:
+            if conn is not None:
+                pool.release(params, conn)
+            return results, emails[i:]
+        if conn is None:
+            try:
+                conn = pool.acquire(params)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                return results + [(rest, error) for rest in emails[i:]], []
+        try:
+            pool.send(conn, EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=sender_for(email),
+                to=email.recipient_list(),
+            ))
+            results.append((email, None))
+        except Exception as e:
+            results.append((email, f"{type(e).__name__}: {e}"))
+            pool.release(params, conn, broken=True)
+            conn = None
+    if conn is not None:
+        pool.release(params, conn)
+    return results, []
+
+
+def record_results(results):
+    """
+    Writes outcomes from the main thread: one UPDATE for all successes, one per
+    failure. Each UPDATE is limited to rows still under this worker's claim.
+    """
+    now = timezone.now()
+    sent = [email.id for email, error in results if error is None]
+    written = 0
+    if sent:
+        written = OutboundEmail.objects.filter(id__in=sent, claimed_by=results[0][0].claimed_by).update(
+            status='sent', sent_at=now, last_error='', claimed_by=''
+        )
+
+    failed = 0
+    for email, error in results:
+        if error is None:
+            continue
+        attempts = email.attempts + 1
+        dead = attempts >= MAX_ATTEMPTS
+        failed += OutboundEmail.objects.filter(id=email.id, claimed_by=email.claimed_by).update(
+            status='dead' if dead else 'queued',
+            attempts=attempts,
+            next_attempt_at=now if dead else now + backoff_delay(attempts),
+            last_error=error[:2000],
+            claimed_by='',
+        )
+    return written, failed
+
+
+def requeue(emails):
+    """ Gives claimed emails that were never attempted back to the queue, attempts unchanged """
+    if emails:
+        OutboundEmail.objects.filter(
+            id__in=[email.id for email in emails], claimed_by=emails[0].claimed_by, status='sending'
+        ).update(status='queued', claimed_by='')
+
+
+def process_batch(limit=100, workers=4, per_session=50):
+    """
+    Claims and sends one batch on a thread pool. Emails are grouped by SMTP
+    settings and each group is split into runs of `per_session`, so a burst
+    for one company is spread over a few reused sessions; whatever isn't
+    reached within SEND_BUDGET is requeued untouched. Returns (sent, failed)
+    """
+    batch = claim_batch(limit)
+    if not batch:
+        return 0, 0
+
+    groups = defaultdict(list)
+    for email in batch:
+        groups[tuple(sorted(smtp_settings(email.company).items()))].append(email)
+    runs = [
+        emails[i:i + per_session]
+        for emails in groups.values()
+        for i in range(0, len(emails), per_session)
+    ]
+
+    deadline = time.monotonic() + SEND_BUDGET.total_seconds()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = list(executor.map(deliver_group, runs, [deadline] * len(runs)))
+    requeue([email for _, unsent in outcomes for email in unsent])
+    return record_results([result for results, _ in outcomes for result in results])
+
+
+def run_worker(limit=100, workers=4, interval=5, once=False, log=None):
+    """ Polls the outbox until interrupted (or until it is empty with once=True) """
+    while True:
+        started = time.monotonic()
+        sent, failed = process_batch(limit, workers)
+        if log and (sent or failed):
+            log(sent, failed, time.monotonic() - started)
+        if not sent and not failed:
+            if once:
+                pool.close_all()
+                return
+            pool.prune()
+            time.sleep(interval)
+
+
+# ==========================================
+# 3. MONITORING
+# ==========================================
+
+def mail_stats(company=None, window=timedelta(hours=1)):
+    """ Queue depth by status plus delivery latency (created -> sent) over the last `window` """
+    now = timezone.now()
+    emails = OutboundEmail.objects.all()
+    if company is not None:
+        emails = emails.filter(company=company)
+
+    depth = defaultdict(int, emails.values_list('status').annotate(n=Count('id')))
+    oldest = emails.filter(status='queued').aggregate(t=Min('created_at'))['t']
+
+    latencies = sorted(
+        (sent_at - created_at).total_seconds()
+        for created_at, sent_at in emails.filter(
+            status='sent', sent_at__gte=now - window
+        ).order_by('-sent_at').values_list('created_at', 'sent_at')[:5000]
+    )
+
+    return {
+        'queued': depth['queued'],
+        'sending': depth['sending'],
+        'sent': depth['sent'],
+        'dead': depth['dead'],
+        'oldest_queued_seconds': round((now - oldest).total_seconds(), 1) if oldest else 0,
+        'sent_last_window': len(latencies),
+        'latency_avg_seconds': round(sum(latencies) / len(latencies), 2) if latencies else None,
+        'latency_p95_seconds': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2) if latencies else None,
+    }
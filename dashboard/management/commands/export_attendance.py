@@ -0,0 +1,36 @@
+import sys
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Company
+from dashboard.exports import EXPORT_FORMATS, attendance_sheet_rows
+
+class Command(BaseCommand):
+    help = "Streams a company's monthly attendance & salary sheet to a CSV or XLSX file"
+
+    def add_arguments(self, parser):
+        today = date.today()
+        parser.add_argument('company', type=int, help='Company ID')
+        parser.add_argument('--year', type=int, default=today.year)
+        parser.add_argument('--month', type=int, default=today.month)
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help='File path (default: stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(id=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f"Company {options['company']} not found.")
+
+        writer, _ = EXPORT_FORMATS[options['format']]
+        chunks = writer(attendance_sheet_rows(company, options['year'], options['month']))
+
+        if options['output']:
+            mode = 'wb' if options['format'] == 'xlsx' else 'w'
+            with open(options['output'], mode, newline='' if mode == 'w' else None) as out:
+                for chunk in chunks:
+                    out.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"✔ Written to {options['output']}"))
+        else:
+            out = sys.stdout.buffer if options['format'] == 'xlsx' else sys.stdout
+            for chunk in chunks:
+                out.write(chunk)
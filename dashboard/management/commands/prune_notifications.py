@@ -0,0 +1,31 @@
+import csv
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from dashboard.notifications import prune_notifications, ARCHIVE_COLUMNS
+
+class Command(BaseCommand):
+    help = 'Deletes read notifications older than --days in chunks (unread ones are always kept)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Keep read notifications this many days')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per DELETE')
+        parser.add_argument('--archive', help='Append the pruned rows to this CSV file first')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1.")
+        cutoff = timezone.now() - timedelta(days=options['days'])
+
+        if options['archive']:
+            with open(options['archive'], 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                if f.tell() == 0:
+                    writer.writerow(ARCHIVE_COLUMNS)
+                deleted = prune_notifications(cutoff, options['chunk_size'], writer)
+        else:
+            deleted = prune_notifications(cutoff, options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ Pruned {deleted} read notification(s) older than {options['days']} days"
+        ))
@@ -0,0 +1,69 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.db.models.functions import TruncMonth
+from accounts.models import User, Company
+from dashboard.models import AttendanceRecord, AttendanceMonthSummary
+from dashboard.attendance import SUMMARY_FIELDS, compute_month_summaries, refresh_month_summaries
+
+class Command(BaseCommand):
+    help = 'Backfills AttendanceMonthSummary rows, or verifies them against AttendanceRecord with --verify'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Company ID (default: all companies)')
+        parser.add_argument('--year', type=int, help='Only this year')
+        parser.add_argument('--month', type=int, help='Only this month (needs --year)')
+        parser.add_argument('--verify', action='store_true', help='Report mismatching rows without writing')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(id=options['company'])
+
+        for company in companies:
+            user_ids = list(User.objects.filter(company=company).values_list('id', flat=True))
+            if not user_ids:
+                continue
+
+            for year, month in self.months(company, options):
+                checked = mismatched = 0
+                for i in range(0, len(user_ids), options['chunk_size']):
+                    chunk = user_ids[i:i + options['chunk_size']]
+                    if options['verify']:
+                        c, m = self.verify(chunk, year, month)
+                        checked += c
+                        mismatched += m
+                    else:
+                        checked += len(refresh_month_summaries(chunk, year, month))
+
+                if options['verify']:
+                    style = self.style.ERROR if mismatched else self.style.SUCCESS
+                    self.stdout.write(style(f"{company.name} {month}/{year}: {mismatched}/{checked} rows out of date"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"✔ {company.name} {month}/{year}: {checked} rows rebuilt"))
+
+    def months(self, company, options):
+        if options['year'] and options['month']:
+            return [(options['year'], options['month'])]
+
+        months = AttendanceRecord.objects.filter(user__company=company)
+        if options['year']:
+            months = months.filter(date__year=options['year'])
+        months = {(d.year, d.month) for d in months.annotate(m=TruncMonth('date')).values_list('m', flat=True).distinct()}
+
+        today = date.today()
+        if not options['year'] or options['year'] == today.year:
+            months.add((today.year, today.month))
+        return sorted(months)
+
+    def verify(self, user_ids, year, month):
+        stored = {
+            s.user_id: s for s in AttendanceMonthSummary.objects.filter(user_id__in=user_ids, year=year, month=month)
+        }
+        mismatched = 0
+        for expected in compute_month_summaries(user_ids, year, month):
+            row = stored.get(expected.user_id)
+            if row is None or any(getattr(row, f) != getattr(expected, f) for f in SUMMARY_FIELDS):
+                mismatched += 1
+                self.stdout.write(f"  user {expected.user_id}: {'missing' if row is None else 'stale'}")
+        return len(user_ids), mismatched
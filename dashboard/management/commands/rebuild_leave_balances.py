@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from accounts.models import Company
+from dashboard.models import LeaveBalance
+from dashboard.ledger import BALANCE_FIELD, ledger_totals
+
+class Command(BaseCommand):
+    help = 'Recomputes LeaveBalance snapshots from the leave ledger, or reports drift with --verify'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Company ID (default: all companies)')
+        parser.add_argument('--verify', action='store_true', help='Report mismatching balances without writing')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(id=options['company'])
+
+        fields = list(BALANCE_FIELD.values())
+        for company in companies:
+            balances = LeaveBalance.objects.filter(user__company=company).order_by('id')
+            checked = mismatched = 0
+            ids = list(balances.values_list('id', flat=True))
+
+            for i in range(0, len(ids), options['chunk_size']):
+                chunk = list(balances.filter(id__in=ids[i:i + options['chunk_size']]))
+                totals = ledger_totals([b.user_id for b in chunk])
+
+                stale = []
+                for balance in chunk:
+                    expected = totals[balance.user_id]
+                    if any(getattr(balance, f) != expected[f] for f in fields):
+                        self.stdout.write(
+                            f"  user {balance.user_id}: "
+                            + ", ".join(f"{f} {getattr(balance, f)} -> {expected[f]}" for f in fields)
+                        )
+                        for f in fields:
+                            setattr(balance, f, expected[f])
+                        stale.append(balance)
+
+                checked += len(chunk)
+                mismatched += len(stale)
+                if stale and not options['verify']:
+                    LeaveBalance.objects.bulk_update(stale, fields, batch_size=500)
+
+            if options['verify']:
+                style = self.style.ERROR if mismatched else self.style.SUCCESS
+                self.stdout.write(style(f"{company.name}: {mismatched}/{checked} balances differ from the ledger"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"✔ {company.name}: {mismatched}/{checked} balances rebuilt from the ledger"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from dashboard.search import create_search_table, rebuild_index, search_backend
+
+class Command(BaseCommand):
+    help = 'Refills the track sheet search index from WorkItem/TaskItem (after bulk imports or restores)'
+
+    def handle(self, *args, **options):
+        if search_backend() is None:
+            self.stdout.write(f"ℹ {connection.vendor} has no full-text backend; search uses substring matching")
+            return
+        with transaction.atomic():
+            create_search_table(connection)
+            count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"✔ Indexed {count} work logs and tasks ({search_backend()})"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from dashboard.notifications import rebuild_unread_counters
+
+class Command(BaseCommand):
+    help = 'Recounts User.unread_notifications from the Notification table (after manual deletes or restores)'
+
+    def handle(self, *args, **options):
+        fixed = rebuild_unread_counters()
+        if fixed:
+            self.stdout.write(self.style.SUCCESS(f"✔ {fixed} unread counter(s) corrected"))
+        else:
+            self.stdout.write("ℹ All unread counters already match")
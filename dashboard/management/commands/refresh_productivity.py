@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from dashboard.analytics import refresh_productivity
+
+class Command(BaseCommand):
+    help = 'Rebuilds the monthly productivity analytics for track sheets changed since the last run (run from cron, e.g. nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recount every month, not just what changed (e.g. after editing teams outside the app)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Users per transaction')
+
+    def handle(self, *args, **options):
+        def log(year, month, users, written):
+            self.stdout.write(f"  {month}/{year}: {users} user(s) recounted, {written} with activity")
+
+        run = refresh_productivity(full=options['full'], chunk_size=options['chunk_size'], log=log)
+        if run.months_refreshed:
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ {'Full' if run.full else 'Incremental'} refresh: {run.months_refreshed} month(s), "
+                f"{run.rows_written} row(s) written in {(run.finished_at - run.started_at).total_seconds():.1f}s"
+            ))
+        else:
+            self.stdout.write("ℹ No track sheet or team changes since the last run")
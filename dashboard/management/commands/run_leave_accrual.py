@@ -0,0 +1,42 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Company
+from dashboard.accrual import run_accrual, CHUNK_SIZE
+
+class Command(BaseCommand):
+    help = 'Credits monthly leave (and applies year-end carry-forward in January) per company accrual policy'
+
+    def add_arguments(self, parser):
+        today = date.today()
+        parser.add_argument('--company', type=int, help='Company ID (default: all companies)')
+        parser.add_argument('--year', type=int, default=today.year)
+        parser.add_argument('--month', type=int, default=today.month)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Balances per UPDATE statement')
+
+    def handle(self, *args, **options):
+        year, month = options['year'], options['month']
+        if not 1 <= month <= 12:
+            raise CommandError("Month must be between 1 and 12.")
+
+        companies = Company.objects.select_related('accrual_policy')
+        if options['company']:
+            companies = companies.filter(id=options['company'])
+            if not companies.exists():
+                raise CommandError(f"Company {options['company']} not found.")
+
+        for company in companies:
+            policy = getattr(company, 'accrual_policy', None)
+            if policy is None or not policy.is_active:
+                self.stdout.write(f"- {company.name}: no active accrual policy, skipped")
+                continue
+
+            carry, credit = run_accrual(company, year, month, options['chunk_size'])
+            if month == 1:
+                if carry:
+                    self.stdout.write(self.style.SUCCESS(f"✔ {company.name}: carry-forward applied to {carry.employee_count} balances"))
+                else:
+                    self.stdout.write(self.style.WARNING(f"ℹ {company.name}: carry-forward for {year} was already applied"))
+            if credit:
+                self.stdout.write(self.style.SUCCESS(f"✔ {company.name}: {month}/{year} credit applied to {credit.employee_count} balances"))
+            else:
+                self.stdout.write(self.style.WARNING(f"ℹ {company.name}: {month}/{year} was already credited"))
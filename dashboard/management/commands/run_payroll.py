@@ -0,0 +1,30 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Company
+from dashboard.payroll import run_payroll
+
+class Command(BaseCommand):
+    help = 'Computes and stores the monthly payroll for every approved employee of a company'
+
+    def add_arguments(self, parser):
+        today = date.today()
+        parser.add_argument('--company', type=int, help='Company ID (default: all companies)')
+        parser.add_argument('--year', type=int, default=today.year)
+        parser.add_argument('--month', type=int, default=today.month)
+
+    def handle(self, *args, **options):
+        year, month = options['year'], options['month']
+        if not 1 <= month <= 12:
+            raise CommandError("Month must be between 1 and 12.")
+
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(id=options['company'])
+            if not companies.exists():
+                raise CommandError(f"Company {options['company']} not found.")
+
+        for company in companies:
+            run = run_payroll(company, year, month)
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ {company.name}: {run.employee_count} employees, net total ₹{run.total_net} for {month}/{year}"
+            ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from dashboard.notifications import run_broadcast_worker
+
+class Command(BaseCommand):
+    help = 'Fans queued HR broadcasts out into Notifications (run a single instance)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2, help='Seconds to sleep when nothing is queued')
+        parser.add_argument('--once', action='store_true', help='Deliver what is queued and exit (for cron)')
+
+    def handle(self, *args, **options):
+        def log(broadcast, seconds):
+            took = f" in {seconds:.2f}s" if seconds is not None else " (resumed)"
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ '{broadcast.title}' delivered to {broadcast.recipient_count} employees{took}"
+            ))
+
+        try:
+            run_broadcast_worker(options['interval'], options['once'], log)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Stopped."))
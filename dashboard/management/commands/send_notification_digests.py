@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from dashboard.notifications import send_digests, DIGEST_PERIODS
+
+class Command(BaseCommand):
+    help = 'Queues hourly/daily notification digest emails for users who are due (run from cron, e.g. every hour)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--frequency', choices=sorted(DIGEST_PERIODS), action='append',
+                            help='Only this digest frequency (default: all)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users per transaction')
+
+    def handle(self, *args, **options):
+        for frequency in options['frequency'] or sorted(DIGEST_PERIODS):
+            checked, queued = send_digests(frequency, chunk_size=options['chunk_size'])
+            if checked:
+                self.stdout.write(self.style.SUCCESS(
+                    f"✔ {frequency}: {queued} digest(s) queued for {checked} due user(s)"
+                ))
+            else:
+                self.stdout.write(f"ℹ {frequency}: nobody due")
@@ -0,0 +1,27 @@
+import json
+from django.core.management.base import BaseCommand
+from dashboard.mailer import run_worker, mail_stats
+
+class Command(BaseCommand):
+    help = 'Delivers queued OutboundEmail rows on a thread pool, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails claimed per poll')
+        parser.add_argument('--workers', type=int, default=4, help='Sending threads')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit (for cron)')
+        parser.add_argument('--stats', action='store_true', help='Print queue depth and latency as JSON and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(mail_stats(), indent=2))
+            return
+
+        def log(sent, failed, seconds):
+            style = self.style.ERROR if failed else self.style.SUCCESS
+            self.stdout.write(style(f"✔ {sent} sent, {failed} failed in {seconds:.2f}s"))
+
+        try:
+            run_worker(options['batch_size'], options['workers'], options['interval'], options['once'], log)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Stopped."))
@@ -0,0 +1,111 @@
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from dashboard.smtp_pool import SMTPPool
+
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough SMTP to accept mail from smtplib (no TLS/AUTH). `connect_delay`
+    stands in for the TCP + TLS + AUTH cost of a real provider, which is what
+    pooling saves.
+    """
+
+    def handle(self):
+        time.sleep(self.server.connect_delay)
+        self.server.sessions += 1
+        self.reply('220 stand-in ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode('ascii', 'replace').strip().split(' ')[0].upper()
+            if verb == 'EHLO':
+                self.reply('250-stand-in', '250 8BITMIME')
+            elif verb == 'DATA':
+                self.reply('354 end with .')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                self.server.messages += 1
+                self.reply('250 queued')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:  # HELO, MAIL, RCPT, RSET, NOOP
+                self.reply('250 ok')
+
+    def reply(self, *lines):
+        self.wfile.write(''.join(f'{l}\r\n' for l in lines).encode())
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, connect_delay):
+        super().__init__(address, StandInSMTPHandler)
+        self.connect_delay = connect_delay
+        self.sessions = self.messages = 0
+
+
+class Command(BaseCommand):
+    help = 'Compares one-connection-per-email against the pooled SMTP sessions, using a local stand-in server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', help='Use an existing SMTP server instead of the built-in stand-in')
+        parser.add_argument('--port', type=int, default=1025)
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--connect-delay', type=float, default=0.05,
+                            help='Seconds the stand-in waits before greeting (simulated handshake)')
+
+    def handle(self, *args, **options):
+        server = None
+        host, port = options['host'], options['port']
+        if not host:
+            server = StandInSMTPServer(('127.0.0.1', 0), options['connect_delay'])
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            host, port = server.server_address
+            self.stdout.write(f"Stand-in SMTP server on {host}:{port} (handshake delay {options['connect_delay']}s)")
+
+        params = {
+            'backend': 'django.core.mail.backends.smtp.EmailBackend',
+            'host': host, 'port': port, 'use_tls': False,
+        }
+        messages = [
+            EmailMessage(f'Benchmark {n}', 'Hello', 'bench@example.com', [f'user{n}@example.com'])
+            for n in range(options['messages'])
+        ]
+
+        def per_message(message):
+            get_connection(**params).send_messages([message])
+
+        smtp_pool = SMTPPool()
+
+        def pooled(chunk):
+            with smtp_pool.session(params) as conn:
+                for message in chunk:
+                    smtp_pool.send(conn, message)
+
+        size = max(1, len(messages) // options['threads'])
+        chunks = [messages[i:i + size] for i in range(0, len(messages), size)]
+
+        for label, fn, work in (('New connection per email', per_message, messages),
+                                ('Pooled sessions', pooled, chunks)):
+            sessions_before = server.sessions if server else 0
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+                list(executor.map(fn, work))
+            elapsed = time.perf_counter() - started
+            sessions = f", {server.sessions - sessions_before} SMTP sessions" if server else ''
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ {label}: {len(messages)} emails in {elapsed:.2f}s "
+                f"({len(messages) / elapsed:.0f}/s{sessions})"
+            ))
+
+        smtp_pool.close_all()
+        if server:
+            server.shutdown()
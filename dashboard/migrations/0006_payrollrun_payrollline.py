@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_otp'),
+        ('dashboard', '0005_remove_tracksheet_assigned_by_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('total_days', models.PositiveSmallIntegerField(default=0)),
+                ('holiday_days', models.PositiveSmallIntegerField(default=0)),
+                ('employee_count', models.PositiveIntegerField(default=0)),
+                ('total_net', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_runs', to='accounts.company')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payroll_runs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('company', 'year', 'month')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_salary', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('per_day', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('absent_days', models.PositiveSmallIntegerField(default=0)),
+                ('late_2nd_days', models.PositiveSmallIntegerField(default=0)),
+                ('late_3rd_days', models.PositiveSmallIntegerField(default=0)),
+                ('full_day_deduction', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('half_day_deduction', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('gross_salary', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('esi_percentage', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('esi_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('professional_tax', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('net_salary', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_lines', to=settings.AUTH_USER_MODEL)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='dashboard.payrollrun')),
+            ],
+            options={
+                'unique_together': {('run', 'user')},
+            },
+        ),
+    ]
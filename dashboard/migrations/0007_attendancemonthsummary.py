@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_payrollrun_payrollline'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceMonthSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('total_days', models.PositiveSmallIntegerField(default=0)),
+                ('present', models.PositiveSmallIntegerField(default=0)),
+                ('absent', models.PositiveSmallIntegerField(default=0)),
+                ('wfh', models.PositiveSmallIntegerField(default=0)),
+                ('leave', models.PositiveSmallIntegerField(default=0)),
+                ('holiday', models.PositiveSmallIntegerField(default=0)),
+                ('late_2nd', models.PositiveSmallIntegerField(default=0)),
+                ('late_3rd', models.PositiveSmallIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'year', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_attendancemonthsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollrun',
+            name='working_days',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_company_saturday_rule_company_weekly_offs'),
+        ('dashboard', '0009_leaverequest_range_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveAccrualPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=True)),
+                ('casual_per_month', models.PositiveSmallIntegerField(default=1)),
+                ('sick_per_month', models.PositiveSmallIntegerField(default=0)),
+                ('casual_max_balance', models.PositiveIntegerField(blank=True, null=True)),
+                ('sick_max_balance', models.PositiveIntegerField(blank=True, null=True)),
+                ('casual_carry_forward', models.PositiveIntegerField(blank=True, null=True)),
+                ('sick_carry_forward', models.PositiveIntegerField(blank=True, null=True)),
+                ('joiner_cutoff_day', models.PositiveSmallIntegerField(default=15, help_text='Day of month (1-31)')),
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='accrual_policy', to='accounts.company')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaveAccrualRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('kind', models.CharField(choices=[('monthly', 'Monthly Credit'), ('carry_forward', 'Year-End Carry Forward')], default='monthly', max_length=20)),
+                ('employee_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accrual_runs', to='accounts.company')),
+            ],
+            options={
+                'unique_together': {('company', 'year', 'month', 'kind')},
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def opening_balances(apps, schema_editor):
+    """ Existing balances become the first ledger entries, so the ledger sums to them """
+    LeaveBalance = apps.get_model('dashboard', 'LeaveBalance')
+    LeaveLedgerEntry = apps.get_model('dashboard', 'LeaveLedgerEntry')
+    entries = []
+    for user_id, casual, sick in LeaveBalance.objects.values_list('user_id', 'casual_leave', 'sick_leave').iterator():
+        if casual:
+            entries.append(LeaveLedgerEntry(user_id=user_id, leave_type='Casual', delta=casual, source='opening'))
+        if sick:
+            entries.append(LeaveLedgerEntry(user_id=user_id, leave_type='Sick', delta=sick, source='opening'))
+    LeaveLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_leave_accrual'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('leave_type', models.CharField(choices=[('Casual', 'Casual Leave'), ('Sick', 'Sick Leave')], max_length=10)),
+                ('delta', models.IntegerField()),
+                ('source', models.CharField(choices=[('opening', 'Opening Balance'), ('accrual', 'Monthly Accrual'), ('carry_forward', 'Year-End Carry Forward'), ('leave', 'Leave Approved'), ('adjustment', 'Manual Adjustment')], max_length=20)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('accrual_run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='dashboard.leaveaccrualrun')),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leave_adjustments', to=settings.AUTH_USER_MODEL)),
+                ('leave_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='dashboard.leaverequest')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'leave_type'], name='ledger_user_type_idx')],
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_unread(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Notification = apps.get_model('dashboard', 'Notification')
+    counts = Notification.objects.filter(is_read=False).values('recipient_id').annotate(n=Count('id'))
+    by_count = {}
+    for row in counts:
+        by_count.setdefault(row['n'], []).append(row['recipient_id'])
+    for n, user_ids in by_count.items():
+        User.objects.filter(id__in=user_ids).update(unread_notifications=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0013_broadcast'),
+        ('accounts', '0006_user_unread_notifications'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'is_read', 'created_at'], name='notif_inbox_idx'),
+        ),
+        migrations.RunPython(backfill_unread, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:39
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    TrackSheet = apps.get_model('dashboard', 'TrackSheet')
+    for kind, model in (('work', 'WorkItem'), ('task', 'TaskItem')):
+        Item = apps.get_model('dashboard', model)
+        counts = Item.objects.values('track_sheet_id').annotate(
+            total=Count('id'),
+            in_progress=Count('id', filter=Q(status='In Progress')),
+            completed=Count('id', filter=Q(status='Completed')),
+        ).order_by()
+        sheets = []
+        for row in counts:
+            sheet = TrackSheet(id=row['track_sheet_id'])
+            setattr(sheet, f'{kind}_total', row['total'])
+            setattr(sheet, f'{kind}_in_progress', row['in_progress'])
+            setattr(sheet, f'{kind}_completed', row['completed'])
+            sheets.append(sheet)
+        fields = [f'{kind}_total', f'{kind}_in_progress', f'{kind}_completed']
+        TrackSheet.objects.bulk_update(sheets, fields, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0014_notification_inbox_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tracksheet',
+            name='task_completed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tracksheet',
+            name='task_in_progress',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tracksheet',
+            name='task_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tracksheet',
+            name='work_completed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tracksheet',
+            name='work_in_progress',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tracksheet',
+            name='work_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
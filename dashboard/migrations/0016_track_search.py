@@ -0,0 +1,60 @@
+from django.db import migrations
+
+# The search table isn't managed by the ORM, so its DDL and backfill are
+# spelled out here (dashboard.search has the live copy used by the
+# rebuild_search_index command; this migration must not follow its changes).
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS dashboard_track_search "
+    "USING fts5(body, owner, kind, day UNINDEXED, tokenize='porter unicode61')",
+]
+SQLITE_FILL = (
+    "INSERT INTO dashboard_track_search (rowid, body, owner, kind, day) "
+    "SELECT i.id * 2 + {offset}, i.task, 'u' || s.user_id, '{kind}', s.date "
+    "FROM {table} i JOIN dashboard_tracksheet s ON s.id = i.track_sheet_id"
+)
+
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS dashboard_track_search ("
+    "doc_id bigint PRIMARY KEY, owner_id integer NOT NULL, kind varchar(4) NOT NULL, "
+    "day date NOT NULL, body text NOT NULL, document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS dashboard_track_search_doc ON dashboard_track_search USING gin (document)",
+    "CREATE INDEX IF NOT EXISTS dashboard_track_search_owner ON dashboard_track_search (owner_id, kind)",
+]
+POSTGRES_FILL = (
+    "INSERT INTO dashboard_track_search (doc_id, owner_id, kind, day, body, document) "
+    "SELECT i.id * 2 + {offset}, s.user_id, '{kind}', s.date, i.task, to_tsvector('english', i.task) "
+    "FROM {table} i JOIN dashboard_tracksheet s ON s.id = i.track_sheet_id"
+)
+
+ITEM_TABLES = ((0, 'work', 'dashboard_workitem'), (1, 'task', 'dashboard_taskitem'))
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        create, fill = SQLITE_CREATE, SQLITE_FILL
+    elif vendor == 'postgresql':
+        create, fill = POSTGRES_CREATE, POSTGRES_FILL
+    else:
+        return  # no full-text backend; search falls back to icontains
+    for sql in create:
+        schema_editor.execute(sql)
+    for offset, kind, table in ITEM_TABLES:
+        schema_editor.execute(fill.format(offset=offset, kind=kind, table=table))
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS dashboard_track_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0015_tracksheet_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_sheet_dates(apps, schema_editor):
+    TaskItem = apps.get_model('dashboard', 'TaskItem')
+    TrackSheet = apps.get_model('dashboard', 'TrackSheet')
+    TaskItem.objects.filter(date__isnull=True).update(
+        date=Subquery(TrackSheet.objects.filter(id=OuterRef('track_sheet_id')).values('date')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0016_track_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskitem',
+            name='date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_sheet_dates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='taskitem',
+            index=models.Index(fields=['assigned_by', 'date', 'id'], condition=models.Q(sender_archived=False), name='task_outbox_idx'),
+        ),
+    ]
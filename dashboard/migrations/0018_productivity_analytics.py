@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_email_digest'),
+        ('dashboard', '0017_taskitem_outbox_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductivityRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('full', models.BooleanField(default=False)),
+                ('months_refreshed', models.PositiveIntegerField(default=0)),
+                ('rows_written', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='taskitem',
+            name='completed_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tracksheet',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='ProductivityMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('days_logged', models.PositiveSmallIntegerField(default=0)),
+                ('work_total', models.PositiveIntegerField(default=0)),
+                ('work_in_progress', models.PositiveIntegerField(default=0)),
+                ('work_completed', models.PositiveIntegerField(default=0)),
+                ('task_total', models.PositiveIntegerField(default=0)),
+                ('task_in_progress', models.PositiveIntegerField(default=0)),
+                ('task_completed', models.PositiveIntegerField(default=0)),
+                ('task_late', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.company')),
+                ('team', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.team')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='productivity_months', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'year', 'month'], name='productivity_company_idx')],
+                'unique_together': {('user', 'year', 'month')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TeamProductivityMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('members', models.PositiveIntegerField(default=0)),
+                ('days_logged', models.PositiveIntegerField(default=0)),
+                ('work_total', models.PositiveIntegerField(default=0)),
+                ('work_in_progress', models.PositiveIntegerField(default=0)),
+                ('work_completed', models.PositiveIntegerField(default=0)),
+                ('task_total', models.PositiveIntegerField(default=0)),
+                ('task_in_progress', models.PositiveIntegerField(default=0)),
+                ('task_completed', models.PositiveIntegerField(default=0)),
+                ('task_late', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.company')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='productivity_months', to='accounts.team')),
+            ],
+            options={
+                'unique_together': {('team', 'year', 'month')},
+            },
+        ),
+    ]
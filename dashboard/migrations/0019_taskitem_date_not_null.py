@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_sheet_dates(apps, schema_editor):
+    TaskItem = apps.get_model('dashboard', 'TaskItem')
+    TrackSheet = apps.get_model('dashboard', 'TrackSheet')
+    TaskItem.objects.filter(date__isnull=True).update(
+        date=Subquery(TrackSheet.objects.filter(id=OuterRef('track_sheet_id')).values('date')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0018_productivity_analytics'),
+    ]
+
+    operations = [
+        # Catch any task written without a date since 0017, then make the column required
+        # so the outbox keyset (date, id) can't skip rows
+        migrations.RunPython(copy_sheet_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='taskitem',
+            name='date',
+            field=models.DateField(),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_reporting_lines'),
+        ('dashboard', '0019_taskitem_date_not_null'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productivitymonth',
+            name='dirty',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='teamproductivitymonth',
+            name='dirty',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='productivitymonth',
+            index=models.Index(condition=models.Q(('dirty', True)), fields=['year', 'month'], name='productivity_dirty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teamproductivitymonth',
+            index=models.Index(condition=models.Q(('dirty', True)), fields=['year', 'month'], name='team_productivity_dirty_idx'),
+        ),
+    ]
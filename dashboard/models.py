@@ -1,5 +1,6 @@
 from django.db import models
-from accounts.models import User, Company
+from django.utils import timezone
+from accounts.models import User, Company, Team
 
 # ==========================================
 # 1. LEAVE QUOTA (BALANCE)
@@ -43,10 +44,17 @@ class LeaveRequest(models.Model):
     # Who actually clicked 'Approve/Reject'
     action_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='leaves_actioned')
 
+    class Meta:
+        indexes = [
+            # "who is out between A and B" range lookups (see leaves.overlapping_leaves)
+            models.Index(fields=['status', 'end_date', 'start_date'], name='leave_status_range_idx'),
+        ]
+
     @property
     def days_requested(self):
-        delta = self.end_date - self.start_date
-        return delta.days + 1
+        # Weekly offs and public holidays inside the range don't count
+        from .workdays import working_days_between
+        return working_days_between(self.user.company, self.start_date, self.end_date)
 
     def __str__(self):
         return f"{self.user.username} - {self.leave_type} ({self.status})"
@@ -108,6 +116,11 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read', 'created_at'], name='notif_inbox_idx'),
+            # The notifications page keyset-paginates a recipient's rows on id
+            models.Index(fields=['recipient', 'id'], name='notif_list_idx'),
+        ]
 
     def __str__(self):
         return f"Notif for {self.recipient.username}: {self.title}"
@@ -129,9 +142,30 @@ class TrackSheet(models.Model):
     # status = models.CharField(max_length=20, default='Pending')
     # sender_archived = models.BooleanField(default=False)
 
+    # Item counts per status, kept in step by dashboard.tracksheets so the
+    # month grid never has to load the items themselves
+    work_total = models.PositiveIntegerField(default=0)
+    work_in_progress = models.PositiveIntegerField(default=0)
+    work_completed = models.PositiveIntegerField(default=0)
+    task_total = models.PositiveIntegerField(default=0)
+    task_in_progress = models.PositiveIntegerField(default=0)
+    task_completed = models.PositiveIntegerField(default=0)
+
+    # Moved by every counter change; refresh_productivity picks up months touched since its last run
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     class Meta:
         unique_together = ('user', 'date')
 
+    @property
+    def day_status(self):
+        """ Summary of the day's work log: Completed once every item is, In Progress if any is """
+        if self.work_total and self.work_completed == self.work_total:
+            return "Completed"
+        if self.work_in_progress:
+            return "In Progress"
+        return "Pending"
+
     def __str__(self):
         return f"Track: {self.user.username} on {self.date}"
 
@@ -167,5 +201,371 @@ class TaskItem(models.Model):
     # Archive/Hide for the manager (Outbox view)
     sender_archived = models.BooleanField(default=False)
 
+    # Copy of track_sheet.date so the assigner's outbox is one index range scan
+    date = models.DateField()
+
+    # Set when the task moves to Completed; later than `date` means it was done late
+    completed_on = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Partial: archived tasks never show in the outbox, so they stay out of the index
+            models.Index(
+                fields=['assigned_by', 'date', 'id'],
+                condition=models.Q(sender_archived=False),
+                name='task_outbox_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Task: {self.task} ({self.status})"
+
+# ==========================================
+# 7. PAYROLL RUNS
+# ==========================================
+class PayrollRun(models.Model):
+    """ One company-wide salary computation for a given month """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='payroll_runs')
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+    total_days = models.PositiveSmallIntegerField(default=0)
+    working_days = models.PositiveSmallIntegerField(default=0)
+    holiday_days = models.PositiveSmallIntegerField(default=0)
+    employee_count = models.PositiveIntegerField(default=0)
+    total_net = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='payroll_runs')
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('company', 'year', 'month')
+
+    def __str__(self):
+        return f"Payroll {self.company.name} - {self.month}/{self.year}"
+
+
+class PayrollLine(models.Model):
+    """ Stored salary slip of one employee inside a PayrollRun """
+    run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, related_name='lines')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payroll_lines')
+
+    base_salary = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    per_day = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    absent_days = models.PositiveSmallIntegerField(default=0)
+    late_2nd_days = models.PositiveSmallIntegerField(default=0)
+    late_3rd_days = models.PositiveSmallIntegerField(default=0)
+    full_day_deduction = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    half_day_deduction = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    gross_salary = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    esi_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    esi_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    professional_tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    net_salary = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('run', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.net_salary}"
+
+
+# ==========================================
+# 8. MONTHLY ATTENDANCE SUMMARY
+# ==========================================
+class AttendanceMonthSummary(models.Model):
+    """
+    Per-user monthly counters, kept in sync with AttendanceRecord writes.
+    Unmarked days count as Present (or Holiday on a weekly off / PublicHoliday), same as the calendar.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_summaries')
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+
+    total_days = models.PositiveSmallIntegerField(default=0)
+    present = models.PositiveSmallIntegerField(default=0)  # includes WFH
+    absent = models.PositiveSmallIntegerField(default=0)
+    wfh = models.PositiveSmallIntegerField(default=0)
+    leave = models.PositiveSmallIntegerField(default=0)
+    holiday = models.PositiveSmallIntegerField(default=0)
+    late_2nd = models.PositiveSmallIntegerField(default=0)
+    late_3rd = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'year', 'month')
+
+    def as_stats(self):
+        """ Same shape as the old `stats` dict used by view_attendance """
+        return {
+            'absent': self.absent, 'leave': self.leave, 'wfh': self.wfh, 'present': self.present,
+            'holiday': self.holiday, 'late_2nd': self.late_2nd, 'late_3rd': self.late_3rd,
+            'total_days': self.total_days
+        }
+
+    def __str__(self):
+        return f"{self.user.username} - {self.month}/{self.year}"
+
+
+# ==========================================
+# 9. LEAVE ACCRUAL
+# ==========================================
+class LeaveAccrualPolicy(models.Model):
+    """ Monthly leave credit rules for a company, applied by the run_leave_accrual command """
+    company = models.OneToOneField(Company, on_delete=models.CASCADE, related_name='accrual_policy')
+    is_active = models.BooleanField(default=True)
+
+    casual_per_month = models.PositiveSmallIntegerField(default=1)
+    sick_per_month = models.PositiveSmallIntegerField(default=0)
+
+    # Credits stop once a balance reaches the cap (blank = no cap)
+    casual_max_balance = models.PositiveIntegerField(null=True, blank=True)
+    sick_max_balance = models.PositiveIntegerField(null=True, blank=True)
+
+    # Days carried into the new year (blank = everything carries over)
+    casual_carry_forward = models.PositiveIntegerField(null=True, blank=True)
+    sick_carry_forward = models.PositiveIntegerField(null=True, blank=True)
+
+    # Joiners get their first month's credit only if they joined on or before this day
+    joiner_cutoff_day = models.PositiveSmallIntegerField(default=15, help_text="Day of month (1-31)")
+
+    def __str__(self):
+        return f"Accrual policy - {self.company.name}"
+
+
+class LeaveAccrualRun(models.Model):
+    """ One row per applied period; its unique key is what makes accrual idempotent """
+    KIND_CHOICES = (
+        ('monthly', 'Monthly Credit'),
+        ('carry_forward', 'Year-End Carry Forward'),
+    )
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='accrual_runs')
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='monthly')
+    employee_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('company', 'year', 'month', 'kind')
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.company.name} - {self.month}/{self.year}"
+
+
+# ==========================================
+# 10. LEAVE LEDGER
+# ==========================================
+class LeaveLedgerEntry(models.Model):
+    """
+    Append-only history of every balance change. LeaveBalance is the running
+    total of these rows, updated in the same transaction as each insert.
+    """
+    LEAVE_TYPES = (
+        ('Casual', 'Casual Leave'),
+        ('Sick', 'Sick Leave'),
+    )
+    SOURCE_CHOICES = (
+        ('opening', 'Opening Balance'),
+        ('accrual', 'Monthly Accrual'),
+        ('carry_forward', 'Year-End Carry Forward'),
+        ('leave', 'Leave Approved'),
+        ('adjustment', 'Manual Adjustment'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leave_ledger')
+    leave_type = models.CharField(max_length=10, choices=LEAVE_TYPES)
+    delta = models.IntegerField()  # + credit / - debit
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+
+    leave_request = models.ForeignKey(LeaveRequest, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries')
+    accrual_run = models.ForeignKey(LeaveAccrualRun, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries')
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='leave_adjustments')
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'leave_type'], name='ledger_user_type_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("Leave ledger entries are append-only.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.user.username} {self.leave_type} {self.delta:+d} ({self.source})"
+
+
+# ==========================================
+# 11. OUTBOUND EMAIL QUEUE
+# ==========================================
+class OutboundEmail(models.Model):
+    """
+    Outbox row written by views instead of sending inline; the
+    send_queued_mail worker delivers it (see dashboard/mailer.py).
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    )
+
+    # Whose SMTP settings to send with (blank = the project's default backend)
+    company = models.ForeignKey(Company, on_delete=models.SET_NULL, null=True, blank=True, related_name='outbound_emails')
+    from_email = models.CharField(max_length=254, blank=True)
+    recipients = models.TextField(help_text="Comma-separated addresses")
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    # Worker lease: which worker claimed the row and when
+    claimed_by = models.CharField(max_length=40, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def recipient_list(self):
+        return [r for r in self.recipients.split(',') if r]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipients} ({self.status})"
+
+
+# ==========================================
+# 12. BROADCASTS
+# ==========================================
+class Broadcast(models.Model):
+    """
+    An HR announcement to the whole company or one team. The request only
+    saves this row; the send_broadcasts worker fans it out into Notifications.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('done', 'Delivered'),
+    )
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='broadcasts')
+    team = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True, related_name='broadcasts')
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcasts')
+    title = models.CharField(max_length=100)
+    message = models.TextField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    # Fan-out goes in user id order; a restarted worker resumes after last_user_id
+    last_user_id = models.BigIntegerField(default=0)
+    recipient_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.title} ({self.status})"
+
+
+# ==========================================
+# 13. PRODUCTIVITY ANALYTICS
+# ==========================================
+class ProductivityMonth(models.Model):
+    """
+    Per-user monthly track sheet totals, rebuilt by the refresh_productivity command.
+    Only users with a track sheet in the month have a row; `team` is the user's team when it was built.
+    `dirty` marks rows to recount on the next run because the user changed team or company.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='productivity_months')
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='+')
+    team = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+
+    days_logged = models.PositiveSmallIntegerField(default=0)  # days with at least one work log
+    work_total = models.PositiveIntegerField(default=0)
+    work_in_progress = models.PositiveIntegerField(default=0)
+    work_completed = models.PositiveIntegerField(default=0)
+    task_total = models.PositiveIntegerField(default=0)
+    task_in_progress = models.PositiveIntegerField(default=0)
+    task_completed = models.PositiveIntegerField(default=0)
+    task_late = models.PositiveIntegerField(default=0)  # completed after the day they were assigned for
+    dirty = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'year', 'month')
+        indexes = [
+            models.Index(fields=['company', 'year', 'month'], name='productivity_company_idx'),
+            models.Index(fields=['year', 'month'], condition=models.Q(dirty=True), name='productivity_dirty_idx'),
+        ]
+
+    @property
+    def completion_rate(self):
+        return round(100 * self.task_completed / self.task_total) if self.task_total else None
+
+    @property
+    def late_rate(self):
+        return round(100 * self.task_late / self.task_completed) if self.task_completed else None
+
+    @property
+    def items_per_day(self):
+        return round(self.work_total / self.days_logged, 1) if self.days_logged else 0
+
+    def __str__(self):
+        return f"{self.user.username} - {self.month}/{self.year}"
+
+
+class TeamProductivityMonth(models.Model):
+    """
+    ProductivityMonth rows summed per team; `members` is how many of them had a row.
+    `dirty` marks rollups to re-sum on the next run because a member was deleted.
+    """
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='productivity_months')
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='+')
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+
+    members = models.PositiveIntegerField(default=0)
+    days_logged = models.PositiveIntegerField(default=0)
+    work_total = models.PositiveIntegerField(default=0)
+    work_in_progress = models.PositiveIntegerField(default=0)
+    work_completed = models.PositiveIntegerField(default=0)
+    task_total = models.PositiveIntegerField(default=0)
+    task_in_progress = models.PositiveIntegerField(default=0)
+    task_completed = models.PositiveIntegerField(default=0)
+    task_late = models.PositiveIntegerField(default=0)
+    dirty = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('team', 'year', 'month')
+        indexes = [
+            models.Index(fields=['year', 'month'], condition=models.Q(dirty=True), name='team_productivity_dirty_idx'),
+        ]
+
+    completion_rate = ProductivityMonth.completion_rate
+    late_rate = ProductivityMonth.late_rate
+    items_per_day = ProductivityMonth.items_per_day
+
+    def __str__(self):
+        return f"{self.team.name} - {self.month}/{self.year}"
+
+
+class ProductivityRun(models.Model):
+    """ One row per refresh_productivity run; the next run re-reads sheets updated since `started_at` """
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    full = models.BooleanField(default=False)
+    months_refreshed = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+
     def __str__(self):
-        return f"Task: {self.task} ({self.status})"
\ No newline at end of file
+        return f"Productivity refresh {self.started_at:%Y-%m-%d %H:%M}"
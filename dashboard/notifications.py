@@ -0,0 +1,288 @@
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from accounts.models import User
+from .models import Notification, Broadcast
+from .mailer import queue_mail_batch
+from .realtime import publish
+
+# Rows per INSERT; 20k recipients is ten statements
+CHUNK_SIZE = 2000
+
+
+# ==========================================
+# 1. FAN-OUT
+# ==========================================
+
+def _insert(batch):
+    """ bulk_create + bump the recipients' unread counters in the same transaction, then push to open pages """
+    with transaction.atomic():
+        Notification.objects.bulk_create(batch)
+        per_user = Counter(n.recipient_id for n in batch)
+        by_count = defaultdict(list)
+        for user_id, n in per_user.items():
+            by_count[n].append(user_id)
+        event = {'type': 'notification', 'title': batch[0].title}
+        for n, user_ids in by_count.items():
+            User.objects.filter(id__in=user_ids).update(unread_notifications=F('unread_notifications') + n)
+            publish(user_ids, {**event, 'count': n})
+    return len(batch)
+
+
+def notify_many(recipients, sender, title, message, chunk_size=CHUNK_SIZE):
+    """
+    One Notification per recipient (User objects or ids), inserted with chunked
+    bulk_create. Returns the number created.
+    """
+    title = title[:100]
+    total = 0
+    batch = []
+    for recipient in recipients:
+        recipient_id = recipient if isinstance(recipient, int) else recipient.pk
+        batch.append(Notification(recipient_id=recipient_id, sender=sender, title=title, message=message))
+        if len(batch) >= chunk_size:
+            total += _insert(batch)
+            batch = []
+    if batch:
+        total += _insert(batch)
+    return total
+
+
+def notify(recipient, sender, title, message):
+    return notify_many([recipient], sender, title, message)
+
+
+# ==========================================
+# 2. READ STATE
+# ==========================================
+# The unread counter only moves by the number of rows an UPDATE actually
+# flipped, so concurrent inserts and double clicks can't make it drift.
+
+@transaction.atomic
+def mark_read(user, notification_ids=None):
+    """ Marks the given (or all) unread notifications of `user` as read. Returns how many changed. """
+    unread = Notification.objects.filter(recipient=user, is_read=False)
+    if notification_ids is not None:
+        unread = unread.filter(id__in=notification_ids)
+    changed = unread.update(is_read=True)
+    if changed:
+        User.objects.filter(id=user.id).update(
+            unread_notifications=Greatest(F('unread_notifications') - changed, 0)
+        )
+        user.unread_notifications = max(user.unread_notifications - changed, 0)
+        publish([user.id], {'type': 'read', 'unread': user.unread_notifications})
+    return changed
+
+
+def _decrement(counts):
+    """ counts: {user_id: unread rows going away}; one UPDATE per distinct amount """
+    by_count = defaultdict(list)
+    for user_id, n in counts.items():
+        by_count[n].append(user_id)
+    for n, user_ids in by_count.items():
+        User.objects.filter(id__in=user_ids).update(unread_notifications=Greatest(F('unread_notifications') - n, 0))
+
+
+def forget_sender(user):
+    """
+    Before `user` is deleted: their notifications are about to be cascaded
+    away, so the recipients' unread counters drop by the unread ones.
+    """
+    _decrement(dict(
+        Notification.objects.filter(sender=user, is_read=False).exclude(recipient=user)
+        .values('recipient_id').annotate(n=Count('id')).values_list('recipient_id', 'n')
+    ))
+
+
+def rebuild_unread_counters(user_ids=None):
+    """ Recounts unread_notifications from the Notification table (rebuild_unread_counters command). Returns users fixed. """
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    actual = dict(
+        Notification.objects.filter(recipient__in=users, is_read=False)
+        .values('recipient_id').annotate(n=Count('id')).values_list('recipient_id', 'n')
+    )
+    stale = defaultdict(list)
+    for user_id, stored in users.values_list('id', 'unread_notifications'):
+        if stored != actual.get(user_id, 0):
+            stale[actual.get(user_id, 0)].append(user_id)
+    with transaction.atomic():
+        for n, ids in stale.items():
+            User.objects.filter(id__in=ids).update(unread_notifications=n)
+    return sum(len(ids) for ids in stale.values())
+
+
+# ==========================================
+# 3. BROADCASTS (send_broadcasts worker)
+# ==========================================
+
+def broadcast_audience(broadcast):
+    users = User.objects.filter(company_id=broadcast.company_id, is_approved=True)
+    if broadcast.team_id:
+        users = users.filter(team_id=broadcast.team_id)
+    return users
+
+
+def deliver_broadcast(broadcast, chunk_size=CHUNK_SIZE):
+    """
+    Fans a broadcast out in keyset chunks of user ids. Each chunk's inserts and
+    the progress marker commit together, so a crash resumes where it stopped
+    without duplicating anything.
+    """
+    audience = broadcast_audience(broadcast).order_by('id')
+    while True:
+        with transaction.atomic():
+            ids = list(audience.filter(id__gt=broadcast.last_user_id).values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            notify_many(ids, broadcast.sender, broadcast.title, broadcast.message, chunk_size)
+            broadcast.last_user_id = ids[-1]
+            broadcast.recipient_count += len(ids)
+            broadcast.status = 'sending'
+            broadcast.save(update_fields=['last_user_id', 'recipient_count', 'status'])
+
+    broadcast.status = 'done'
+    broadcast.completed_at = timezone.now()
+    broadcast.save(update_fields=['status', 'completed_at'])
+    return broadcast
+
+
+def claim_broadcast():
+    """ Next queued broadcast, claimed with a conditional UPDATE """
+    for broadcast in Broadcast.objects.filter(status='queued').order_by('id')[:10]:
+        if Broadcast.objects.filter(id=broadcast.id, status='queued').update(status='sending'):
+            broadcast.status = 'sending'
+            return broadcast
+    return None
+
+
+def run_broadcast_worker(interval=2, once=False, log=None):
+    """ Run one worker: on start it first finishes broadcasts a previous run left half-sent """
+    for broadcast in Broadcast.objects.filter(status='sending').order_by('id'):
+        deliver_broadcast(broadcast)
+        if log:
+            log(broadcast, None)
+
+    while True:
+        broadcast = claim_broadcast()
+        if broadcast is None:
+            if once:
+                return
+            time.sleep(interval)
+            continue
+        started = time.monotonic()
+        deliver_broadcast(broadcast)
+        if log:
+            log(broadcast, time.monotonic() - started)
+
+
+# ==========================================
+# 4. EMAIL DIGESTS (send_notification_digests command)
+# ==========================================
+# Users on an hourly/daily digest get no per-event email; their unread
+# notifications since the last digest are collected into one message.
+
+DIGEST_PERIODS = {'hourly': timedelta(hours=1), 'daily': timedelta(days=1)}
+DIGEST_SLACK = timedelta(minutes=5)  # cron drift shouldn't push a digest to the next run
+DIGEST_MAX_ITEMS = 50                # listed one per line; the rest are only counted
+
+
+def digest_body(user, items):
+    lines = [f"Hi {user.username},", "", f"You have {len(items)} new notification(s):", ""]
+    for notif in items[:DIGEST_MAX_ITEMS]:
+        created = timezone.localtime(notif.created_at)
+        lines.append(f"- {created:%b %d %H:%M}  {notif.title} (from {notif.sender.username})")
+    if len(items) > DIGEST_MAX_ITEMS:
+        lines.append(f"...and {len(items) - DIGEST_MAX_ITEMS} more.")
+    lines += ["", "Open HRMS to read them."]
+    return "\n".join(lines)
+
+
+def send_digests(frequency, now=None, chunk_size=500):
+    """
+    Queues one email per due user on the `frequency` digest. Each keyset chunk
+    of users is locked, their notifications loaded in one query, the emails
+    inserted in one statement and digest_sent_at moved forward, all in one
+    transaction, so overlapping runs can't send a digest twice.
+    Returns (users_checked, emails_queued).
+    """
+    now = now or timezone.now()
+    period = DIGEST_PERIODS[frequency]
+    users = (
+        User.objects.filter(email_digest=frequency, is_active=True).exclude(email='')
+        .filter(Q(digest_sent_at__isnull=True) | Q(digest_sent_at__lte=now - period + DIGEST_SLACK))
+        .order_by('id')
+    )
+    checked = queued = last_id = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                users.select_for_update(of=('self',)).select_related('company')
+                .filter(id__gt=last_id)[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            since = {user.id: user.digest_sent_at or now - period for user in chunk}
+
+            items = defaultdict(list)
+            notifs = Notification.objects.filter(
+                recipient_id__in=since, is_read=False,
+                created_at__gt=min(since.values()), created_at__lte=now,
+            ).select_related('sender').order_by('created_at')
+            for notif in notifs:
+                if notif.created_at > since[notif.recipient_id]:
+                    items[notif.recipient_id].append(notif)
+
+            queued += queue_mail_batch(
+                (f"HRMS digest: {len(items[user.id])} new notification(s)",
+                 digest_body(user, items[user.id]), [user.email], user.company)
+                for user in chunk if items[user.id]
+            )
+            User.objects.filter(id__in=since).update(digest_sent_at=now)
+            checked += len(chunk)
+    return checked, queued
+
+
+# ==========================================
+# 5. RETENTION (prune_notifications command)
+# ==========================================
+# Only read notifications are pruned, so unread counters never change.
+
+ARCHIVE_COLUMNS = ('id', 'recipient_id', 'sender_id', 'title', 'message', 'created_at')
+
+
+def prune_notifications(older_than, chunk_size=5000, archive=None):
+    """
+    Deletes read notifications created before `older_than`, `chunk_size` ids
+    per short transaction so the table is never locked for long. Ids grow
+    with created_at, so the walk is a primary key range scan up to the newest
+    expired id. `archive` (a csv.writer) receives each row before it is
+    deleted. Returns the number deleted.
+    """
+    newest = (
+        Notification.objects.filter(created_at__lt=older_than)
+        .order_by('-id').values_list('id', flat=True).first()
+    )
+    if newest is None:
+        return 0
+
+    expired = Notification.objects.filter(id__lte=newest, is_read=True, created_at__lt=older_than).order_by('id')
+    columns = ARCHIVE_COLUMNS if archive is not None else ('id',)
+    deleted = last_id = 0
+    while True:
+        with transaction.atomic():
+            rows = list(expired.filter(id__gt=last_id).values_list(*columns)[:chunk_size])
+            if not rows:
+                break
+            if archive is not None:
+                archive.writerows(rows)
+            ids = [row[0] for row in rows]
+            deleted += Notification.objects.filter(id__in=ids, is_read=True).delete()[0]
+            last_id = ids[-1]
+    return deleted
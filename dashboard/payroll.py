@@ -0,0 +1,108 @@
+import calendar
+from decimal import Decimal
+from django.db import transaction
+from accounts.models import User
+from .models import AttendanceMonthSummary, PayrollRun, PayrollLine
+from .holidays import month_holidays
+from .workdays import working_days_in_month
+from .attendance import ensure_month_summaries
+
+
+def calculate_salary(base_salary, esi_percentage, professional_tax, num_days, absent=0, late_2nd=0, late_3rd=0):
+    """ Salary slip math shared by the attendance page and the payroll run; num_days = working days of the month """
+    base_salary = Decimal(base_salary)
+    per_day_salary = base_salary / Decimal(max(num_days, 1))
+
+    full_day_cuts = absent + late_3rd
+    full_deduction = per_day_salary * Decimal(full_day_cuts)
+
+    half_deduction = (per_day_salary / Decimal(2)) * Decimal(late_2nd)
+
+    gross_salary = base_salary - (full_deduction + half_deduction)
+
+    esi_deduction = (gross_salary * esi_percentage) / Decimal(100)
+    p_tax = professional_tax
+    net_salary = gross_salary - esi_deduction - p_tax
+
+    return {
+        'base_salary': round(base_salary, 2),
+        'per_day': round(per_day_salary, 2),
+        'absent_days': absent,
+        'late_3rd_days': late_3rd,
+        'full_day_deduction': round(full_deduction, 2),
+        'late_2nd_days': late_2nd,
+        'half_day_deduction': round(half_deduction, 2),
+        'gross_salary': round(gross_salary, 2),
+        'esi_pct': esi_percentage,
+        'esi_amount': round(esi_deduction, 2),
+        'p_tax': round(p_tax, 2),
+        'net_salary': round(net_salary, 2)
+    }
+
+
+def attendance_counts(company, year, month):
+    """ {user_id: AttendanceMonthSummary} for the whole company, read from the maintained summary rows """
+    user_ids = User.objects.filter(company=company, is_approved=True).values_list('id', flat=True)
+    ensure_month_summaries(user_ids, year, month)
+    summaries = AttendanceMonthSummary.objects.filter(
+        user__company=company, year=year, month=month
+    ).only('user_id', 'absent', 'late_2nd', 'late_3rd')
+    return {s.user_id: s for s in summaries}
+
+
+@transaction.atomic
+def run_payroll(company, year, month, created_by=None):
+    """
+    Computes salary for every approved employee of the company and stores it.
+    Query count is fixed (users, monthly summaries, writes) no matter
+    how many people are on the payroll. Re-running a month replaces its lines.
+    """
+    num_days = calendar.monthrange(year, month)[1]
+
+    employees = User.objects.filter(company=company, is_approved=True).only(
+        'id', 'monthly_salary', 'esi_percentage', 'professional_tax'
+    )
+    counts = attendance_counts(company, year, month)
+    holiday_days = len(month_holidays(company.id, year, month))
+    working_days = working_days_in_month(company, year, month)
+
+    run, _ = PayrollRun.objects.update_or_create(
+        company=company, year=year, month=month,
+        defaults={
+            'total_days': num_days, 'working_days': working_days,
+            'holiday_days': holiday_days, 'created_by': created_by
+        }
+    )
+    run.lines.all().delete()
+
+    lines = []
+    total_net = Decimal(0)
+    for employee in employees.iterator(chunk_size=2000):
+        c = counts[employee.id]
+        slip = calculate_salary(
+            employee.monthly_salary, employee.esi_percentage, employee.professional_tax,
+            working_days, c.absent, c.late_2nd, c.late_3rd
+        )
+        total_net += slip['net_salary']
+        lines.append(PayrollLine(
+            run=run,
+            user_id=employee.id,
+            base_salary=slip['base_salary'],
+            per_day=slip['per_day'],
+            absent_days=slip['absent_days'],
+            late_2nd_days=slip['late_2nd_days'],
+            late_3rd_days=slip['late_3rd_days'],
+            full_day_deduction=slip['full_day_deduction'],
+            half_day_deduction=slip['half_day_deduction'],
+            gross_salary=slip['gross_salary'],
+            esi_percentage=slip['esi_pct'],
+            esi_amount=slip['esi_amount'],
+            professional_tax=slip['p_tax'],
+            net_salary=slip['net_salary'],
+        ))
+    PayrollLine.objects.bulk_create(lines, batch_size=1000)
+
+    run.employee_count = len(lines)
+    run.total_net = total_net
+    run.save(update_fields=['employee_count', 'total_net'])
+    return run
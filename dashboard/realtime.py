@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# ==========================================
+# REAL-TIME EVENTS (pub/sub)
+# ==========================================
+# Views and services publish small JSON-able dicts per user; the SSE and
+# long-poll endpoints subscribe. The default broker lives in this process,
+# which is enough for one ASGI worker. With several workers, point
+# settings.REALTIME_BROKER at a class with the same three methods backed by
+# something shared (Redis pub/sub, Postgres LISTEN/NOTIFY, ...).
+
+
+class Subscription:
+    """ One connected client: an asyncio queue bound to the loop that reads it """
+
+    def __init__(self, user_id, maxsize=100):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def push(self, event):
+        # Called from any thread; a client that stopped reading just loses events
+        def put():
+            if not self.queue.full():
+                self.queue.put_nowait(event)
+        try:
+            self.loop.call_soon_threadsafe(put)
+        except RuntimeError:
+            pass  # loop already closed: the client is gone
+
+    async def get(self, timeout):
+        """ Next event, or None after `timeout` seconds """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def drain(self):
+        """ Events already queued, without waiting """
+        events = []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+
+class InProcessBroker:
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """ Must be called from the coroutine that will read the subscription """
+        sub = Subscription(user_id)
+        with self._lock:
+            self._subscribers[user_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def publish(self, user_ids, event):
+        with self._lock:
+            targets = [sub for user_id in user_ids for sub in self._subscribers.get(user_id, ())]
+        for sub in targets:
+            sub.push(event)
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'REALTIME_BROKER', 'dashboard.realtime.InProcessBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish(user_ids, event):
+    """ Delivers `event` to the users' open connections once the current transaction commits """
+    user_ids = list(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: get_broker().publish(user_ids, event))
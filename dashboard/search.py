@@ -0,0 +1,217 @@
+import re
+from datetime import date
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from .models import WorkItem, TaskItem
+
+# ==========================================
+# TRACK SHEET SEARCH
+# ==========================================
+# One search row per WorkItem / TaskItem, kept in a table the ORM doesn't manage:
+# - SQLite: an FTS5 virtual table ranked with bm25(); the owner and kind are
+#   indexed columns too, so "this user's tasks matching X" is one FTS lookup
+# - PostgreSQL: a tsvector column with a GIN index, ranked with ts_rank()
+# Any other database falls back to icontains on the item tables.
+# dashboard.tracksheets writes the rows next to the items themselves;
+# `manage.py rebuild_search_index` refills the table from scratch.
+
+SEARCH_TABLE = 'dashboard_track_search'
+PAGE_SIZE = 20
+MAX_TERMS = 8
+
+# Highlight markers; swapped for <mark> after the snippet is HTML-escaped
+_START, _STOP = '\x02', '\x03'
+
+
+def search_backend(conn=None):
+    vendor = (conn or connection).vendor
+    return vendor if vendor in ('sqlite', 'postgresql') else None
+
+
+def _doc_id(kind, item_id):
+    """ Work and task ids share one key space in the search table """
+    return item_id * 2 + (1 if kind == 'task' else 0)
+
+
+def query_terms(text):
+    return re.findall(r'[^\W_]+', (text or '').lower())[:MAX_TERMS]
+
+
+# ==========================================
+# 1. TABLE (used by the rebuild command; migration 0016 has its own copy)
+# ==========================================
+
+def create_search_table(conn):
+    backend = search_backend(conn)
+    with conn.cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+                "USING fts5(body, owner, kind, day UNINDEXED, tokenize='porter unicode61')"
+            )
+        elif backend == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                "doc_id bigint PRIMARY KEY, owner_id integer NOT NULL, kind varchar(4) NOT NULL, "
+                "day date NOT NULL, body text NOT NULL, document tsvector NOT NULL)"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_doc ON {SEARCH_TABLE} USING gin (document)")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_owner ON {SEARCH_TABLE} (owner_id, kind)")
+
+
+def drop_search_table(conn):
+    if search_backend(conn):
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+def rebuild_index(conn=None):
+    """ Refills the search table from the item tables with two INSERT ... SELECTs. Returns the row count. """
+    conn = conn or connection
+    backend = search_backend(conn)
+    if backend is None:
+        return 0
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        for kind, table in (('work', 'dashboard_workitem'), ('task', 'dashboard_taskitem')):
+            offset = 1 if kind == 'task' else 0
+            if backend == 'sqlite':
+                cursor.execute(
+                    f"INSERT INTO {SEARCH_TABLE} (rowid, body, owner, kind, day) "
+                    f"SELECT i.id * 2 + {offset}, i.task, 'u' || s.user_id, '{kind}', s.date "
+                    f"FROM {table} i JOIN dashboard_tracksheet s ON s.id = i.track_sheet_id"
+                )
+            else:
+                cursor.execute(
+                    f"INSERT INTO {SEARCH_TABLE} (doc_id, owner_id, kind, day, body, document) "
+                    f"SELECT i.id * 2 + {offset}, s.user_id, '{kind}', s.date, i.task, to_tsvector('english', i.task) "
+                    f"FROM {table} i JOIN dashboard_tracksheet s ON s.id = i.track_sheet_id"
+                )
+        cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
+
+
+# ==========================================
+# 2. SYNC (called from dashboard.tracksheets)
+# ==========================================
+
+def index_items(kind, rows):
+    """ rows: (item_id, user_id, day, text) tuples of newly created items """
+    backend = search_backend()
+    if backend is None or not rows:
+        return
+    with connection.cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, body, owner, kind, day) VALUES (%s, %s, %s, %s, %s)",
+                [(_doc_id(kind, item_id), text, f'u{user_id}', kind, str(day)) for item_id, user_id, day, text in rows],
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (doc_id, owner_id, kind, day, body, document) "
+                "VALUES (%s, %s, %s, %s, %s, to_tsvector('english', %s)) ON CONFLICT (doc_id) DO NOTHING",
+                [(_doc_id(kind, item_id), user_id, kind, day, text, text) for item_id, user_id, day, text in rows],
+            )
+
+
+def unindex_item(kind, item_id):
+    backend = search_backend()
+    if backend is None:
+        return
+    key = 'rowid' if backend == 'sqlite' else 'doc_id'
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {key} = %s", [_doc_id(kind, item_id)])
+
+
+def unindex_owner(user):
+    """ Before `user` is deleted: their sheets and items cascade away without going through unindex_item """
+    backend = search_backend()
+    if backend is None:
+        return
+    with connection.cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN "
+                f"(SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s)",
+                [f"owner:u{user.id}"],
+            )
+        else:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE owner_id = %s", [user.id])
+
+
+# ==========================================
+# 3. QUERY
+# ==========================================
+
+def _highlight(snippet):
+    return mark_safe(escape(snippet).replace(_START, '<mark>').replace(_STOP, '</mark>'))
+
+
+def search_items(owner, text, include_work=True, page=1, page_size=PAGE_SIZE):
+    """
+    Ranked hits among `owner`'s work logs (only if `include_work`) and
+    assigned tasks, across all dates. Every term must match (as a prefix).
+    Returns (hits, has_next); a hit is a dict with kind, item_id, date, snippet.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return [], False
+    offset = (page - 1) * page_size
+    backend = search_backend()
+
+    if backend == 'sqlite':
+        phrases = ' AND '.join('"%s"*' % t for t in terms)
+        match = f"owner:u{owner.id} AND body:({phrases})"
+        if not include_work:
+            match += " AND kind:task"
+        sql = (
+            f"SELECT rowid, kind, day, snippet({SEARCH_TABLE}, 0, %s, %s, '…', 16) "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+            f"ORDER BY bm25({SEARCH_TABLE}, 10.0, 0.0, 0.0), day DESC LIMIT %s OFFSET %s"
+        )
+        params = [_START, _STOP, match, page_size + 1, offset]
+    elif backend == 'postgresql':
+        kinds = "" if include_work else "AND kind = 'task' "
+        sql = (
+            f"SELECT doc_id, kind, day, ts_headline('english', body, q, %s) "
+            f"FROM {SEARCH_TABLE}, to_tsquery('english', %s) q "
+            f"WHERE owner_id = %s {kinds}AND document @@ q "
+            f"ORDER BY ts_rank(document, q) DESC, day DESC LIMIT %s OFFSET %s"
+        )
+        options = f"StartSel={_START}, StopSel={_STOP}, MinWords=8, MaxWords=24"
+        params = [options, ' & '.join(f'{t}:*' for t in terms), owner.id, page_size + 1, offset]
+    else:
+        return _search_fallback(owner, terms, include_work, offset, page_size)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    hits = [
+        {
+            'kind': kind,
+            'item_id': doc_id // 2,
+            'date': day if isinstance(day, date) else date.fromisoformat(day),
+            'snippet': _highlight(snippet),
+        }
+        for doc_id, kind, day, snippet in rows[:page_size]
+    ]
+    return hits, len(rows) > page_size
+
+
+def _search_fallback(owner, terms, include_work, offset, page_size):
+    """ Unranked substring match for databases without a full-text backend """
+    hits = []
+    for kind, model in (('work', WorkItem), ('task', TaskItem)):
+        if kind == 'work' and not include_work:
+            continue
+        items = model.objects.filter(track_sheet__user=owner)
+        for term in terms:
+            items = items.filter(task__icontains=term)
+        hits += [
+            {'kind': kind, 'item_id': item_id, 'date': day, 'snippet': task}
+            for item_id, day, task in items.values_list('id', 'track_sheet__date', 'task')
+            .order_by('-track_sheet__date')[:offset + page_size + 1]
+        ]
+    hits.sort(key=lambda hit: hit['date'], reverse=True)
+    return hits[offset:offset + page_size], len(hits) > offset + page_size
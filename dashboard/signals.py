@@ -1,8 +1,16 @@
-from django.db.models.signals import post_save
+from datetime import date
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from accounts.models import User
-from .models import LeaveBalance
-from django.core.mail import send_mail
+from accounts.hierarchy import detach
+from .models import LeaveBalance, AttendanceRecord, PublicHoliday
+from .attendance import mark_month_dirty, refresh_company_month
+from .holidays import invalidate as invalidate_holidays
+from .mailer import queue_mail
+from .notifications import forget_sender
+from .analytics import forget_user as forget_productivity
+from .search import unindex_owner
 from django.conf import settings
 
 @receiver(post_save, sender=User)
@@ -17,5 +25,30 @@ def create_user_setup(sender, instance, created, **kwargs):
         if instance.role == 'HR':
              message = f'Hi {instance.username}, your Company {instance.company.name} is registered.'
         
-        # Fail silently ensures the app doesn't crash if email server is down
-        send_mail(subject, message, settings.EMAIL_HOST_USER, [instance.email], fail_silently=True)
\ No newline at end of file
+        # Queued: the send_queued_mail worker delivers it, so signup never waits on SMTP
+        queue_mail(subject, message, [instance.email], from_email=settings.EMAIL_HOST_USER)
+
+# --- Before a user goes: fix the reporting closure (reports_to of their people is SET_NULL)
+# the unread counters of everyone whose notifications from them cascade away,
+# the team productivity months their rows were summed into, and the search rows
+# of their cascaded work logs and tasks ---
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    detach(instance)
+    forget_sender(instance)
+    forget_productivity(instance)
+    unindex_owner(instance)
+
+# --- Keep AttendanceMonthSummary in sync ---
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def attendance_changed(sender, instance, **kwargs):
+    mark_month_dirty(instance.user_id, instance.date)
+
+@receiver(post_save, sender=PublicHoliday)
+@receiver(post_delete, sender=PublicHoliday)
+def holiday_changed(sender, instance, **kwargs):
+    # Unmarked days flip between Present and Holiday for the whole company
+    day = date.fromisoformat(str(instance.date))
+    transaction.on_commit(lambda: invalidate_holidays(instance.company_id, day.year))
+    transaction.on_commit(lambda: refresh_company_month(instance.company_id, day.year, day.month))
@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.mail import get_connection
+
+# ==========================================
+# SMTP CONNECTION POOL
+# ==========================================
+# Opening an SMTP session (TCP + STARTTLS + AUTH) costs far more than sending a
+# message on it, so workers borrow already-authenticated backends from here
+# instead of building a new get_connection() per email. Backends are pooled
+# per distinct SMTP settings (normally one key per Company).
+#
+# Tunable through settings.SMTP_POOL = {'max_idle': ..., 'idle_timeout': ..., ...}.
+
+DEFAULTS = {
+    'max_idle': 4,             # idle sessions kept per key
+    'idle_timeout': 60,        # seconds before an idle session is closed
+    'check_after': 10,         # NOOP-check sessions idle longer than this before reuse
+    'max_messages': 200,       # recycle a session after this many messages
+    'timeout': 30,             # socket timeout for new sessions
+}
+
+
+def smtp_settings(company):
+    """ get_connection() kwargs for a company's SMTP, or {} for the project's default backend """
+    if company and company.smtp_email and company.smtp_password:
+        return {
+            'host': company.smtp_server,
+            'port': company.smtp_port,
+            'username': company.smtp_email,
+            'password': company.smtp_password,
+            'use_tls': True,
+        }
+    return {}
+
+
+class PooledConnection:
+    """ A backend plus the bookkeeping the pool needs """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.opened_at = self.last_used = time.monotonic()
+        self.sent = 0
+
+    def is_alive(self):
+        """ NOOP round trip on SMTP backends; other backends (console, locmem) are always alive """
+        smtp = getattr(self.backend, 'connection', None)
+        if smtp is None or not hasattr(smtp, 'noop'):
+            return True
+        try:
+            return smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def close(self):
+        try:
+            self.backend.close()
+        except Exception:
+            pass
+
+
+class SMTPPool:
+    def __init__(self, **options):
+        self.options = {**DEFAULTS, **options}
+        self._idle = defaultdict(list)  # key -> [PooledConnection], most recently used last
+        self._lock = threading.Lock()
+        self.stats = defaultdict(int)   # opened / reused / discarded / health_failed
+
+    @staticmethod
+    def _key(params):
+        return tuple(sorted(params.items()))
+
+    def acquire(self, params):
+        """ An open backend for `params` (from smtp_settings), reused when possible """
+        key = self._key(params)
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                conn = self._idle[key].pop() if self._idle[key] else None
+            if conn is None:
+                break
+            idle = now - conn.last_used
+            if idle > self.options['idle_timeout']:
+                self._discard(conn)
+                continue
+            if idle > self.options['check_after'] and not conn.is_alive():
+                self.stats['health_failed'] += 1
+                self._discard(conn)
+                continue
+            self.stats['reused'] += 1
+            return conn
+
+        backend = get_connection(timeout=self.options['timeout'], **params)
+        backend.open()
+        self.stats['opened'] += 1
+        return PooledConnection(backend)
+
+    def release(self, params, conn, broken=False):
+        """ Hands a backend back; broken or worn-out sessions are closed instead of kept """
+        conn.last_used = time.monotonic()
+        if broken or conn.sent >= self.options['max_messages']:
+            self._discard(conn)
+            return
+        key = self._key(params)
+        with self._lock:
+            if len(self._idle[key]) < self.options['max_idle']:
+                self._idle[key].append(conn)
+                return
+        self._discard(conn)
+
+    @contextmanager
+    def session(self, params):
+        conn = self.acquire(params)
+        try:
+            yield conn
+        except Exception:
+            self.release(params, conn, broken=True)
+            raise
+        else:
+            self.release(params, conn)
+
+    def send(self, conn, message):
+        """ Sends one EmailMessage on a pooled session """
+        conn.backend.send_messages([message])
+        conn.sent += 1
+
+    def _discard(self, conn):
+        self.stats['discarded'] += 1
+        conn.close()
+
+    def prune(self):
+        """ Closes sessions that have been idle longer than idle_timeout """
+        cutoff = time.monotonic() - self.options['idle_timeout']
+        with self._lock:
+            stale = [c for conns in self._idle.values() for c in conns if c.last_used < cutoff]
+            for key in list(self._idle):
+                self._idle[key] = [c for c in self._idle[key] if c.last_used >= cutoff]
+        for conn in stale:
+            self._discard(conn)
+
+    def close_all(self):
+        with self._lock:
+            conns = [c for conns in self._idle.values() for c in conns]
+            self._idle.clear()
+        for conn in conns:
+            self._discard(conn)
+
+
+pool = SMTPPool(**getattr(settings, 'SMTP_POOL', {}))
@@ -1,3 +1,344 @@
+from datetime import date, datetime, timedelta
+from unittest import mock
+from django.db.models import Count, Q
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Company, User
+from .accrual import run_accrual
+from .leaves import LeaveActionError, approve_leave, approve_leaves
+from .models import (
+    Broadcast, LeaveAccrualPolicy, LeaveAccrualRun, LeaveBalance, LeaveLedgerEntry, LeaveRequest, Notification,
+    TrackSheet,
+)
+from .notifications import (
+    claim_broadcast, deliver_broadcast, mark_read, notify_many, rebuild_unread_counters, run_broadcast_worker,
+)
+from .tracksheets import (
+    ITEM_MODELS, TrackPermissionError, archive_task, assign_tasks, change_status, delete_item, log_work,
+    remove_item,
+)
+from .views import TASK_OUTBOX_PAGE_SIZE
 
-# Create your tests here.
+
+def make_company(name='Acme'):
+    return Company.objects.create(name=name, hr_email=f'hr@{name.lower()}.test')
+
+
+def make_user(company, username, **fields):
+    return User.objects.create_user(username=username, company=company, is_approved=True, **fields)
+
+
+class LeaveApprovalTests(TestCase):
+    """ However many times a leave is approved, its balance is debited once """
+
+    def setUp(self):
+        self.company = make_company()
+        self.employee = make_user(self.company, 'emp')
+        self.manager = make_user(self.company, 'boss')
+        LeaveBalance.objects.filter(user=self.employee).update(casual_leave=10)
+        self.leave = LeaveRequest.objects.create(
+            user=self.employee, leave_type='Casual', reason='Trip',
+            start_date=date(2026, 10, 19), end_date=date(2026, 10, 21),
+        )
+        self.leave.approvers.add(self.manager)
+
+    def balance(self):
+        return LeaveBalance.objects.get(user=self.employee).casual_leave
+
+    def test_approve_twice(self):
+        days = self.leave.days_requested
+        self.assertEqual(days, 3)  # Mon-Wed
+        approve_leave(self.leave, self.manager)
+        with self.assertRaises(LeaveActionError):
+            approve_leave(LeaveRequest.objects.get(id=self.leave.id), self.manager)
+
+        self.assertEqual(self.balance(), 10 - days)
+        self.assertEqual(LeaveLedgerEntry.objects.filter(leave_request=self.leave).count(), 1)
+
+    def test_stale_copy_cannot_approve_again(self):
+        # Two approvers holding the same Pending row: only the first claim wins
+        stale = LeaveRequest.objects.get(id=self.leave.id)
+        approve_leave(self.leave, self.manager)
+        with self.assertRaises(LeaveActionError):
+            approve_leave(stale, self.manager)
+        self.assertEqual(self.balance(), 10 - self.leave.days_requested)
+
+    def test_batch_after_single(self):
+        approve_leave(self.leave, self.manager)
+        approved, skipped = approve_leaves([self.leave.id], self.manager)
+
+        self.assertEqual((approved, skipped), ([], []))
+        self.assertEqual(self.balance(), 10 - self.leave.days_requested)
+        self.assertEqual(LeaveLedgerEntry.objects.filter(leave_request=self.leave).count(), 1)
+
+    def test_batch_twice(self):
+        approved, _ = approve_leaves([self.leave.id], self.manager)
+        self.assertEqual([leave.id for leave in approved], [self.leave.id])
+        self.assertEqual(approve_leaves([self.leave.id], self.manager), ([], []))
+
+        self.assertEqual(LeaveRequest.objects.get(id=self.leave.id).status, 'Approved')
+        self.assertEqual(self.balance(), 10 - self.leave.days_requested)
+        self.assertEqual(LeaveLedgerEntry.objects.filter(leave_request=self.leave).count(), 1)
+
+    def test_insufficient_balance_rolls_back(self):
+        LeaveBalance.objects.filter(user=self.employee).update(casual_leave=1)
+        with self.assertRaises(LeaveActionError):
+            approve_leave(self.leave, self.manager)
+
+        self.assertEqual(LeaveRequest.objects.get(id=self.leave.id).status, 'Pending')
+        self.assertEqual(self.balance(), 1)
+        self.assertFalse(LeaveLedgerEntry.objects.filter(leave_request=self.leave).exists())
+
+
+class TrackSheetCounterTests(TestCase):
+    """ The per-day counters must match a COUNT over the items after every write """
+
+    def setUp(self):
+        self.company = make_company()
+        self.employee = make_user(self.company, 'emp')
+        self.manager = make_user(self.company, 'boss')
+        self.day = date(2026, 10, 19)
+
+    def sheet(self):
+        return TrackSheet.objects.get(user=self.employee, date=self.day)
+
+    def assertCountersMatch(self):
+        sheet = self.sheet()
+        for kind, model in ITEM_MODELS.items():
+            actual = model.objects.filter(track_sheet=sheet).aggregate(
+                total=Count('id'),
+                in_progress=Count('id', filter=Q(status='In Progress')),
+                completed=Count('id', filter=Q(status='Completed')),
+            )
+            stored = {name: getattr(sheet, f'{kind}_{name}') for name in actual}
+            self.assertEqual(stored, actual, kind)
+
+    def test_status_changes_and_deletes(self):
+        work = [log_work(self.employee, self.employee, self.day, f'Work {n}') for n in range(3)]
+        change_status(self.employee, self.employee, 'work', work[0].id, 'Completed')
+        change_status(self.employee, self.employee, 'work', work[1].id, 'In Progress')
+        self.assertCountersMatch()
+
+        remove_item(self.employee, self.employee, 'work', work[0].id)
+        remove_item(self.employee, self.employee, 'work', work[1].id)
+        self.assertCountersMatch()
+        self.assertEqual((self.sheet().work_total, self.sheet().work_completed), (1, 0))
+
+    def test_delete_is_counted_once(self):
+        item = log_work(self.employee, self.employee, self.day, 'Report')
+        change_status(self.employee, self.employee, 'work', item.id, 'Completed')
+        stale = ITEM_MODELS['work'].objects.get(id=item.id)
+
+        self.assertTrue(delete_item('work', item))
+        self.assertFalse(delete_item('work', stale))
+        self.assertCountersMatch()
+        self.assertEqual(self.sheet().work_total, 0)
+
+    def test_delete_uses_the_stored_status(self):
+        # The copy in hand still says Pending; the row was completed meanwhile
+        item = log_work(self.employee, self.employee, self.day, 'Report')
+        change_status(self.employee, self.employee, 'work', item.id, 'Completed')
+        self.assertEqual(item.status, 'Pending')
+
+        delete_item('work', item)
+        self.assertCountersMatch()
+
+    def test_assigned_tasks(self):
+        tasks = assign_tasks(self.manager, [self.employee.id], [self.day], 'Review')
+        tasks += assign_tasks(self.manager, [self.employee.id], [self.day], 'Ship')
+        change_status(self.employee, self.employee, 'task', tasks[0].id, 'In Progress')
+        self.assertCountersMatch()
+
+        with self.assertRaises(TrackPermissionError):
+            remove_item(self.employee, self.employee, 'task', tasks[0].id)
+        remove_item(self.employee, self.manager, 'task', tasks[0].id)
+        self.assertCountersMatch()
+        self.assertEqual((self.sheet().task_total, self.sheet().task_in_progress), (1, 0))
+
+
+class UnreadCounterTests(TestCase):
+    """ User.unread_notifications must equal the unread rows, so a rebuild has nothing to fix """
+
+    def setUp(self):
+        self.company = make_company()
+        self.hr = make_user(self.company, 'hr', role='HR')
+        self.lead = make_user(self.company, 'lead')
+        self.staff = [make_user(self.company, f'emp{n}') for n in range(3)]
+
+    def unread(self, user):
+        return User.objects.get(id=user.id).unread_notifications
+
+    def test_fan_out_and_mark_read(self):
+        notify_many(self.staff, self.hr, 'Policy', 'Read it')
+        notify_many(self.staff[:1], self.lead, 'Standup', 'Moved to 10')
+        self.assertEqual([self.unread(u) for u in self.staff], [2, 1, 1])
+
+        user = self.staff[0]
+        first = Notification.objects.filter(recipient=user).values_list('id', flat=True).first()
+        self.assertEqual(mark_read(user, [first]), 1)
+        self.assertEqual(mark_read(user, [first]), 0)  # a double click changes nothing
+        self.assertEqual(self.unread(user), 1)
+        self.assertEqual(mark_read(user), 1)
+        self.assertEqual(self.unread(user), 0)
+        self.assertEqual(rebuild_unread_counters(), 0)
+
+    def test_sender_deleted(self):
+        notify_many(self.staff, self.hr, 'Policy', 'Read it')
+        notify_many(self.staff, self.lead, 'Standup', 'Moved to 10')
+        mark_read(self.staff[1], Notification.objects.filter(sender=self.lead).values_list('id', flat=True))
+
+        self.lead.delete()
+        self.assertEqual([self.unread(u) for u in self.staff], [1, 1, 1])
+        self.assertEqual(rebuild_unread_counters(), 0)
+
+    def test_recipient_deleted(self):
+        notify_many(self.staff, self.hr, 'Policy', 'Read it')
+        self.staff[0].delete()
+
+        self.assertEqual([self.unread(u) for u in self.staff[1:]], [1, 1])
+        self.assertEqual(rebuild_unread_counters(), 0)
+
+
+class AccrualTests(TestCase):
+    """ A month (and a year's carry-forward) is applied at most once per company """
+
+    def setUp(self):
+        self.company = make_company()
+        LeaveAccrualPolicy.objects.create(
+            company=self.company, casual_per_month=2, sick_per_month=1, casual_carry_forward=3,
+        )
+        joined = timezone.make_aware(datetime(2025, 6, 1))
+        self.users = [make_user(self.company, f'emp{n}', date_joined=joined) for n in range(3)]
+        self.late = make_user(self.company, 'late', date_joined=timezone.make_aware(datetime(2026, 3, 20)))
+
+    def balances(self):
+        return dict(LeaveBalance.objects.values_list('user__username', 'casual_leave'))
+
+    def test_month_applied_once(self):
+        carry, credit = run_accrual(self.company, 2026, 3)
+        self.assertIsNone(carry)
+        self.assertEqual(credit.employee_count, 3)  # 'late' joined after the cutoff day
+
+        self.assertEqual(run_accrual(self.company, 2026, 3), (None, None))
+        self.assertEqual(self.balances(), {'emp0': 2, 'emp1': 2, 'emp2': 2, 'late': 0})
+        self.assertEqual(LeaveLedgerEntry.objects.filter(source='accrual').count(), 6)
+        self.assertEqual(LeaveAccrualRun.objects.count(), 1)
+
+    def test_next_month_credits_again(self):
+        run_accrual(self.company, 2026, 3)
+        run_accrual(self.company, 2026, 4)
+        self.assertEqual(self.balances(), {'emp0': 4, 'emp1': 4, 'emp2': 4, 'late': 2})
+
+    def test_carry_forward_applied_once(self):
+        LeaveBalance.objects.update(casual_leave=10)
+        carry, credit = run_accrual(self.company, 2027, 1)
+        self.assertIsNotNone(carry)
+        self.assertIsNotNone(credit)
+        self.assertEqual(run_accrual(self.company, 2027, 1), (None, None))
+
+        # Trimmed to 3, then January's 2 credited, once
+        self.assertEqual(set(self.balances().values()), {5})
+
+    def test_ledger_replays_to_the_balances(self):
+        run_accrual(self.company, 2026, 3)
+        run_accrual(self.company, 2026, 3)
+        for user in self.users:
+            total = sum(LeaveLedgerEntry.objects.filter(user=user, leave_type='Casual').values_list('delta', flat=True))
+            self.assertEqual(total, LeaveBalance.objects.get(user=user).casual_leave)
+
+
+class BroadcastTests(TestCase):
+    """ Each broadcast is claimed by one worker and reaches each employee once, even across restarts """
+
+    def setUp(self):
+        self.company = make_company()
+        self.hr = make_user(self.company, 'hr', role='HR')
+        self.staff = [make_user(self.company, f'emp{n}') for n in range(5)]
+        self.broadcast = Broadcast.objects.create(
+            company=self.company, sender=self.hr, title='Office closed', message='Friday',
+        )
+
+    def received(self):
+        return sorted(Notification.objects.filter(title='Office closed').values_list('recipient_id', flat=True))
+
+    def audience(self):
+        return sorted(u.id for u in [self.hr] + self.staff)
+
+    def test_claimed_once(self):
+        claimed = claim_broadcast()
+        self.assertEqual(claimed.id, self.broadcast.id)
+        self.assertIsNone(claim_broadcast())
+        self.assertEqual(Broadcast.objects.get(id=self.broadcast.id).status, 'sending')
+
+    def test_delivered_once(self):
+        deliver_broadcast(claim_broadcast(), chunk_size=2)
+        run_broadcast_worker(once=True)
+
+        broadcast = Broadcast.objects.get(id=self.broadcast.id)
+        self.assertEqual((broadcast.status, broadcast.recipient_count), ('done', 6))
+        self.assertEqual(self.received(), self.audience())
+
+    def test_resume_after_crash(self):
+        # The first chunk committed together with its progress marker, then the worker died
+        broadcast = claim_broadcast()
+        first = self.audience()[:2]
+        notify_many(first, self.hr, broadcast.title, broadcast.message)
+        Broadcast.objects.filter(id=broadcast.id).update(last_user_id=first[-1], recipient_count=2)
+
+        run_broadcast_worker(once=True)
+        self.assertEqual(self.received(), self.audience())
+        self.assertEqual(Broadcast.objects.get(id=broadcast.id).recipient_count, 6)
+        self.assertEqual(rebuild_unread_counters(), 0)
+
+
+class OutboxTests(TestCase):
+    """ Following next_before from the first page lists every task once, newest date first """
+
+    def setUp(self):
+        self.company = make_company()
+        self.manager = make_user(self.company, 'boss')
+        self.staff = [make_user(self.company, f'emp{n}') for n in range(4)]
+        # Many tasks share a date, so pages break inside a day and the id tie-break matters
+        days = [date(2026, 10, 1) + timedelta(days=n) for n in range(30)]
+        self.tasks = assign_tasks(self.manager, [u.id for u in self.staff], days, 'Timesheet')
+        self.assertGreater(len(self.tasks), 2 * TASK_OUTBOX_PAGE_SIZE)
+        self.client.force_login(self.manager)
+
+    def walk(self, **params):
+        seen, pages, before = [], 0, None
+        while True:
+            query = dict(params, **({'before': before} if before else {}))
+            response = self.client.get(reverse('task_outbox'), query)
+            self.assertEqual(response.status_code, 200)
+            seen += [(task.date, task.id) for task in response.context['tasks']]
+            pages += 1
+            before = response.context['next_before']
+            if not before:
+                return seen, pages
+
+    def test_pages_cover_every_task_once(self):
+        seen, pages = self.walk()
+        self.assertEqual(pages, -(-len(self.tasks) // TASK_OUTBOX_PAGE_SIZE))
+        self.assertEqual(seen, sorted(((t.date, t.id) for t in self.tasks), reverse=True))
+
+    def test_pages_keep_the_filters(self):
+        done = self.tasks[::4]
+        for task in done:
+            change_status(task.track_sheet.user, task.track_sheet.user, 'task', task.id, 'Completed')
+        archive_task(self.manager, self.tasks[0].id)
+
+        with mock.patch('dashboard.views.TASK_OUTBOX_PAGE_SIZE', 7):
+            seen, pages = self.walk(status='Pending', assignee=self.staff[1].id)
+        self.assertGreater(pages, 1)
+        expected = [
+            t for t in self.tasks
+            if t not in done and t.track_sheet.user_id == self.staff[1].id and t.id != self.tasks[0].id
+        ]
+        self.assertEqual(seen, sorted(((t.date, t.id) for t in expected), reverse=True))
+
+    def test_only_own_tasks(self):
+        other = make_user(self.company, 'other')
+        assign_tasks(other, [self.staff[0].id], [date(2026, 10, 20)], 'Not yours')
+        seen, _ = self.walk()
+        self.assertEqual(len(seen), len(self.tasks))
@@ -0,0 +1,215 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from accounts.hierarchy import is_above
+from .models import TrackSheet, WorkItem, TaskItem
+from .notifications import notify, notify_many
+from .search import index_items, unindex_item
+
+ITEM_MODELS = {'work': WorkItem, 'task': TaskItem}
+STATUSES = [value for value, _ in WorkItem.STATUS_CHOICES]
+
+# Statuses with their own TrackSheet counter; Pending is the total minus these
+STATUS_COUNTERS = {'In Progress': 'in_progress', 'Completed': 'completed'}
+
+
+def can_view_work(viewer, target):
+    """ Work logs are private to the employee, anyone they report to and HR; assigned tasks are visible to anyone """
+    return viewer == target or viewer.role == 'HR' or is_above(viewer, target)
+
+
+# ==========================================
+# COUNTER MAINTENANCE
+# ==========================================
+# Every item write goes through here so the TrackSheet counters (and the
+# search index) move in the same transaction as the item. Counters are changed with F() expressions,
+# never read-modify-write, so concurrent writers can't lose updates.
+
+def _counts(status, step):
+    counts = {'total': step}
+    if status in STATUS_COUNTERS:
+        counts[STATUS_COUNTERS[status]] = step
+    return counts
+
+
+def _adjust(sheet_id, kind, counts):
+    changes = {f'{kind}_{name}': F(f'{kind}_{name}') + n for name, n in counts.items() if n}
+    if changes:
+        TrackSheet.objects.filter(id=sheet_id).update(**changes, updated_at=timezone.now())
+
+
+@transaction.atomic
+def add_item(sheet, kind, **fields):
+    """ Creates a WorkItem ('work') or TaskItem ('task') on `sheet` and counts it """
+    if kind == 'task':
+        fields.setdefault('date', sheet.date)
+    item = ITEM_MODELS[kind].objects.create(track_sheet=sheet, **fields)
+    _adjust(sheet.id, kind, _counts(item.status, 1))
+    index_items(kind, [(item.id, sheet.user_id, sheet.date, item.task)])
+    return item
+
+
+@transaction.atomic
+def set_item_status(kind, item, status):
+    """
+    Moves `item` to `status` (one of STATUSES). The UPDATE is conditional on
+    the status we read, so when two people change the same item only the
+    writer that actually changed it moves the counters. Returns True if it changed.
+    """
+    old = item.status
+    if status == old:
+        return False
+    fields = {'status': status}
+    if kind == 'task':
+        fields['completed_on'] = timezone.localdate() if status == 'Completed' else None
+    if not ITEM_MODELS[kind].objects.filter(id=item.id, status=old).update(**fields):
+        return False
+    counts = _counts(status, 1)
+    for name, n in _counts(old, -1).items():
+        counts[name] = counts.get(name, 0) + n
+    _adjust(item.track_sheet_id, kind, counts)
+    for name, value in fields.items():
+        setattr(item, name, value)
+    return True
+
+
+@transaction.atomic
+def delete_item(kind, item):
+    """ Deletes `item` and uncounts it using its status as locked at delete time """
+    model = ITEM_MODELS[kind]
+    status = model.objects.select_for_update().filter(id=item.id).values_list('status', flat=True).first()
+    if status is None:
+        return False
+    model.objects.filter(id=item.id).delete()
+    _adjust(item.track_sheet_id, kind, _counts(status, -1))
+    unindex_item(kind, item.id)
+    return True
+
+
+# ==========================================
+# ACTIONS (form view and JSON endpoints)
+# ==========================================
+
+class TrackActionError(Exception):
+    """ Raised when a track sheet action can't be done; the message is shown to the user """
+
+
+class TrackPermissionError(TrackActionError):
+    """ The action is valid but this user may not do it (403 for the JSON endpoints) """
+
+
+def grid_day(day, sheet, show_work):
+    """ Context for one month-grid cell (dashboard/track_day_cell.html) """
+    return {
+        'day': day.day,
+        'date': day,
+        'sheet': sheet,
+        'day_status': sheet.day_status if (sheet and show_work) else "Pending",
+    }
+
+
+def _get_item(kind, target_user, item_id):
+    if kind not in ITEM_MODELS:
+        raise TrackActionError("Unknown item type.")
+    if not str(item_id).isdigit():
+        raise TrackActionError("Item not found.")
+    items = ITEM_MODELS[kind].objects.filter(id=item_id, track_sheet__user=target_user)
+    if kind == 'task':
+        items = items.select_related('assigned_by')
+    item = items.first()
+    if item is None:
+        raise TrackActionError("Item not found.")
+    return item
+
+
+def log_work(target_user, actor, day, text):
+    if actor != target_user:
+        raise TrackPermissionError("You can only log work on your own track sheet.")
+    if not text:
+        raise TrackActionError("Describe the work first.")
+    sheet, _ = TrackSheet.objects.get_or_create(user=target_user, date=day)
+    return add_item(sheet, 'work', task=text[:255], status='Pending')
+
+
+def assign_task(target_user, actor, day, text):
+    if not text:
+        raise TrackActionError("Describe the task first.")
+    sheet, _ = TrackSheet.objects.get_or_create(user=target_user, date=day)
+    item = add_item(sheet, 'task', task=text[:255], assigned_by=actor, status='Pending')
+    notify(target_user, actor, f"New Task Assigned: {day}", f"Task: {text}\nBy: {actor.username}")
+    return item
+
+
+def change_status(target_user, actor, kind, item_id, status):
+    """ Work logs: only their owner. Tasks: the assignee or anyone who can open the sheet (as before). """
+    if status not in STATUSES:
+        raise TrackActionError("Unknown status.")
+    if kind == 'work' and actor != target_user:
+        raise TrackPermissionError("Only the employee can update their work log.")
+    item = _get_item(kind, target_user, item_id)
+    set_item_status(kind, item, status)
+    return item
+
+
+def remove_item(target_user, actor, kind, item_id):
+    item = _get_item(kind, target_user, item_id)
+    if kind == 'work' and actor != target_user:
+        raise TrackPermissionError("Only the employee can delete their work log.")
+    if kind == 'task' and item.assigned_by_id != actor.id:
+        raise TrackPermissionError("Permission Denied. You did not assign this task.")
+    delete_item(kind, item)
+    return item
+
+
+def archive_task(actor, task_id):
+    """ Hides a task from the assigner's outbox; the employee still sees it """
+    if not TaskItem.objects.filter(id=task_id, assigned_by=actor).update(sender_archived=True):
+        raise TrackPermissionError("Permission Denied. You did not assign this task.")
+
+
+# ==========================================
+# BULK ASSIGNMENT
+# ==========================================
+
+@transaction.atomic
+def assign_tasks(actor, user_ids, days, text):
+    """
+    Gives the same task to every user on every day in `days` with a fixed
+    number of statements, whatever the head count: one read of the existing
+    sheets, one insert of the missing ones plus a re-read for their ids, one
+    TaskItem insert, one counter UPDATE, one search-index insert and the
+    notification fan-out (one notification per person). Returns the TaskItems.
+    """
+    user_ids, days = sorted(set(user_ids)), sorted(set(days))
+    if not user_ids or not days:
+        return []
+    text = text[:255]
+
+    sheets = TrackSheet.objects.filter(user_id__in=user_ids, date__range=(days[0], days[-1]))
+    sheet_ids = {(s.user_id, s.date): s.id for s in sheets.only('id', 'user_id', 'date')}
+    missing = [
+        TrackSheet(user_id=user_id, date=day)
+        for user_id in user_ids for day in days if (user_id, day) not in sheet_ids
+    ]
+    if missing:
+        # ignore_conflicts: a sheet created concurrently is simply picked up by the re-read
+        TrackSheet.objects.bulk_create(missing, ignore_conflicts=True, batch_size=1000)
+        sheet_ids = {(s.user_id, s.date): s.id for s in sheets.only('id', 'user_id', 'date')}
+
+    items = TaskItem.objects.bulk_create([
+        TaskItem(track_sheet_id=sheet_ids[user_id, day], date=day, task=text, assigned_by=actor, status='Pending')
+        for user_id in user_ids for day in days
+    ], batch_size=1000)
+    # Every (user, day) is distinct, so each sheet gains exactly one pending task
+    TrackSheet.objects.filter(id__in=sheet_ids.values(), date__in=days).update(
+        task_total=F('task_total') + 1, updated_at=timezone.now()
+    )
+
+    pairs = [(user_id, day) for user_id in user_ids for day in days]
+    index_items('task', [
+        (item.id, user_id, day, text) for item, (user_id, day) in zip(items, pairs) if item.id
+    ])
+
+    when = str(days[0]) if len(days) == 1 else f"{days[0]} to {days[-1]}"
+    notify_many(user_ids, actor, f"New Task Assigned: {when}", f"Task: {text}\nBy: {actor.username}")
+    return items
@@ -1,16 +1,38 @@
 import calendar
+import json
 from datetime import date, datetime, timedelta
 from decimal import Decimal 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.http import HttpResponse, StreamingHttpResponse, JsonResponse
 from django.contrib.auth.decorators import login_required
-from django.db import transaction 
-from django.contrib import messages
-from django.core.mail import send_mail, get_connection
 from django.conf import settings
-from django.db.models import Q
+from django.contrib import messages
+from django.db.models import Q, Count, Sum
+from django.core.paginator import Paginator
 from accounts.models import User, Team
-from .models import LeaveRequest, LeaveBalance, AttendanceRecord, PublicHoliday, Notification, TrackSheet, TaskItem, WorkItem
-from .forms import LeaveApplicationForm, LeaveAllocationForm, SMTPSettingsForm
+from accounts.hierarchy import set_manager, is_above, subordinates, HierarchyError
+from .models import LeaveRequest, LeaveBalance, AttendanceRecord, PublicHoliday, Notification, TrackSheet, TaskItem, WorkItem, PayrollRun, LeaveAccrualPolicy, ProductivityMonth, TeamProductivityMonth, ProductivityRun
+from .forms import LeaveApplicationForm, LeaveAllocationForm, LeaveAccrualPolicyForm, SMTPSettingsForm, BroadcastForm, NotificationPreferenceForm, BulkAttendanceForm, BulkTaskForm, PublicHolidayForm, HolidayImportForm, WorkCalendarForm
+from .payroll import calculate_salary, run_payroll
+from .analytics import COUNTER_FIELDS, mark_moved
+from .attendance import get_month_summary, bulk_mark_attendance, refresh_company_summaries, team_month_matrix
+from .leaves import (
+    approve_leave, reject_leave, approve_leaves, reject_leaves, LeaveActionError,
+    overlapping_leaves, overlaps_for_queue, scope_for, whos_out,
+)
+from .exports import EXPORT_FORMATS, attendance_sheet_rows
+from .ledger import set_balance
+from .mailer import queue_mail, mail_stats
+from .notifications import notify_many, mark_read
+from .realtime import get_broker
+from .search import search_items
+from .tracksheets import (
+    can_view_work, grid_day, log_work, assign_task, assign_tasks, change_status, remove_item, archive_task,
+    TrackActionError, TrackPermissionError, STATUSES as TRACK_STATUSES,
+)
+from .holidays import parse_holiday_csv, parse_holiday_ics, import_holidays
+from .workdays import month_off_days, working_days_in_month, working_dates
 
 # ==========================================
 # 1. CORE DASHBOARD ROUTING
@@ -33,7 +55,7 @@ def dashboard(request):
         my_team_members = User.objects.none()
         if user.role in ['Manager', 'TL']:
             my_team_members = User.objects.filter(
-                Q(reports_to=user) | Q(team=user.team)
+                Q(ancestor_lines__ancestor=user) | Q(team=user.team)
             ).filter(is_approved=True).exclude(id=user.id).distinct()
 
         # 2. Fetch Teams
@@ -49,13 +71,14 @@ def dashboard(request):
         tasks_i_assigned = TaskItem.objects.filter(
             assigned_by=user,
             sender_archived=False
-        ).select_related('track_sheet', 'track_sheet__user').order_by('-track_sheet__date')[:10]
+        ).select_related('track_sheet', 'track_sheet__user__team').order_by('-date', '-id')[:10]
 
         return render(request, 'dashboard/employee_dashboard.html', {
             'my_team_members': my_team_members,
             'teams': teams,
             'all_colleagues': all_colleagues,
-            'tasks_i_assigned': tasks_i_assigned
+            'tasks_i_assigned': tasks_i_assigned,
+            'whos_out': whos_out(user, date.today()),
         })
 
 # ==========================================
@@ -75,6 +98,7 @@ def hr_dashboard(request):
         'pending_users': pending_users,
         'active_users': active_users,
         'teams': teams,
+        'whos_out': whos_out(request.user, date.today()),
     })
 
 @login_required
@@ -85,6 +109,7 @@ def approve_employee(request, user_id):
     employee = get_object_or_404(User, id=user_id)
     
     if request.method == 'POST':
+        old_team_id = employee.team_id
         employee.designation = request.POST.get('designation')
         employee.section = request.POST.get('section')
         employee.role = request.POST.get('role')
@@ -94,13 +119,16 @@ def approve_employee(request, user_id):
             employee.team = Team.objects.get(id=team_id)
             
         reports_to_id = request.POST.get('reports_to')
-        if reports_to_id:
-            employee.reports_to = User.objects.get(id=reports_to_id)
-        else:
-            employee.reports_to = None
+        try:
+            set_manager(employee, User.objects.get(id=reports_to_id) if reports_to_id else None)
+        except HierarchyError as e:
+            messages.error(request, str(e))
+            return redirect('hr_dashboard')
             
         employee.is_approved = True
-        employee.save()
+        employee.save(update_fields=['designation', 'section', 'role', 'team', 'is_approved'])
+        if employee.team_id != old_team_id:
+            mark_moved(employee)
         
         LeaveBalance.objects.get_or_create(user=employee)
         
@@ -117,12 +145,14 @@ def edit_employee(request, user_id):
     employee = get_object_or_404(User, id=user_id, company=request.user.company)
     teams = Team.objects.filter(company=request.user.company)
     
+    # Nobody under the employee can become their manager (that would be a cycle)
     active_users = User.objects.filter(
         company=request.user.company, 
         is_approved=True
-    ).exclude(id=employee.id)
+    ).exclude(id=employee.id).exclude(id__in=subordinates(employee).values('id'))
 
     if request.method == 'POST':
+        old_team_id = employee.team_id
         employee.designation = request.POST.get('designation')
         employee.section = request.POST.get('section')
         
@@ -138,12 +168,15 @@ def edit_employee(request, user_id):
                 employee.role = role_input 
 
         reports_to_id = request.POST.get('reports_to')
-        if reports_to_id:
-            employee.reports_to = User.objects.get(id=reports_to_id)
-        else:
-            employee.reports_to = None
+        try:
+            set_manager(employee, User.objects.get(id=reports_to_id) if reports_to_id else None)
+        except HierarchyError as e:
+            messages.error(request, str(e))
+            return redirect('edit_employee', user_id=employee.id)
             
-        employee.save()
+        employee.save(update_fields=['designation', 'section', 'team', 'role'])
+        if employee.team_id != old_team_id:
+            mark_moved(employee)
         messages.success(request, f"Profile for {employee.username} updated.")
         return redirect('hr_dashboard')
 
@@ -185,6 +218,73 @@ def manage_teams(request):
     teams = Team.objects.filter(company=request.user.company)
     return render(request, 'dashboard/manage_teams.html', {'teams': teams})
 
+ANALYTICS_PAGE_SIZE = 50
+ANALYTICS_TREND_MONTHS = 6
+
+@login_required
+def productivity_analytics(request):
+    """ Monthly task completion / work log figures per team and employee, read from the refresh_productivity tables """
+    if request.user.role != 'HR':
+        return redirect('dashboard')
+    company = request.user.company
+
+    today = date.today()
+    try:
+        year = int(request.GET.get('year', today.year))
+        month = int(request.GET.get('month', today.month))
+        date(year, month, 1)
+    except ValueError:
+        year, month = today.year, today.month
+
+    teams = Team.objects.filter(company=company)
+    team = None
+    team_id = request.GET.get('team')
+    if team_id and team_id.isdigit():
+        team = teams.filter(id=team_id).first()
+
+    # The trend covers the selected month and the ones before it
+    months = []
+    y, m = year, month
+    for _ in range(ANALYTICS_TREND_MONTHS):
+        months.insert(0, (y, m))
+        y, m = (y - 1, 12) if m == 1 else (y, m - 1)
+    in_range = Q(year__gt=months[0][0]) | Q(year=months[0][0], month__gte=months[0][1])
+    in_range &= Q(year__lt=year) | Q(year=year, month__lte=month)
+
+    facts = ProductivityMonth.objects.filter(company=company)
+    if team:
+        facts = facts.filter(team=team)
+    totals = {
+        (row['year'], row['month']): TeamProductivityMonth(**{name: row[name] for name in COUNTER_FIELDS})
+        for row in facts.filter(in_range).values('year', 'month').annotate(
+            **{name: Sum(name) for name in COUNTER_FIELDS}
+        ).order_by()
+    }
+    trend = [(calendar.month_abbr[m], totals.get((y, m))) for y, m in months]
+
+    team_rows = TeamProductivityMonth.objects.filter(company=company, year=year, month=month).select_related('team').order_by('team__name')
+    page = Paginator(
+        facts.filter(year=year, month=month).select_related('user', 'team').order_by('user__username'),
+        ANALYTICS_PAGE_SIZE,
+    ).get_page(request.GET.get('page'))
+
+    prev_year, prev_month = (year - 1, 12) if month == 1 else (year, month - 1)
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    return render(request, 'dashboard/productivity_analytics.html', {
+        'page': page,
+        'team_rows': team_rows,
+        'trend': trend,
+        'teams': teams,
+        'team': team,
+        'year': year,
+        'month': month,
+        'month_name': calendar.month_name[month],
+        'prev_year': prev_year, 'prev_month': prev_month,
+        'next_year': next_year, 'next_month': next_month,
+        'last_run': ProductivityRun.objects.filter(finished_at__isnull=False).order_by('-started_at').first(),
+    })
+
 # ==========================================
 # 3. LEAVE MANAGEMENT (UPDATED WITH NOTIFY & SMTP)
 # ==========================================
@@ -215,48 +315,18 @@ def apply_leave(request):
             leave.save()
             form.save_m2m() # Saves the approvers
             
-            # --- LOGIC 2: SEND EMAIL VIA DYNAMIC SMTP ---
-            company = request.user.company
+            # --- LOGIC 2: QUEUE EMAIL (sent by the send_queued_mail worker via the company SMTP) ---
             recipients = leave.approvers.all()
-            recipient_emails = [u.email for u in recipients]
-            
-            connection = None
-            sender_email = settings.DEFAULT_FROM_EMAIL
-            
-            if company.smtp_email and company.smtp_password:
-                try:
-                    connection = get_connection(
-                        host=company.smtp_server,
-                        port=company.smtp_port,
-                        username=company.smtp_email,
-                        password=company.smtp_password,
-                        use_tls=True
-                    )
-                    sender_email = company.smtp_email
-                except Exception as e:
-                    print(f"SMTP Connection Error: {e}")
+            # Approvers on an hourly/daily digest get this in their digest instead
+            recipient_emails = [u.email for u in recipients if u.email_digest == 'instant']
 
             subject = f"Leave Notification: {request.user.username}" if leave.leave_type == 'Notify' else f"Leave Request: {request.user.username}"
             email_msg = f"User: {request.user.username}\nType: {leave.leave_type}\nDate: {leave.start_date} to {leave.end_date}\nReason: {leave.reason}"
             
-            if recipient_emails:
-                send_mail(
-                    subject=subject,
-                    message=email_msg,
-                    from_email=sender_email,
-                    recipient_list=recipient_emails,
-                    connection=connection, 
-                    fail_silently=True
-                )
+            queue_mail(subject, email_msg, recipient_emails, company=request.user.company)
             
             # --- LOGIC 3: CREATE PERSISTENT APP NOTIFICATIONS ---
-            for receiver in recipients:
-                Notification.objects.create(
-                    recipient=receiver,
-                    sender=request.user,
-                    title=subject,
-                    message=email_msg
-                )
+            notify_many(recipients, request.user, subject, email_msg)
 
             if leave.leave_type == 'Notify':
                 messages.success(request, "Notification sent successfully.")
@@ -276,11 +346,11 @@ def manage_quota(request, user_id):
     
     # 2. Define Permissions
     is_hr = (request.user.role == 'HR')
-    is_manager = (employee.reports_to == request.user)
+    is_manager = is_above(request.user, employee)
 
-    # 3. Check Access (Must be HR OR the Direct Manager)
+    # 3. Check Access (Must be HR OR someone they report to)
     if not (is_hr or is_manager):
-        messages.error(request, "Access Denied. You can only manage quota for your direct reports.")
+        messages.error(request, "Access Denied. You can only manage quota for people who report to you.")
         return redirect('dashboard')
     
     # 4. Get or Create Balance
@@ -289,7 +359,12 @@ def manage_quota(request, user_id):
     if request.method == 'POST':
         form = LeaveAllocationForm(request.POST, instance=balance)
         if form.is_valid():
-            form.save()
+            # Recorded as ledger adjustments, not a plain overwrite
+            set_balance(
+                employee, request.user, note=form.cleaned_data['note'],
+                casual_leave=form.cleaned_data['casual_leave'],
+                sick_leave=form.cleaned_data['sick_leave'],
+            )
             messages.success(request, f"Leave quota updated for {employee.username}")
             
             # 5. Smart Redirect
@@ -300,66 +375,118 @@ def manage_quota(request, user_id):
     else:
         form = LeaveAllocationForm(instance=balance)
     
-    return render(request, 'dashboard/manage_quota.html', {'form': form, 'employee': employee})
+    history = employee.leave_ledger.select_related('actor', 'leave_request').order_by('-id')[:20]
+    return render(request, 'dashboard/manage_quota.html', {'form': form, 'employee': employee, 'history': history})
+
+@login_required
+def leave_policy(request):
+    if request.user.role != 'HR':
+        return redirect('dashboard')
+
+    company = request.user.company
+    policy = LeaveAccrualPolicy.objects.filter(company=company).first() or LeaveAccrualPolicy(company=company)
+
+    if request.method == 'POST':
+        form = LeaveAccrualPolicyForm(request.POST, instance=policy)
+        if form.is_valid():
+            form.save()
+            messages.success(request, "Leave accrual policy saved.")
+            return redirect('leave_policy')
+    else:
+        form = LeaveAccrualPolicyForm(instance=policy)
+
+    return render(request, 'dashboard/leave_policy.html', {
+        'form': form,
+        'runs': company.accrual_runs.order_by('-year', '-month', '-created_at')[:12],
+    })
+
+@login_required
+def leave_overlaps(request):
+    """ JSON for the apply form: colleagues already off (or pending) between ?start= and ?end= """
+    try:
+        start = date.fromisoformat(request.GET.get('start', ''))
+        end = date.fromisoformat(request.GET.get('end', ''))
+    except ValueError:
+        return JsonResponse({'error': 'start and end must be YYYY-MM-DD'}, status=400)
+    if end < start:
+        return JsonResponse({'error': 'end is before start'}, status=400)
+
+    user = request.user
+    leaves = overlapping_leaves(user.company, start, end, exclude_user=user, **scope_for(user))[:50]
+    return JsonResponse({
+        'team_size': user.team.members.filter(is_approved=True).count() if user.team else None,
+        'leaves': [{
+            'user': leave.user.username,
+            'leave_type': leave.leave_type,
+            'status': leave.status,
+            'start_date': leave.start_date.isoformat(),
+            'end_date': leave.end_date.isoformat(),
+        } for leave in leaves],
+    })
+
+LEAVE_QUEUE_PAGE_SIZE = 25
 
 @login_required
 def leave_requests_list(request):
-    my_approvals = LeaveRequest.objects.filter(
-        approvers=request.user, 
-        status='Pending'
-    ).order_by('-applied_on').distinct()
-    
-    return render(request, 'dashboard/leave_requests_list.html', {'pending_leaves': my_approvals})
+    if request.method == 'POST':
+        leave_ids = [int(i) for i in request.POST.getlist('leave_ids') if i.isdigit()]
+        action = request.POST.get('action')
+        if not leave_ids:
+            messages.error(request, "Select at least one request.")
+        elif action == 'approve':
+            try:
+                approved, skipped = approve_leaves(leave_ids, request.user)
+                messages.success(request, f"{len(approved)} leave(s) approved and calendars updated.")
+                if skipped:
+                    names = ", ".join(sorted({leave.user.username for leave in skipped}))
+                    messages.error(request, f"{len(skipped)} request(s) skipped for insufficient balance: {names}.")
+            except LeaveActionError as e:
+                messages.error(request, str(e))
+        elif action == 'reject':
+            count = reject_leaves(leave_ids, request.user)
+            messages.warning(request, f"{count} leave(s) rejected.")
+        return redirect('leave_requests_list')
+
+    pending = LeaveRequest.objects.filter(approvers=request.user, status='Pending')
+
+    # Keyset pagination: newest first, `?before=<id>` continues after the last row shown
+    page = pending.select_related('user__company', 'user__leave_balance').order_by('-id')
+    before = request.GET.get('before')
+    if before and before.isdigit():
+        page = page.filter(id__lt=int(before))
+    page = list(page[:LEAVE_QUEUE_PAGE_SIZE + 1])
+    has_more = len(page) > LEAVE_QUEUE_PAGE_SIZE
+    page = page[:LEAVE_QUEUE_PAGE_SIZE]
+
+    overlaps = overlaps_for_queue(page)
+    for leave in page:
+        leave.overlaps = overlaps[leave.id]
+
+    return render(request, 'dashboard/leave_requests_list.html', {
+        'pending_leaves': page,
+        'pending_count': pending.count(),
+        'next_before': page[-1].id if has_more else None,
+        'is_first_page': not before,
+    })
 
 @login_required
-@transaction.atomic
 def action_leave(request, leave_id, action):
-    leave = get_object_or_404(LeaveRequest, id=leave_id)
+    # days_requested needs the applicant's company (work calendar)
+    leave = get_object_or_404(LeaveRequest.objects.select_related('user__company'), id=leave_id)
     
-    if request.user not in leave.approvers.all():
+    if not leave.approvers.filter(id=request.user.id).exists():
         messages.error(request, "You are not authorized to approve this leave.")
         return redirect('leave_requests_list')
 
-    balance = get_object_or_404(LeaveBalance, user=leave.user)
-    days = leave.days_requested
-
-    if action == 'approve':
-        if leave.leave_type == 'Casual':
-            if balance.casual_leave >= days:
-                balance.casual_leave -= days
-                balance.save()
-            else:
-                messages.error(request, "User has insufficient balance.")
-                return redirect('leave_requests_list')
-        elif leave.leave_type == 'Sick':
-            if balance.sick_leave >= days:
-                balance.sick_leave -= days
-                balance.save()
-            else:
-                messages.error(request, "User has insufficient balance.")
-                return redirect('leave_requests_list')
-
-        current_date = leave.start_date
-        while current_date <= leave.end_date:
-            AttendanceRecord.objects.update_or_create(
-                user=leave.user,
-                date=current_date,
-                defaults={
-                    'status': 'Leave',
-                    'marked_by': request.user
-                }
-            )
-            current_date += timedelta(days=1)
-        
-        leave.status = 'Approved'
-        messages.success(request, "Leave Approved and Calendar Updated.")
-
-    elif action == 'reject':
-        leave.status = 'Rejected'
-        messages.warning(request, "Leave Rejected.")
-
-    leave.action_by = request.user
-    leave.save()
+    try:
+        if action == 'approve':
+            approve_leave(leave, request.user)
+            messages.success(request, "Leave Approved and Calendar Updated.")
+        elif action == 'reject':
+            reject_leave(leave, request.user)
+            messages.warning(request, "Leave Rejected.")
+    except LeaveActionError as e:
+        messages.error(request, str(e))
     
     return redirect('leave_requests_list')
 
@@ -374,7 +501,7 @@ def view_attendance(request, user_id):
     is_manager = False
     if request.user.role == 'HR':
         is_manager = True
-    elif target_user.reports_to == request.user:
+    elif is_above(request.user, target_user):
         is_manager = True
     elif target_user.team and (target_user.team == request.user.team):
         if request.user.role in ['Manager', 'TL'] and target_user.role == 'Employee':
@@ -400,17 +527,25 @@ def view_attendance(request, user_id):
             target_user.monthly_salary = Decimal(request.POST.get('monthly_salary', 0))
             target_user.esi_percentage = Decimal(request.POST.get('esi_percentage', 0))
             target_user.professional_tax = Decimal(request.POST.get('professional_tax', 0))
-            target_user.save()
+            target_user.save(update_fields=['monthly_salary', 'esi_percentage', 'professional_tax'])
             messages.success(request, "Payroll details updated.")
 
         elif 'date' in request.POST:
             date_str = request.POST.get('date')
             new_status = request.POST.get('status')
             time_str = request.POST.get('login_time')
+
+            try:
+                current_date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
+            except ValueError:
+                messages.error(request, "Invalid date.")
+                return redirect(f"{request.path}?year={year}&month={month}")
+            if new_status not in dict(AttendanceRecord.STATUS_CHOICES):
+                messages.error(request, "Unknown attendance status.")
+                return redirect(f"{request.path}?year={year}&month={month}")
             
             # Special Rule: 3rd Late removes previous 2nd Late
             if new_status == '3rd Late':
-                current_date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
                 prev_late = AttendanceRecord.objects.filter(
                     user=target_user,
                     date__year=year,
@@ -431,7 +566,7 @@ def view_attendance(request, user_id):
             
             AttendanceRecord.objects.update_or_create(
                 user=target_user,
-                date=date_str,
+                date=current_date_obj,
                 defaults={
                     'status': new_status, 
                     'login_time': new_time, 
@@ -446,19 +581,13 @@ def view_attendance(request, user_id):
     records = AttendanceRecord.objects.filter(user=target_user, date__year=year, date__month=month)
     attendance_map = {record.date: record for record in records}
     
-    try:
-        holiday_qs = PublicHoliday.objects.filter(company=target_user.company, date__year=year, date__month=month)
-        holiday_dates = {h.date for h in holiday_qs}
-    except NameError:
-        holiday_dates = set()
+    # Weekly offs + public holidays (unmarked ones show as Holiday)
+    holiday_dates = month_off_days(target_user.company, year, month)
+
+    # Header counters come from the maintained monthly summary row
+    stats = get_month_summary(target_user, year, month).as_stats()
 
     month_days = []
-    stats = {
-        'absent': 0, 'leave': 0, 'wfh': 0, 'present': 0, 'holiday': 0, 
-        'late_2nd': 0, 'late_3rd': 0, 
-        'total_days': num_days
-    }
-    
     for _ in range(start_index):
         month_days.append(None)
 
@@ -472,15 +601,6 @@ def view_attendance(request, user_id):
         else:
             if current_date in holiday_dates: status = 'Holiday'
             else: status = 'Present'
-        
-        # Stats
-        if status == 'Absent': stats['absent'] += 1
-        elif status == 'Leave': stats['leave'] += 1
-        elif status == 'WFH': stats['wfh'] += 1; stats['present'] += 1
-        elif status == 'Present': stats['present'] += 1
-        elif status == 'Holiday': stats['holiday'] += 1
-        elif status == '2nd Late': stats['late_2nd'] += 1 
-        elif status == '3rd Late': stats['late_3rd'] += 1 
             
         month_days.append({
             'day': day, 'date': current_date, 'status': status, 'login_time': login_time, 'day_name': current_date.strftime("%A")
@@ -491,34 +611,11 @@ def view_attendance(request, user_id):
     base_salary = target_user.monthly_salary
     
     if base_salary > 0:
-        per_day_salary = base_salary / Decimal(num_days)
-        
-        full_day_cuts = stats['absent'] + stats['late_3rd']
-        full_deduction = per_day_salary * Decimal(full_day_cuts)
-        
-        half_day_cuts = stats['late_2nd']
-        half_deduction = (per_day_salary / Decimal(2)) * Decimal(half_day_cuts)
-        
-        gross_salary = base_salary - (full_deduction + half_deduction)
-        
-        esi_deduction = (gross_salary * target_user.esi_percentage) / Decimal(100)
-        p_tax = target_user.professional_tax
-        net_salary = gross_salary - esi_deduction - p_tax
-
-        salary_data = {
-            'base_salary': round(base_salary, 2),
-            'per_day': round(per_day_salary, 2),
-            'absent_days': stats['absent'],
-            'late_3rd_days': stats['late_3rd'],
-            'full_day_deduction': round(full_deduction, 2),
-            'late_2nd_days': stats['late_2nd'],
-            'half_day_deduction': round(half_deduction, 2),
-            'gross_salary': round(gross_salary, 2),
-            'esi_pct': target_user.esi_percentage,
-            'esi_amount': round(esi_deduction, 2),
-            'p_tax': round(p_tax, 2),
-            'net_salary': round(net_salary, 2)
-        }
+        salary_data = calculate_salary(
+            base_salary, target_user.esi_percentage, target_user.professional_tax,
+            working_days_in_month(target_user.company, year, month),
+            stats['absent'], stats['late_2nd'], stats['late_3rd']
+        )
 
     return render(request, 'dashboard/view_attendance.html', {
         'target_user': target_user,
@@ -530,10 +627,237 @@ def view_attendance(request, user_id):
         'salary_data': salary_data
     })
 
+@login_required
+def bulk_attendance(request):
+    if request.user.role not in ['HR', 'Manager', 'TL']:
+        messages.error(request, "Access Denied.")
+        return redirect('dashboard')
+
+    if request.method == 'POST':
+        form = BulkAttendanceForm(request.user, request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            user_ids = form.target_user_ids()
+            count, reset = bulk_mark_attendance(
+                user_ids, data['start_date'], data['end_date'], data['status'],
+                login_time=data['login_time'], marked_by=request.user
+            )
+            if reset:
+                messages.info(request, f"Rule Applied: {len(reset)} earlier '2nd Late' mark(s) reset to 'Present' due to new '3rd Late'.")
+            messages.success(request, f"Marked '{data['status']}' for {len(user_ids)} employee(s), {count} day entries.")
+            return redirect('bulk_attendance')
+    else:
+        form = BulkAttendanceForm(request.user)
+
+    return render(request, 'dashboard/bulk_attendance.html', {'form': form})
+
+@login_required
+def payroll(request):
+    if request.user.role != 'HR':
+        return redirect('dashboard')
+
+    company = request.user.company
+    today = date.today()
+    try:
+        year = int(request.GET.get('year', today.year))
+        month = int(request.GET.get('month', today.month))
+    except ValueError:
+        year, month = today.year, today.month
+
+    # Month arrows can step past Jan/Dec
+    if month < 1:
+        year, month = year - 1, 12
+    elif month > 12:
+        year, month = year + 1, 1
+
+    if request.method == 'POST':
+        run = run_payroll(company, year, month, created_by=request.user)
+        messages.success(request, f"Payroll computed for {run.employee_count} employees.")
+        return redirect(f"{request.path}?year={year}&month={month}")
+
+    run = PayrollRun.objects.filter(company=company, year=year, month=month).first()
+    lines = run.lines.select_related('user').order_by('user__username') if run else []
+
+    return render(request, 'dashboard/payroll.html', {
+        'run': run,
+        'lines': lines,
+        'year': year, 'month': month,
+        'month_name': calendar.month_name[month],
+    })
+
+@login_required
+def export_attendance(request):
+    if request.user.role != 'HR':
+        return redirect('dashboard')
+
+    today = date.today()
+    try:
+        year = int(request.GET.get('year', today.year))
+        month = int(request.GET.get('month', today.month))
+    except ValueError:
+        year, month = today.year, today.month
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS or not 1 <= month <= 12:
+        messages.error(request, "Unsupported export.")
+        return redirect('payroll')
+
+    writer, content_type = EXPORT_FORMATS[file_format]
+    rows = attendance_sheet_rows(request.user.company, year, month)
+    response = StreamingHttpResponse(writer(rows), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="attendance-{year}-{month:02d}.{file_format}"'
+    return response
+
+def _form_errors(request, form):
+    """ Invalid POSTs here redirect, so the form's errors go out as messages """
+    for field, errors in form.errors.items():
+        label = None
+        if field in form.fields:
+            label = form.fields[field].label or field.replace('_', ' ').capitalize()
+        for error in errors:
+            messages.error(request, f"{label}: {error}" if label else error)
+
+@login_required
+def manage_holidays(request):
+    if request.user.role != 'HR':
+        return redirect('dashboard')
+
+    company = request.user.company
+    try:
+        year = int(request.GET.get('year', date.today().year))
+    except ValueError:
+        year = date.today().year
+
+    form = PublicHolidayForm()
+    import_form = HolidayImportForm()
+    calendar_form = WorkCalendarForm(instance=company)
+
+    if request.method == 'POST':
+        if 'work_calendar' in request.POST:
+            calendar_form = WorkCalendarForm(request.POST, instance=company)
+            if calendar_form.is_valid():
+                calendar_form.save()
+                # Unmarked days flip between Present and Holiday in every stored month, not just this year's
+                refresh_company_summaries(company.id)
+                messages.success(request, "Work calendar updated.")
+            else:
+                _form_errors(request, calendar_form)
+
+        elif 'delete_id' in request.POST:
+            holiday = get_object_or_404(PublicHoliday, id=request.POST.get('delete_id'), company=company)
+            holiday.delete()
+            messages.success(request, f"Holiday '{holiday.name}' removed.")
+
+        elif 'import' in request.POST:
+            import_form = HolidayImportForm(request.POST, request.FILES)
+            if import_form.is_valid():
+                upload = import_form.cleaned_data['file']
+                try:
+                    text = upload.read().decode('utf-8-sig')
+                    if upload.name.lower().endswith('.ics'):
+                        parsed = parse_holiday_ics(text)
+                    else:
+                        parsed = parse_holiday_csv(text)
+                except (UnicodeDecodeError, ValueError) as e:
+                    messages.error(request, f"Import failed: {e}")
+                else:
+                    created = import_holidays(company, parsed)
+                    messages.success(request, f"Imported {created} holiday(s), {len(parsed) - created} already existed.")
+            else:
+                _form_errors(request, import_form)
+
+        else:
+            form = PublicHolidayForm(request.POST)
+            if form.is_valid():
+                holiday = form.save(commit=False)
+                holiday.company = company
+                holiday.save()
+                messages.success(request, f"Holiday '{holiday.name}' added.")
+            else:
+                _form_errors(request, form)
+
+        return redirect(f"{request.path}?year={year}")
+
+    holidays = PublicHoliday.objects.filter(company=company, date__year=year).order_by('date')
+    return render(request, 'dashboard/manage_holidays.html', {
+        'holidays': holidays,
+        'year': year,
+        'form': form,
+        'import_form': import_form,
+        'calendar_form': calendar_form,
+        'working_days': [working_days_in_month(company, year, m) for m in range(1, 13)],
+    })
+
+TEAM_CALENDAR_PAGE_SIZE = 50
+
+@login_required
+def team_calendar(request):
+    """ Employees x days attendance grid for a team, or for everyone under the viewer """
+    user = request.user
+    if user.role not in ['HR', 'Manager', 'TL']:
+        messages.error(request, "Access Denied.")
+        return redirect('dashboard')
+
+    today = date.today()
+    try:
+        year = int(request.GET.get('year', today.year))
+        month = int(request.GET.get('month', today.month))
+        date(year, month, 1)
+    except ValueError:
+        year, month = today.year, today.month
+
+    teams = Team.objects.filter(company=user.company)
+    if user.role != 'HR':
+        teams = teams.filter(id=user.team_id)
+
+    team = None
+    team_id = request.GET.get('team')
+    if team_id and team_id.isdigit():
+        team = teams.filter(id=team_id).first()
+
+    people = User.objects.filter(company=user.company, is_approved=True)
+    if team:
+        people = people.filter(team=team)
+    elif user.role != 'HR':
+        people = people.filter(Q(ancestor_lines__ancestor=user) | Q(team=user.team)).distinct()
+
+    page = Paginator(people.order_by('username').only('id', 'username', 'role'), TEAM_CALENDAR_PAGE_SIZE).get_page(request.GET.get('page'))
+    matrix = team_month_matrix(user.company, [p.id for p in page], year, month, today)
+    rows = [(person, matrix[person.id].decode()) for person in page]
+
+    off_days = month_off_days(user.company, year, month)
+    num_days = calendar.monthrange(year, month)[1]
+    days = [
+        (d, date(year, month, d).strftime('%a')[:2], date(year, month, d) in off_days)
+        for d in range(1, num_days + 1)
+    ]
+
+    prev_year, prev_month = (year - 1, 12) if month == 1 else (year, month - 1)
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    return render(request, 'dashboard/team_calendar.html', {
+        'rows': rows,
+        'page': page,
+        'days': days,
+        'teams': teams,
+        'team': team,
+        'year': year,
+        'month': month,
+        'month_name': calendar.month_name[month],
+        'prev_year': prev_year, 'prev_month': prev_month,
+        'next_year': next_year, 'next_month': next_month,
+    })
+
 # ==========================================
 # 5. NEW FEATURES (SMTP & NOTIFICATIONS)
 # ==========================================
 
+@login_required
+def mail_queue_stats(request):
+    """ Outbox depth and delivery latency as JSON, for monitoring """
+    if request.user.role != 'HR':
+        return JsonResponse({'error': 'Access Denied.'}, status=403)
+    return JsonResponse(mail_stats(request.user.company))
+
 @login_required
 def smtp_settings(request):
     if request.user.role != 'HR':
@@ -552,10 +876,134 @@ def smtp_settings(request):
     
     return render(request, 'dashboard/smtp_settings.html', {'form': form})
 
+@login_required
+def broadcast(request):
+    """ HR announcement to the company or a team; the send_broadcasts worker does the fan-out """
+    if request.user.role != 'HR':
+        return redirect('dashboard')
+
+    company = request.user.company
+    if request.method == 'POST':
+        form = BroadcastForm(company, request.POST)
+        if form.is_valid():
+            item = form.save(commit=False)
+            item.company = company
+            item.sender = request.user
+            item.save()
+            messages.success(request, "Broadcast queued. Employees will see it in their notifications shortly.")
+            return redirect('broadcast')
+    else:
+        form = BroadcastForm(company)
+
+    return render(request, 'dashboard/broadcast.html', {
+        'form': form,
+        'broadcasts': company.broadcasts.select_related('team').order_by('-id')[:20],
+    })
+
+NOTIFICATIONS_PAGE_SIZE = 30
+
 @login_required
 def notifications_view(request):
-    notifs = Notification.objects.filter(recipient=request.user)
-    return render(request, 'dashboard/notifications.html', {'notifications': notifs})
+    if request.method == 'POST':
+        if request.POST.get('mark_all'):
+            changed = mark_read(request.user)
+            messages.success(request, f"{changed} notification(s) marked as read.")
+        elif request.POST.get('notification_id', '').isdigit():
+            mark_read(request.user, [int(request.POST['notification_id'])])
+        elif 'email_digest' in request.POST:
+            pref_form = NotificationPreferenceForm(request.POST, instance=request.user)
+            if pref_form.is_valid():
+                pref_form.save(commit=False).save(update_fields=['email_digest'])
+                messages.success(request, "Email preference saved.")
+        return redirect(request.get_full_path())
+
+    # Keyset pagination on (recipient, id), served by notif_list_idx: `?before=<id>` continues after the last row shown
+    notifs = Notification.objects.filter(recipient=request.user).select_related('sender').order_by('-id')
+    before = request.GET.get('before')
+    if before and before.isdigit():
+        notifs = notifs.filter(id__lt=int(before))
+    notifs = list(notifs[:NOTIFICATIONS_PAGE_SIZE + 1])
+    has_more = len(notifs) > NOTIFICATIONS_PAGE_SIZE
+    notifs = notifs[:NOTIFICATIONS_PAGE_SIZE]
+
+    return render(request, 'dashboard/notifications.html', {
+        'notifications': notifs,
+        'next_before': notifs[-1].id if has_more else None,
+        'is_first_page': not before,
+        'pref_form': NotificationPreferenceForm(instance=request.user),
+    })
+
+
+# Live updates. Both views are async, so under ASGI an idle connection is a
+# parked coroutine and a queue rather than a thread. The browser uses the
+# SSE stream and falls back to long polling when it can't.
+SSE_HEARTBEAT = 20      # seconds between keep-alive comments on an idle stream
+LONG_POLL_TIMEOUT = 25  # seconds a poll waits for an event before returning empty
+
+
+def _sse(event):
+    return f"data: {json.dumps(event)}\n\n"
+
+
+async def _unread_count(user_id):
+    # Read after subscribing, so nothing published in between is missed
+    return await User.objects.filter(id=user_id).values_list('unread_notifications', flat=True).aget()
+
+
+@login_required
+async def notification_stream(request):
+    if not getattr(settings, 'REALTIME_PUSH', False) or not hasattr(request, 'scope'):
+        # Push is off (or this is WSGI, which would buffer an endless stream);
+        # 204 tells EventSource to stop and the page to poll
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    broker = get_broker()
+
+    async def events():
+        sub = broker.subscribe(user.id)
+        try:
+            unread = await _unread_count(user.id)
+            yield "retry: 5000\n" + _sse({'type': 'read', 'unread': unread})
+            while True:
+                event = await sub.get(SSE_HEARTBEAT)
+                yield ": ping\n\n" if event is None else _sse(event)
+        finally:
+            broker.unsubscribe(sub)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+async def notification_poll(request):
+    """
+    With REALTIME_PUSH off: the current unread count, straight away (the page
+    asks every minute or so). With it on, a long poll: `?unread=<badge count>`
+    is what the page currently shows; if the stored counter differs (events
+    published between two polls) the correct count is returned straight away,
+    otherwise it waits for the next event.
+    """
+    user = await request.auser()
+    if not getattr(settings, 'REALTIME_PUSH', False):
+        return JsonResponse({'events': [{'type': 'read', 'unread': await _unread_count(user.id)}]})
+
+    broker = get_broker()
+    sub = broker.subscribe(user.id)
+    try:
+        shown = request.GET.get('unread', '')
+        unread = await _unread_count(user.id)
+        if not shown.isdigit() or int(shown) != unread:
+            events = [{'type': 'read', 'unread': unread}]
+        else:
+            event = await sub.get(LONG_POLL_TIMEOUT)
+            events = [] if event is None else [event]
+        events += sub.drain()
+    finally:
+        broker.unsubscribe(sub)
+    return JsonResponse({'events': events})
 
 
 
@@ -567,7 +1015,7 @@ def track_sheet(request, user_id):
     viewer = request.user
     
     # --- PERMISSIONS ---
-    can_view_work = (viewer == target_user) or (target_user.reports_to == viewer) or (viewer.role == 'HR')
+    show_work = can_view_work(viewer, target_user)
     can_assign_task = True # Anyone can assign (as per previous request)
 
     # --- DATE LOGIC ---
@@ -582,13 +1030,12 @@ def track_sheet(request, user_id):
     first_weekday, num_days = calendar.monthrange(year, month)
     start_index = (first_weekday + 1) % 7
     
-    # Prefetch related items to avoid N+1 queries
+    # One query for the grid: the sheets carry their item counters, and the
+    # items themselves are only loaded (by track_day) when a day is opened
     sheets = TrackSheet.objects.filter(
-        user=target_user, 
-        date__year=year, 
-        date__month=month
-    ).prefetch_related('work_items', 'task_items')
-    
+        user=target_user,
+        date__range=(date(year, month, 1), date(year, month, num_days)),
+    )
     sheet_map = {s.date: s for s in sheets}
     
     month_days = []
@@ -596,39 +1043,57 @@ def track_sheet(request, user_id):
 
     for day in range(1, num_days + 1):
         current_date = date(year, month, day)
-        sheet = sheet_map.get(current_date)
-        
-        # Prepare data for template
-        work_items = sheet.work_items.all() if (sheet and can_view_work) else []
-        task_items = sheet.task_items.all() if sheet else []
-        
-        # Calculate summary status for the day (optional logic)
-        day_status = "Pending"
-        if work_items:
-            if all(w.status == 'Completed' for w in work_items):
-                day_status = "Completed"
-            elif any(w.status == 'In Progress' for w in work_items):
-                day_status = "In Progress"
-
-        month_days.append({
-            'day': day, 
-            'date': current_date, 
-            'sheet': sheet,
-            'work_items': work_items,
-            'task_items': task_items,
-            'day_status': day_status,
-            'can_view_work': can_view_work # Pass this down for privacy check
-        })
+        month_days.append(grid_day(current_date, sheet_map.get(current_date), show_work))
 
     return render(request, 'dashboard/track_sheet.html', {
         'target_user': target_user,
         'month_days': month_days,
         'year': year, 'month': month,
         'month_name': calendar.month_name[month],
-        'can_view_work': can_view_work,
+        'can_view_work': show_work,
         'can_assign_task': can_assign_task,
     })
 
+@login_required
+def track_day(request, user_id, day):
+    """ Item lists for one day of the track sheet, fetched when its modal opens """
+    target_user = get_object_or_404(User, id=user_id)
+    try:
+        day = datetime.strptime(day, "%Y-%m-%d").date()
+    except ValueError:
+        return HttpResponse(status=400)
+
+    show_work = can_view_work(request.user, target_user)
+    items = {'track_sheet__user': target_user, 'track_sheet__date': day}
+    return render(request, 'dashboard/track_day_items.html', {
+        'target_user': target_user,
+        'day': day,
+        'task_items': TaskItem.objects.filter(**items).select_related('assigned_by').order_by('id'),
+        'work_items': WorkItem.objects.filter(**items).order_by('id') if show_work else [],
+        'can_view_work': show_work,
+    })
+
+@login_required
+def track_search(request, user_id):
+    """ Full-text search across all dates of one person's tasks, and their work logs if the viewer may see them """
+    target_user = get_object_or_404(User, id=user_id)
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    show_work = can_view_work(request.user, target_user)
+    hits, has_next = search_items(target_user, query, include_work=show_work, page=page)
+    return render(request, 'dashboard/track_search.html', {
+        'target_user': target_user,
+        'query': query,
+        'hits': hits,
+        'page': page,
+        'has_next': has_next,
+        'can_view_work': show_work,
+    })
+
 @login_required
 def handle_track_actions(request, user_id):
     """ Helper view to handle Add/Update/Delete of items via POST """
@@ -636,74 +1101,189 @@ def handle_track_actions(request, user_id):
         return redirect('dashboard')
 
     target_user = get_object_or_404(User, id=user_id)
-    action_type = request.POST.get('action_type') # 'add_work', 'add_task', 'update_status'
+    action_type = request.POST.get('action_type') # 'add_work', 'add_task', 'update_status', 'delete_item'
     date_str = request.POST.get('date')
-    
-    # Get or Create Sheet
-    sheet, _ = TrackSheet.objects.get_or_create(user=target_user, date=date_str)
-    
-    # 1. ADD WORK LOG
-    if action_type == 'add_work' and request.user == target_user:
-        task_desc = request.POST.get('task_desc')
-        if task_desc:
-            WorkItem.objects.create(track_sheet=sheet, task=task_desc, status='Pending')
-            messages.success(request, "Work item added.")
+    try:
+        date_obj = datetime.strptime(date_str or '', "%Y-%m-%d").date()
+    except ValueError:
+        messages.error(request, "Invalid date.")
+        return redirect('track_sheet', user_id)
 
-    # 2. ADD ASSIGNED TASK
-    elif action_type == 'add_task':
-        task_desc = request.POST.get('task_desc')
-        if task_desc:
-            TaskItem.objects.create(
-                track_sheet=sheet, 
-                task=task_desc, 
-                assigned_by=request.user, 
-                status='Pending'
-            )
-            # Notification
-            Notification.objects.create(
-                recipient=target_user,
-                sender=request.user,
-                title=f"New Task Assigned: {date_str}",
-                message=f"Task: {task_desc}\nBy: {request.user.username}"
-            )
+    try:
+        _run_track_action(request, target_user, action_type, date_obj)
+        if action_type == 'add_work':
+            messages.success(request, "Work item added.")
+        elif action_type == 'add_task':
             messages.success(request, "Task assigned.")
-
-    # 3. UPDATE STATUS (Work or Task)
-    elif action_type == 'update_status':
-        item_type = request.POST.get('item_type') # 'work' or 'task'
-        item_id = request.POST.get('item_id')
-        new_status = request.POST.get('new_status')
-        
-        if item_type == 'work' and request.user == target_user:
-            item = get_object_or_404(WorkItem, id=item_id, track_sheet=sheet)
-            item.status = new_status
-            item.save()
-        
-        elif item_type == 'task':
-            # Both Assignee (target_user) and Assigner (request.user) can update status
-            item = get_object_or_404(TaskItem, id=item_id, track_sheet=sheet)
-            item.status = new_status
-            item.save()
+        elif action_type == 'delete_item':
+            messages.success(request, "Item deleted.")
+    except TrackActionError as e:
+        messages.error(request, str(e))
             
     # Redirect back to track sheet
-    date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
     return redirect(f"/track-sheet/{user_id}/?year={date_obj.year}&month={date_obj.month}")
+
+def _run_track_action(request, target_user, action_type, day):
+    """ Shared by the form view above and the JSON endpoint. Returns (kind, item). """
+    post = request.POST
+    if action_type == 'add_work':
+        return 'work', log_work(target_user, request.user, day, post.get('task_desc', '').strip())
+    if action_type == 'add_task':
+        return 'task', assign_task(target_user, request.user, day, post.get('task_desc', '').strip())
+    if action_type == 'update_status':
+        kind = post.get('item_type')
+        return kind, change_status(target_user, request.user, kind, post.get('item_id'), post.get('new_status'))
+    if action_type == 'delete_item':
+        kind = post.get('item_type')
+        return kind, remove_item(target_user, request.user, kind, post.get('item_id'))
+    raise TrackActionError("Unknown action.")
+
+@login_required
+def track_action_json(request, user_id):
+    """
+    Same actions as handle_track_actions, answered with JSON instead of a
+    redirect + month re-render: the changed item's row (`html`) and the
+    day's grid cell (`cell`) for the page to swap in.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': "POST required."}, status=405)
+    target_user = get_object_or_404(User, id=user_id)
+    action_type = request.POST.get('action_type')
+    try:
+        day = datetime.strptime(request.POST.get('date', ''), "%Y-%m-%d").date()
+    except ValueError:
+        return JsonResponse({'error': "Invalid date."}, status=400)
+    try:
+        kind, item = _run_track_action(request, target_user, action_type, day)
+    except TrackActionError as e:
+        return JsonResponse({'error': str(e)}, status=403 if isinstance(e, TrackPermissionError) else 400)
+
+    show_work = can_view_work(request.user, target_user)
+    sheet = TrackSheet.objects.get(id=item.track_sheet_id)
+    payload = {
+        'kind': kind,
+        'id': item.id,
+        'date': sheet.date.isoformat(),
+        'cell': render_to_string('dashboard/track_day_cell.html', {
+            'day': grid_day(sheet.date, sheet, show_work), 'can_view_work': show_work,
+        }, request=request),
+    }
+    if action_type != 'delete_item':
+        payload['status'] = item.status
+        payload['html'] = render_to_string('dashboard/track_item_row.html', {
+            'item': item, 'kind': kind, 'day': sheet.date, 'target_user': target_user,
+        }, request=request)
+    return JsonResponse(payload)
+
+@login_required
+def assign_tasks_bulk(request):
+    """ One task for a team / set of employees over one or more days """
+    if request.user.role not in ['HR', 'Director', 'Manager', 'TL']:
+        messages.error(request, "Access Denied.")
+        return redirect('dashboard')
+
+    if request.method == 'POST':
+        form = BulkTaskForm(request.user, request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            start, end = data['start_date'], data['end_date']
+            if data['working_days_only']:
+                days = working_dates(request.user.company, start, end)
+            else:
+                days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+            user_ids = form.target_user_ids()
+            if not days:
+                messages.error(request, "There are no working days in that range.")
+            else:
+                items = assign_tasks(request.user, user_ids, days, data['task'])
+                messages.success(request, f"Assigned to {len(user_ids)} employee(s) over {len(days)} day(s): {len(items)} tasks.")
+                return redirect('assign_tasks_bulk')
+    else:
+        form = BulkTaskForm(request.user)
+
+    return render(request, 'dashboard/assign_tasks.html', {'form': form})
+
+TASK_OUTBOX_PAGE_SIZE = 50
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+@login_required
+def task_outbox(request):
+    """ Every task the user assigned and hasn't archived, newest date first, with per-assignee progress """
+    tasks = TaskItem.objects.filter(assigned_by=request.user, sender_archived=False)
+    date_from, date_to = _parse_date(request.GET.get('from')), _parse_date(request.GET.get('to'))
+    if date_from:
+        tasks = tasks.filter(date__gte=date_from)
+    if date_to:
+        tasks = tasks.filter(date__lte=date_to)
+
+    # Progress per assignee over the date window: one GROUP BY on the outbox index
+    progress = list(
+        tasks.values('track_sheet__user_id', 'track_sheet__user__username')
+        .annotate(
+            total=Count('id'),
+            in_progress=Count('id', filter=Q(status='In Progress')),
+            completed=Count('id', filter=Q(status='Completed')),
+        )
+        .order_by('track_sheet__user__username')
+    )
+    for row in progress:
+        row['rate'] = round(100 * row['completed'] / row['total'])
+
+    status = request.GET.get('status', '')
+    if status in TRACK_STATUSES:
+        tasks = tasks.filter(status=status)
+    assignee = request.GET.get('assignee', '')
+    if assignee.isdigit():
+        tasks = tasks.filter(track_sheet__user_id=int(assignee))
+
+    # Keyset pagination on (date, id): `?before=<date>:<id>` continues after the last row shown
+    page = tasks.select_related('track_sheet__user__team').order_by('-date', '-id')
+    before = request.GET.get('before', '')
+    before_date, _, before_id = before.partition(':')
+    before_date = _parse_date(before_date)
+    if before_date and before_id.isdigit():
+        page = page.filter(Q(date__lt=before_date) | Q(date=before_date, id__lt=int(before_id)))
+    page = list(page[:TASK_OUTBOX_PAGE_SIZE + 1])
+    has_more = len(page) > TASK_OUTBOX_PAGE_SIZE
+    page = page[:TASK_OUTBOX_PAGE_SIZE]
+
+    filters = request.GET.copy()
+    filters.pop('before', None)
+    return render(request, 'dashboard/task_outbox.html', {
+        'tasks': page,
+        'progress': progress,
+        'statuses': TRACK_STATUSES,
+        'status': status,
+        'assignee': assignee,
+        'date_from': date_from,
+        'date_to': date_to,
+        'filters': filters.urlencode(),
+        'next_before': f"{page[-1].date}:{page[-1].id}" if has_more else None,
+        'is_first_page': not before,
+    })
+
 # ... existing imports ...
 
+def _wants_json(request):
+    return 'application/json' in request.headers.get('Accept', '')
+
 @login_required
 def delete_task_assignment(request, task_id):
-    # FIXED: Get TaskItem instead of TrackSheet
-    task_item = get_object_or_404(TaskItem, id=task_id)
-    
-    # Security: Ensure current user is the one who assigned it
-    if task_item.assigned_by != request.user:
-        messages.error(request, "Permission Denied. You did not assign this task.")
+    # Archive Logic (only the assigner can hide it from their outbox)
+    try:
+        archive_task(request.user, task_id)
+    except TrackActionError as e:
+        if _wants_json(request):
+            return JsonResponse({'error': str(e)}, status=403)
+        messages.error(request, str(e))
         return redirect('dashboard')
-    
-    # Archive Logic
-    task_item.sender_archived = True
-    task_item.save()
-    
+
+    if _wants_json(request):
+        return JsonResponse({'id': task_id, 'archived': True})
     messages.success(request, "Task hidden from your dashboard.")
     return redirect('dashboard')
-
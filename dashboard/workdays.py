@@ -0,0 +1,131 @@
+import calendar
+import threading
+from array import array
+from datetime import date, timedelta
+from .holidays import year_holidays
+
+# Company.saturday_rule -> which Saturdays of the month (1st, 2nd, ...) are off
+SATURDAY_RULES = {
+    'none': (),
+    '2_4': (2, 4),
+    '1_3': (1, 3),
+    '1_3_5': (1, 3, 5),
+}
+
+
+class WorkCalendar:
+    """
+    One company-year precomputed as a bitmap (1 byte per day, 1 = working)
+    plus prefix sums, so any "working days between A and B" inside the year
+    is two array lookups.
+    """
+
+    def __init__(self, year, weekly_offs, saturday_rule, holidays):
+        self.year = year
+        self.start = date(year, 1, 1)
+        self.holidays = holidays
+        self.rule = (frozenset(weekly_offs), saturday_rule)
+
+        size = 366 if calendar.isleap(year) else 365
+        off_saturdays = SATURDAY_RULES.get(saturday_rule, ())
+        holiday_set = set(holidays)
+
+        self.bits = bytearray(size)
+        self.prefix = array('H', [0]) * (size + 1)
+        for n in range(size):
+            day = self.start + timedelta(days=n)
+            working = not (
+                day.weekday() in weekly_offs
+                or (day.weekday() == 5 and (day.day - 1) // 7 + 1 in off_saturdays)
+                or day in holiday_set
+            )
+            self.bits[n] = working
+            self.prefix[n + 1] = self.prefix[n] + working
+
+    def index(self, day):
+        return (day - self.start).days
+
+    def is_working(self, day):
+        return bool(self.bits[self.index(day)])
+
+    def count(self, start, end):
+        """ Working days in [start, end], both inside this year """
+        if end < start:
+            return 0
+        return self.prefix[self.index(end) + 1] - self.prefix[self.index(start)]
+
+    def month_count(self, month):
+        num_days = calendar.monthrange(self.year, month)[1]
+        return self.count(date(self.year, month, 1), date(self.year, month, num_days))
+
+    def month_off_days(self, month):
+        """ Weekly offs + holidays of the month, as a set of dates """
+        num_days = calendar.monthrange(self.year, month)[1]
+        first = self.index(date(self.year, month, 1))
+        return {
+            self.start + timedelta(days=first + n)
+            for n in range(num_days) if not self.bits[first + n]
+        }
+
+
+# ==========================================
+# CACHE
+# ==========================================
+# Keyed by (company, year). An entry is reused only while it was built from the
+# same weekly-off rule and the same holiday dates, so holiday invalidation
+# (holidays.invalidate) and Company edits rebuild it automatically.
+
+_calendars = {}
+_lock = threading.Lock()
+
+
+def work_calendar(company, year):
+    holidays = year_holidays(company.id, year)
+    rule = (frozenset(company.weekly_off_days()), company.saturday_rule)
+
+    cal = _calendars.get((company.id, year))
+    if cal is None or cal.holidays != holidays or cal.rule != rule:
+        cal = WorkCalendar(year, rule[0], rule[1], holidays)
+        with _lock:
+            _calendars[(company.id, year)] = cal
+    return cal
+
+
+def working_days_between(company, start, end):
+    """ Working days in [start, end] inclusive; falls back to calendar days without a company """
+    if end < start:
+        return 0
+    if company is None:
+        return (end - start).days + 1
+
+    total = 0
+    for year in range(start.year, end.year + 1):
+        cal = work_calendar(company, year)
+        total += cal.count(max(start, cal.start), min(end, date(year, 12, 31)))
+    return total
+
+
+def working_days_in_month(company, year, month):
+    if company is None:
+        return calendar.monthrange(year, month)[1]
+    return work_calendar(company, year).month_count(month)
+
+
+def working_dates(company, start, end):
+    """ The working dates in [start, end], in order """
+    days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+    if company is None:
+        return days
+    calendars = {}
+    result = []
+    for day in days:
+        cal = calendars.get(day.year) or calendars.setdefault(day.year, work_calendar(company, day.year))
+        if cal.is_working(day):
+            result.append(day)
+    return result
+
+
+def month_off_days(company, year, month):
+    if company is None:
+        return set()
+    return work_calendar(company, year).month_off_days(month)
@@ -64,6 +64,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'dashboard.context_processors.unread_notifications',
             ],
         },
     },
@@ -71,6 +72,16 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'hrms_project.wsgi.application'
 
+# Live notifications. By default pages re-read the unread counter every
+# minute or so, which costs one short request and works under WSGI.
+# Turn REALTIME_PUSH on only when serving the ASGI app (e.g. `uvicorn
+# hrms_project.asgi:application`) with a REALTIME_BROKER every worker
+# shares (subscribe/unsubscribe/publish): streams and long polls then hold
+# a connection open, and the in-process default only reaches connections
+# held by the process that published.
+REALTIME_PUSH = False
+REALTIME_BROKER = 'dashboard.realtime.InProcessBroker'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
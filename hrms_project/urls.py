@@ -23,19 +23,36 @@ urlpatterns = [
     # Leave & Attendance
     path('apply-leave/', dash_views.apply_leave, name='apply_leave'),
     path('manage-quota/<int:user_id>/', dash_views.manage_quota, name='manage_quota'),
+    path('leave-overlaps/', dash_views.leave_overlaps, name='leave_overlaps'),
     path('leave-requests/', dash_views.leave_requests_list, name='leave_requests_list'),
     path('leave-action/<int:leave_id>/<str:action>/', dash_views.action_leave, name='action_leave'),
     path('attendance/<int:user_id>/', dash_views.view_attendance, name='view_attendance'),
+    path('attendance/bulk/', dash_views.bulk_attendance, name='bulk_attendance'),
+    path('attendance/team/', dash_views.team_calendar, name='team_calendar'),
+    path('hr/payroll/', dash_views.payroll, name='payroll'),
+    path('hr/holidays/', dash_views.manage_holidays, name='manage_holidays'),
+    path('hr/leave-policy/', dash_views.leave_policy, name='leave_policy'),
+    path('hr/export/', dash_views.export_attendance, name='export_attendance'),
+    path('hr/analytics/', dash_views.productivity_analytics, name='productivity_analytics'),
     
     # Teams
     path('manage-teams/', dash_views.manage_teams, name='manage_teams'),
 
     # --- NEW FEATURES (Use dash_views prefix) ---
     path('hr/smtp/', dash_views.smtp_settings, name='smtp_settings'),
+    path('hr/broadcast/', dash_views.broadcast, name='broadcast'),
+    path('hr/mail-queue/', dash_views.mail_queue_stats, name='mail_queue_stats'),
     path('notifications/', dash_views.notifications_view, name='notifications_view'),
+    path('notifications/stream/', dash_views.notification_stream, name='notification_stream'),
+    path('notifications/poll/', dash_views.notification_poll, name='notification_poll'),
 
     # Add inside urlpatterns:
     path('track-sheet/<int:user_id>/', dash_views.track_sheet, name='track_sheet'),
+    path('track-sheet/<int:user_id>/day/<str:day>/', dash_views.track_day, name='track_day'),
+    path('track-sheet/<int:user_id>/search/', dash_views.track_search, name='track_search'),
     path('track-actions/<int:user_id>/', dash_views.handle_track_actions, name='handle_track_actions'),
+    path('track-actions/<int:user_id>/json/', dash_views.track_action_json, name='track_action_json'),
+    path('tasks/assign/', dash_views.assign_tasks_bulk, name='assign_tasks_bulk'),
+    path('tasks/outbox/', dash_views.task_outbox, name='task_outbox'),
     path('task/archive/<int:task_id>/', dash_views.delete_task_assignment, name='delete_task_assignment'),
 ]
\ No newline at end of file